@@ -3,31 +3,104 @@ Agente Filtrador
 Sistema de moderação inteligente antes de salvar no banco
 """
 import json
-from groq import Groq
-from app_config import GROQ_API_KEY, MODEL_NAME
-from typing import Dict, Any, Tuple, Optional
-from .prompts import get_filtrador_prompt
-
-# Inicializa o cliente Groq
-client = None
-if GROQ_API_KEY:
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-    except Exception as e:
-        print(f"⚠️  Erro ao inicializar Groq para Agente Filtrador: {e}")
+import hashlib
+import time
+import unicodedata
+from app_config import (
+    FILTRADOR_CACHE_MAX_ENTRIES,
+    FILTRADOR_CACHE_TTL_SECONDS,
+    FILTRADOR_BATCH_MAX_CHARS,
+    FILTRADOR_DEADLINE_SECONDS
+)
+from typing import Dict, Any, List, Tuple, Optional
+from services.cache import TTLCache
+from services.llm_client import llm_client
+from services.metrics import record_moderation_verdict
+from services.tracing import set_span_attributes
+from services.model_router import model_router, valid_json_object
+from .prompts import get_filtrador_prompt, get_filtrador_prompt_version
+from .lexical import prefilter_content
+from .scheduler import run_moderation_tasks
+
+# Cliente Groq compartilhado (prazos, retries, hedging e circuit breaker)
+client = llm_client
+
+# Cache de vereditos: chave = hash(conteúdo normalizado, campo, contexto, versão do prompt/base)
+_verdict_cache = TTLCache(FILTRADOR_CACHE_MAX_ENTRIES, FILTRADOR_CACHE_TTL_SECONDS, name="moderation_verdicts")
+
+def _verdict_cache_key(
+    content: str,
+    field_name: Optional[str],
+    context: Optional[Dict[str, Any]]
+) -> str:
+    """
+    Monta a chave do cache de vereditos
+
+    O conteúdo é normalizado de forma leve (NFKC, case folding e espaços),
+    para que diferenças irrelevantes não gerem uma nova chamada ao LLM.
+    """
+    normalized = " ".join(unicodedata.normalize("NFKC", content).casefold().split())
+    context_str = json.dumps(context, ensure_ascii=False, sort_keys=True, default=str) if context else ""
+    raw = "\x1f".join([
+        get_filtrador_prompt_version(),
+        field_name or "",
+        context_str,
+        normalized
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _undecided_verdict(reason: str) -> Dict[str, Any]:
+    """
+    Veredito de um conteúdo que não chegou a ser analisado (prazo, cancelamento)
+
+    Não bloqueia, mas também não aprova: `undecided` diz a quem vai salvar
+    que o conteúdo não foi moderado. Nunca entra no cache.
+    """
+    return {
+        "is_inappropriate": False,
+        "undecided": True,
+        "category": None,
+        "reason": reason,
+        "offensive_text": None
+    }
+
+def _remaining_seconds(deadline: Optional[float]) -> float:
+    """
+    Tempo que sobra do prazo da requisição (FILTRADOR_DEADLINE_SECONDS se não houver)
 
-def analyze_content(
+    Raises:
+        TimeoutError: O prazo já acabou
+    """
+    if deadline is None:
+        return FILTRADOR_DEADLINE_SECONDS
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Prazo da moderação esgotado")
+    return remaining
+
+def get_verdict_cache_stats() -> Dict[str, Any]:
+    """
+    Retorna os contadores do cache de vereditos (hits, misses, tamanho...)
+    """
+    return _verdict_cache.stats()
+
+async def analyze_content(
     content: str,
     field_name: Optional[str] = None,
-    context: Optional[Dict[str, Any]] = None
+    context: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None
 ) -> Dict[str, Any]:
     """
     Analisa conteúdo usando o Agente Filtrador
     
+    Ordem de decisão: pré-filtro léxico local → cache de vereditos → LLM.
+    
     Args:
         content: Conteúdo a ser analisado
         field_name: Nome do campo (opcional, para contexto)
         context: Contexto adicional (opcional)
+        deadline: Prazo absoluto (time.monotonic) da requisição; sem ele, a
+            análise tem FILTRADOR_DEADLINE_SECONDS
         
     Returns:
         Dicionário com resultado da análise:
@@ -37,6 +110,7 @@ def analyze_content(
             "reason": str,
             "offensive_text": str | None
         }
+        Se o prazo acabar antes do veredito, volta também "undecided": True.
     """
     if not content or not content.strip():
         return {
@@ -46,6 +120,20 @@ def analyze_content(
             "offensive_text": None
         }
     
+    # Tier local: pré-filtro léxico decide sem chamada de rede quando tem confiança
+    lexical_result = prefilter_content(content)
+    if lexical_result is not None:
+        record_moderation_verdict("lexical", lexical_result["is_inappropriate"])
+        set_span_attributes(**{"moderation.source": "lexical"})
+        return lexical_result
+    
+    cache_key = _verdict_cache_key(content, field_name, context)
+    cached = _verdict_cache.get(cache_key)
+    if cached is not None:
+        record_moderation_verdict("cache", cached["is_inappropriate"])
+        set_span_attributes(**{"moderation.source": "cache"})
+        return dict(cached)
+    
     if not client:
         # Se não houver cliente, retorna apropriado (não bloqueia)
         return {
@@ -55,6 +143,40 @@ def analyze_content(
             "offensive_text": None
         }
     
+    try:
+        result = await _analyze_with_llm(content, field_name, context, deadline)
+    except TimeoutError as e:
+        print(f"[AVISO] Agente Filtrador sem veredito dentro do prazo: {e}")
+        return _undecided_verdict("Análise não concluída dentro do prazo")
+    except Exception as e:
+        print(f"[AVISO] Erro no Agente Filtrador: {e}")
+        # Em caso de erro, retorna apropriado (não bloqueia) para não quebrar o fluxo
+        # Erros não entram no cache: a próxima chamada tenta de novo
+        return {
+            "is_inappropriate": False,
+            "category": None,
+            "reason": f"Erro na análise: {str(e)}",
+            "offensive_text": None
+        }
+    
+    _verdict_cache.set(cache_key, dict(result))
+    record_moderation_verdict("llm", result["is_inappropriate"])
+    set_span_attributes(**{"moderation.source": "llm"})
+    return result
+
+async def _analyze_with_llm(
+    content: str,
+    field_name: Optional[str] = None,
+    context: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Chama o LLM para analisar o conteúdo (sem cache e sem pré-filtro)
+    
+    Raises:
+        TimeoutError: O prazo acabou (inclusive durante o escalonamento)
+        Exception: Erros da API do Groq são propagados para quem chamou
+    """
     # Construir prompt com contexto
     context_str = ""
     if field_name:
@@ -69,64 +191,308 @@ Conteúdo a analisar: "{content}"
 
 Analise este conteúdo e determine se deve ser bloqueado antes de salvar no banco de dados."""
 
+    # Chama a IA para análise
+    # Modelo pequeno primeiro; JSON inválido ou confiança baixa escalona para o grande
+    completion = await model_router.complete(
+        client,
+        "moderation",
+        validate=valid_json_object(("is_inappropriate",)),
+        messages=[
+            {
+                "role": "system",
+                "content": "Você é o Agente Filtrador. Analise conteúdo e retorne APENAS JSON válido com is_inappropriate (boolean), category (string ou null), reason (string), offensive_text (string ou null) e confidence (0.0 a 1.0)."
+            },
+            {
+                "role": "user",
+                "content": moderation_prompt
+            }
+        ],
+        temperature=0.1,  # Muito baixa para ser rigoroso e consistente
+        max_tokens=300,
+        deadline_seconds=_remaining_seconds(deadline),
+        response_format={"type": "json_object"}  # Força resposta JSON
+    )
+    
+    response_text = completion.choices[0].message.content.strip()
+    
+    # Parsear JSON
     try:
-        # Chama a IA para análise
-        completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Você é o Agente Filtrador. Analise conteúdo e retorne APENAS JSON válido com is_inappropriate (boolean), category (string ou null), reason (string) e offensive_text (string ou null)."
-                },
-                {
-                    "role": "user",
-                    "content": moderation_prompt
-                }
-            ],
-            model=MODEL_NAME,
-            temperature=0.1,  # Muito baixa para ser rigoroso e consistente
-            max_tokens=300,
-            response_format={"type": "json_object"}  # Força resposta JSON
-        )
-        
-        response_text = completion.choices[0].message.content.strip()
-        
-        # Parsear JSON
-        try:
-            result = json.loads(response_text)
+        result = json.loads(response_text)
+        return {
+            "is_inappropriate": bool(result.get("is_inappropriate", False)),
+            "category": result.get("category"),
+            "reason": result.get("reason", "conteúdo inapropriado detectado pelo Agente Filtrador"),
+            "offensive_text": result.get("offensive_text")
+        }
+    except json.JSONDecodeError:
+        # Se não conseguir parsear, tenta extrair do texto
+        response_lower = response_text.lower()
+        if "true" in response_lower or "inappropriate" in response_lower or "inapropriado" in response_lower:
             return {
-                "is_inappropriate": bool(result.get("is_inappropriate", False)),
-                "category": result.get("category"),
-                "reason": result.get("reason", "conteúdo inapropriado detectado pelo Agente Filtrador"),
-                "offensive_text": result.get("offensive_text")
+                "is_inappropriate": True,
+                "category": "conteudo_inapropriado",
+                "reason": "conteúdo inapropriado detectado pelo Agente Filtrador",
+                "offensive_text": content[:100]  # Primeiros 100 caracteres
             }
-        except json.JSONDecodeError:
-            # Se não conseguir parsear, tenta extrair do texto
-            response_lower = response_text.lower()
-            if "true" in response_lower or "inappropriate" in response_lower or "inapropriado" in response_lower:
-                return {
-                    "is_inappropriate": True,
-                    "category": "conteudo_inapropriado",
-                    "reason": "conteúdo inapropriado detectado pelo Agente Filtrador",
-                    "offensive_text": content[:100]  # Primeiros 100 caracteres
-                }
-            return {
+        return {
+            "is_inappropriate": False,
+            "category": None,
+            "reason": "",
+            "offensive_text": None
+        }
+
+async def analyze_contents_batch(
+    items: List[Dict[str, Any]],
+    stop_on_block: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Analisa vários campos de uma vez, com o mínimo de chamadas ao LLM
+    
+    Cada item passa antes pelo pré-filtro léxico e pelo cache de vereditos.
+    Os itens restantes vão para o LLM em um único prompt; se não couberem no
+    orçamento de contexto (FILTRADOR_BATCH_MAX_CHARS), são divididos em lotes
+    analisados em paralelo pelo escalonador de moderação.
+    
+    Args:
+        items: Lista de {"field_name": str | None, "content": str}
+        stop_on_block: Se True, o primeiro bloqueio cancela os lotes restantes
+        
+    Returns:
+        Lista de vereditos na mesma ordem dos itens, cada um com
+        field_name, is_inappropriate, category, reason e offensive_text.
+        Itens que não foram analisados (prazo de FILTRADOR_DEADLINE_SECONDS
+        esgotado, ou cancelados por um bloqueio) voltam com "undecided": True.
+    """
+    # Prazo de ponta a ponta: lotes, escalonamento e reanálises dividem o mesmo
+    deadline = time.monotonic() + FILTRADOR_DEADLINE_SECONDS
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    pending: List[int] = []
+    
+    for index, item in enumerate(items):
+        content = item.get("content") or ""
+        field_name = item.get("field_name")
+        
+        if not content.strip():
+            results[index] = await analyze_content(content, field_name)
+            continue
+        
+        lexical_result = prefilter_content(content)
+        if lexical_result is not None:
+            record_moderation_verdict("lexical", lexical_result["is_inappropriate"])
+            results[index] = lexical_result
+            continue
+        
+        cached = _verdict_cache.get(_verdict_cache_key(content, field_name, None))
+        if cached is not None:
+            record_moderation_verdict("cache", cached["is_inappropriate"])
+            results[index] = dict(cached)
+            continue
+        
+        pending.append(index)
+    
+    if pending and not client:
+        for index in pending:
+            results[index] = {
                 "is_inappropriate": False,
                 "category": None,
-                "reason": "",
+                "reason": "Agente Filtrador não configurado",
                 "offensive_text": None
             }
-            
+        pending = []
+    
+    if stop_on_block and any(result and result["is_inappropriate"] for result in results):
+        # Já há um bloqueio local: não gasta chamadas ao LLM com os outros campos
+        pending_reason = "Análise não realizada: outro campo já foi bloqueado"
+        pending = []
+    else:
+        pending_reason = "Análise não concluída dentro do prazo"
+    
+    chunks = _split_into_chunks([items[index] for index in pending], FILTRADOR_BATCH_MAX_CHARS)
+    if len(chunks) == 1:
+        chunk_results = [await _moderate_chunk(chunks[0], deadline)]
+    elif chunks:
+        chunk_results = await run_moderation_tasks(
+            [lambda chunk=chunk: _moderate_chunk(chunk, deadline) for chunk in chunks],
+            is_blocking=lambda verdicts: any(v["is_inappropriate"] for v in verdicts),
+            stop_on_block=stop_on_block,
+            deadline_seconds=max(deadline - time.monotonic(), 0)
+        )
+        if stop_on_block and any(
+            verdicts and any(v["is_inappropriate"] for v in verdicts) for verdicts in chunk_results
+        ):
+            pending_reason = "Análise não realizada: outro campo já foi bloqueado"
+    else:
+        chunk_results = []
+    
+    pending_iter = iter(pending)
+    for chunk, verdicts in zip(chunks, chunk_results):
+        for position in range(len(chunk)):
+            index = next(pending_iter)
+            results[index] = verdicts[position] if verdicts else None
+    
+    return [
+        {"field_name": item.get("field_name"), **(result or _undecided_verdict(pending_reason))}
+        for item, result in zip(items, results)
+    ]
+
+def _split_into_chunks(items: List[Dict[str, Any]], max_chars: int) -> List[List[Dict[str, Any]]]:
+    """
+    Agrupa itens em lotes cujo conteúdo somado cabe em max_chars
+    
+    Um item maior que o orçamento sozinho vira um lote próprio (análise individual).
+    """
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_size = 0
+    
+    for item in items:
+        size = len(item.get("content") or "")
+        if current and current_size + size > max_chars:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def _moderate_chunk(chunk: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Modera um lote de itens: individualmente se for um só, senão em uma chamada de lote
+    
+    Args:
+        chunk: Itens do lote
+        deadline: Prazo absoluto (time.monotonic) da requisição
+    
+    Returns:
+        Vereditos alinhados com o lote (erros viram vereditos não bloqueantes;
+        prazo esgotado vira veredito "undecided")
+    """
+    if len(chunk) == 1:
+        # Um único campo: o prompt individual é menor que o de lote
+        return [await analyze_content(chunk[0]["content"], chunk[0].get("field_name"), deadline=deadline)]
+    
+    try:
+        llm_results = await _analyze_batch_with_llm(chunk, deadline)
+    except TimeoutError as e:
+        print(f"[AVISO] Agente Filtrador (lote) sem veredito dentro do prazo: {e}")
+        return [_undecided_verdict("Análise não concluída dentro do prazo") for _ in chunk]
     except Exception as e:
-        print(f"[AVISO] Erro no Agente Filtrador: {e}")
-        # Em caso de erro, retorna apropriado (não bloqueia) para não quebrar o fluxo
-        return {
+        print(f"[AVISO] Erro no Agente Filtrador (lote): {e}")
+        return [{
             "is_inappropriate": False,
             "category": None,
             "reason": f"Erro na análise: {str(e)}",
             "offensive_text": None
-        }
+        } for _ in chunk]
+    
+    verdicts = []
+    for item, result in zip(chunk, llm_results):
+        if result is None:
+            # O LLM não retornou veredito para este campo: analisa individualmente
+            result = await analyze_content(item["content"], item.get("field_name"), deadline=deadline)
+        else:
+            _verdict_cache.set(_verdict_cache_key(item["content"], item.get("field_name"), None), dict(result))
+            record_moderation_verdict("llm", result["is_inappropriate"])
+        verdicts.append(result)
+    return verdicts
+
+async def _analyze_batch_with_llm(
+    items: List[Dict[str, Any]],
+    deadline: Optional[float] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Chama o LLM uma vez para todos os itens, pedindo um veredito por índice
+    
+    Returns:
+        Lista alinhada com os itens; None onde o LLM não retornou veredito válido
+        
+    Raises:
+        TimeoutError: O prazo acabou (inclusive durante o escalonamento)
+        Exception: Erros da API do Groq são propagados para quem chamou
+    """
+    fields_payload = [
+        {"index": index, "field_name": item.get("field_name"), "content": item.get("content")}
+        for index, item in enumerate(items)
+    ]
+    
+    moderation_prompt = f"""{get_filtrador_prompt()}
+
+Analise CADA campo abaixo de forma independente e determine se deve ser bloqueado antes de salvar no banco de dados.
+
+Campos a analisar (JSON):
+{json.dumps(fields_payload, ensure_ascii=False, indent=2)}
+
+Responda APENAS com JSON válido no formato:
+{{
+    "results": [
+        {{"index": 0, "is_inappropriate": true ou false, "category": "..." ou null, "reason": "...", "offensive_text": "..." ou null, "confidence": 0.0 a 1.0}}
+    ]
+}}
+Inclua exatamente um item em "results" para cada índice recebido."""
+
+    completion = await model_router.complete(
+        client,
+        "moderation_batch",
+        validate=lambda text: _valid_batch_response(text, len(items)),
+        messages=[
+            {
+                "role": "system",
+                "content": "Você é o Agente Filtrador. Analise cada campo e retorne APENAS JSON válido com a lista results, um veredito por índice."
+            },
+            {
+                "role": "user",
+                "content": moderation_prompt
+            }
+        ],
+        temperature=0.1,
+        max_tokens=min(150 * len(items) + 100, 4096),
+        deadline_seconds=_remaining_seconds(deadline),
+        response_format={"type": "json_object"}
+    )
+    
+    response_text = completion.choices[0].message.content.strip()
+    
+    parsed: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    try:
+        entries = json.loads(response_text).get("results", [])
+    except (json.JSONDecodeError, AttributeError):
+        return parsed
+    
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            index = int(entry.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(items):
+            parsed[index] = {
+                "is_inappropriate": bool(entry.get("is_inappropriate", False)),
+                "category": entry.get("category"),
+                "reason": entry.get("reason", "conteúdo inapropriado detectado pelo Agente Filtrador"),
+                "offensive_text": entry.get("offensive_text")
+            }
+    
+    return parsed
+
+def _valid_batch_response(text: str, count: int) -> bool:
+    """
+    Aceita a resposta em lote só se trouxer um veredito confiável para cada índice
+    """
+    entries = json.loads(text).get("results")
+    if not isinstance(entries, list):
+        return False
+    
+    covered = set()
+    for entry in entries:
+        if not isinstance(entry, dict) or not valid_json_object(("index", "is_inappropriate"))(json.dumps(entry)):
+            return False
+        covered.add(int(entry["index"]))
+    return covered >= set(range(count))
 
-def check_content_moderation(content: str, field_name: Optional[str] = None) -> Tuple[bool, str]:
+async def check_content_moderation(content: str, field_name: Optional[str] = None) -> Tuple[bool, str]:
     """
     Wrapper para compatibilidade com código existente
     
@@ -137,6 +503,6 @@ def check_content_moderation(content: str, field_name: Optional[str] = None) ->
     Returns:
         Tupla (is_inappropriate, reason)
     """
-    result = analyze_content(content, field_name)
+    result = await analyze_content(content, field_name)
     return result["is_inappropriate"], result["reason"]
 
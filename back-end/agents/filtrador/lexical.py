@@ -0,0 +1,316 @@
+"""
+Pré-filtro Léxico do Agente Filtrador
+Camada local que roda ANTES da chamada ao LLM: normaliza o texto
+(caixa, acentos, leetspeak, caracteres confundíveis) e procura termos
+ofensivos da base de conhecimento usando um autômato Aho-Corasick.
+"""
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from app_config import FILTRADOR_LEXICAL_ENABLED, FILTRADOR_LEXICAL_TRUST_CLEAN
+from config.prompt_registry import prompt_registry
+from .knowledge_loader import KNOWLEDGE_DIR
+
+# ============================================
+# NORMALIZAÇÃO
+# ============================================
+
+# Letras de outros alfabetos visualmente idênticas às latinas (ex: "рutа" em cirílico)
+_CONFUSABLES = str.maketrans({
+    # Cirílico
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j",
+    "ѕ": "s", "ԁ": "d", "ӏ": "l", "ɡ": "g",
+    "А": "a", "В": "b", "Е": "e", "К": "k", "М": "m", "Н": "h", "О": "o",
+    "Р": "p", "С": "c", "Т": "t", "У": "y", "Х": "x", "І": "i", "Ј": "j",
+    "Ѕ": "s",
+    # Grego
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o",
+    "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+    "Α": "a", "Β": "b", "Ε": "e", "Ι": "i", "Κ": "k", "Μ": "m", "Ν": "n",
+    "Ο": "o", "Ρ": "p", "Τ": "t", "Υ": "y", "Χ": "x", "Ζ": "z",
+})
+
+# Substituições comuns de evasão (ex: "p0rr4", "c4r4lh0", "p0rr@")
+_LEET = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b",
+    "@": "a", "$": "s", "€": "e",
+})
+
+_TOKEN_RE = re.compile(r"\S+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_REPEATED_RE = re.compile(r"([a-z])\1+")
+# Sequências de letras soltas com 3+ letras (ex: "p o r r a")
+_SPACED_LETTERS_RE = re.compile(r"\b[a-z]\b(?: [a-z]\b){2,}")
+
+
+def _deleet_token(match: "re.Match") -> str:
+    token = match.group(0)
+    # Só troca dígitos/símbolos em tokens que também têm letras,
+    # para não transformar números legítimos ("2025", "100") em palavras
+    if any(ch.isalpha() for ch in token):
+        return token.translate(_LEET)
+    return token
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para comparação léxica
+
+    Aplica, nesta ordem: NFKC (formas de largura total etc.), troca de
+    caracteres confundíveis, case folding, remoção de acentos, leetspeak,
+    remoção de pontuação, junção de letras espaçadas e colapso de letras
+    repetidas ("poooorra" -> "pora"). Os termos da lista passam pela mesma
+    normalização, então a comparação continua consistente.
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto normalizado (apenas [a-z0-9] separados por um espaço)
+    """
+    if not text:
+        return ""
+
+    text = unicodedata.normalize("NFKC", text)
+    text = text.translate(_CONFUSABLES).casefold()
+    text = "".join(
+        ch for ch in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(ch)
+    )
+    text = _TOKEN_RE.sub(_deleet_token, text)
+    text = _NON_ALNUM_RE.sub(" ", text).strip()
+    text = _SPACED_LETTERS_RE.sub(lambda m: m.group(0).replace(" ", ""), text)
+    text = _REPEATED_RE.sub(r"\1", text)
+    return text
+
+# ============================================
+# AUTÔMATO AHO-CORASICK
+# ============================================
+
+class AhoCorasick:
+    """
+    Autômato Aho-Corasick simples (sem dependências externas)
+    Encontra todas as ocorrências de um conjunto de termos em uma única passada
+    """
+
+    def __init__(self, terms: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for term in terms:
+            self._add(term)
+        self._build()
+
+    def _add(self, term: str) -> None:
+        state = 0
+        for ch in term:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(term)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Retorna todas as ocorrências como (posição_inicial, termo)
+        """
+        matches = []
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for term in self._output[state]:
+                matches.append((index - len(term) + 1, term))
+        return matches
+
+# ============================================
+# LISTA DE TERMOS (compilada da base de conhecimento)
+# ============================================
+
+# Seções dos arquivos de conhecimento cujos termos entre aspas são palavrões
+_TERM_SECTION_KEYWORDS = ("XINGAMENTOS", "EVAÇÃO", "EVASÃO")
+_QUOTED_RE = re.compile(r'"([^"\n]{1,40})"')
+
+# Termos com sentido legítimo em português ("pau-brasil", "a bola rola",
+# "veado" o animal...) ou que colidem com siglas ("CU" de uma agência).
+# Um match nesses termos não é conclusivo: decide o LLM.
+AMBIGUOUS_TERMS = {"cu", "pau", "pica", "rola", "veado", "bicha"}
+# Termos normalizados com até esse tamanho também nunca são conclusivos:
+# palavras tão curtas costumam ser siglas em um formulário de ideias
+AMBIGUOUS_MAX_LENGTH = 3
+
+
+def is_ambiguous_term(term: str) -> bool:
+    """
+    Diz se um termo normalizado precisa do LLM para virar bloqueio
+    """
+    return term in AMBIGUOUS_TERMS or len(term) <= AMBIGUOUS_MAX_LENGTH
+
+
+def _is_section_header(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or stripped.startswith("-") or not stripped.endswith(":"):
+        return False
+    letters = [ch for ch in stripped if ch.isalpha()]
+    return bool(letters) and sum(ch.isupper() for ch in letters) / len(letters) > 0.8
+
+
+def extract_terms(knowledge_text: str) -> Dict[str, str]:
+    """
+    Extrai os termos bloqueados das seções de xingamentos/evasões
+
+    Args:
+        knowledge_text: Conteúdo de um arquivo de conhecimento
+
+    Returns:
+        Dicionário {termo_normalizado: termo_original}
+    """
+    terms = {}
+    in_term_section = False
+
+    for line in knowledge_text.splitlines():
+        if _is_section_header(line):
+            in_term_section = any(keyword in line.upper() for keyword in _TERM_SECTION_KEYWORDS)
+            continue
+        if not in_term_section:
+            continue
+        for raw_term in _QUOTED_RE.findall(line):
+            normalized = normalize_text(raw_term)
+            # Apenas palavras isoladas: frases são avaliadas pelo LLM
+            if normalized and " " not in normalized:
+                terms.setdefault(normalized, raw_term)
+
+    return terms
+
+
+def load_terms() -> Dict[str, str]:
+    """
+    Lê todos os arquivos .txt da pasta knowledge/ do Filtrador e
+    compila a lista de termos bloqueados
+
+    Returns:
+        Dicionário {termo_normalizado: termo_original}
+    """
+    terms = {}
+    if not KNOWLEDGE_DIR.exists():
+        return terms
+
+    for file_path in sorted(KNOWLEDGE_DIR.glob("*.txt")):
+        try:
+            content = file_path.read_text(encoding="utf-8")
+        except (UnicodeDecodeError, UnicodeError):
+            content = file_path.read_text(encoding="latin-1")
+        except Exception as e:
+            print(f"[AVISO] Erro ao ler arquivo {file_path.name} para o pré-filtro: {e}")
+            continue
+        for normalized, original in extract_terms(content).items():
+            terms.setdefault(normalized, original)
+
+    return terms
+
+
+class LexicalFilter:
+    """
+    Lista de termos compilada em um autômato, pronta para consulta
+    """
+
+    def __init__(self, terms: Dict[str, str]):
+        self.terms = terms
+        self._automaton = AhoCorasick(list(terms.keys()))
+
+    def find_terms(self, content: str) -> List[str]:
+        """
+        Retorna os termos (normalizados) encontrados como palavras inteiras
+        """
+        text = normalize_text(content)
+        found = []
+        for start, term in self._automaton.find_all(text):
+            end = start + len(term)
+            at_word_start = start == 0 or text[start - 1] == " "
+            at_word_end = end == len(text) or text[end] == " "
+            if at_word_start and at_word_end and term not in found:
+                found.append(term)
+        return found
+
+
+def get_lexical_filter() -> LexicalFilter:
+    """
+    Retorna o filtro léxico compilado
+
+    Compilado na primeira chamada e recompilado quando algum arquivo de
+    knowledge/ muda (ver config/prompt_registry.py).
+    """
+    return prompt_registry.get("filtrador_lexical")
+
+
+def reset_lexical_filter() -> None:
+    """
+    Descarta o autômato compilado (recompila na próxima consulta)
+    """
+    prompt_registry.invalidate("filtrador_lexical")
+
+
+prompt_registry.register("filtrador_lexical", KNOWLEDGE_DIR, lambda: LexicalFilter(load_terms()))
+
+# ============================================
+# VEREDITO LOCAL
+# ============================================
+
+def prefilter_content(content: str) -> Optional[Dict[str, Any]]:
+    """
+    Tenta decidir localmente se o conteúdo deve ser bloqueado
+
+    Args:
+        content: Conteúdo a ser analisado
+
+    Returns:
+        Veredito no mesmo formato de analyze_content quando o pré-filtro
+        tem confiança, ou None quando a decisão deve ficar com o LLM
+    """
+    if not FILTRADOR_LEXICAL_ENABLED:
+        return None
+
+    lexical_filter = get_lexical_filter()
+    found = lexical_filter.find_terms(content)
+    conclusive = [term for term in found if not is_ambiguous_term(term)]
+
+    if conclusive:
+        terms = lexical_filter.terms
+        offensive = ", ".join(terms.get(term, term) for term in conclusive)
+        return {
+            "is_inappropriate": True,
+            "category": "conteudo_inapropriado",
+            "reason": "xingamento ou palavrão detectado pelo pré-filtro do Agente Filtrador",
+            "offensive_text": offensive
+        }
+
+    if not found and FILTRADOR_LEXICAL_TRUST_CLEAN:
+        return {
+            "is_inappropriate": False,
+            "category": None,
+            "reason": "",
+            "offensive_text": None
+        }
+
+    return None
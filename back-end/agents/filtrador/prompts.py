@@ -2,11 +2,27 @@
 Prompts do Agente Filtrador
 Sistema de moderação inteligente
 """
-from .knowledge_loader import load_filtrador_knowledge
+from config.prompt_registry import prompt_registry
+from .knowledge_loader import load_filtrador_knowledge, KNOWLEDGE_DIR
 
 def get_filtrador_prompt() -> str:
     """
     Retorna o prompt do Agente Filtrador com conhecimento carregado
+    
+    O prompt é compilado uma vez e só é recompilado quando algum arquivo
+    de knowledge/ muda (ver config/prompt_registry.py).
+    """
+    return prompt_registry.get("filtrador")
+
+def get_filtrador_prompt_version() -> str:
+    """
+    Retorna um hash curto do prompt compilado do Agente Filtrador
+    """
+    return prompt_registry.version("filtrador")
+
+def _build_filtrador_prompt() -> str:
+    """
+    Monta o prompt completo do Agente Filtrador (lê a base de conhecimento)
     """
     # Carrega conhecimento específico do Filtrador
     knowledge = load_filtrador_knowledge()
@@ -55,7 +71,8 @@ Responda APENAS com JSON válido:
     "is_inappropriate": true ou false,
     "category": "conteudo_inapropriado" | "critica_destrutiva" | "fora_de_contexto" | "conteudo_sem_sentido" | null,
     "reason": "explicação detalhada do motivo (se for inapropriado)",
-    "offensive_text": "texto específico detectado como ofensivo (se aplicável)"
+    "offensive_text": "texto específico detectado como ofensivo (se aplicável)",
+    "confidence": número de 0.0 a 1.0 indicando sua certeza no veredito
 }
 
 Se for apropriado, is_inappropriate deve ser false e category deve ser null."""
@@ -74,3 +91,4 @@ Use essas informações como referência para detectar conteúdo inapropriado. O
     
     return base_prompt.strip()
 
+prompt_registry.register("filtrador", KNOWLEDGE_DIR, _build_filtrador_prompt)
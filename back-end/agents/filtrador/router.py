@@ -4,8 +4,8 @@ Endpoints para moderação de conteúdo
 """
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from .agent import analyze_content
+from typing import Optional, Dict, Any, List
+from .agent import analyze_content, analyze_contents_batch, get_verdict_cache_stats
 
 router = APIRouter(prefix="/filtrador", tags=["Agente Filtrador"])
 
@@ -18,12 +18,33 @@ class ContentAnalysisRequest(BaseModel):
 class ContentAnalysisResponse(BaseModel):
     """Response da análise de conteúdo"""
     is_inappropriate: bool
+    # True quando não houve veredito (prazo esgotado): o conteúdo não foi moderado
+    undecided: bool = False
     category: Optional[str] = None
     reason: str
     offensive_text: Optional[str] = None
 
+class BatchAnalysisItem(BaseModel):
+    """Campo individual de uma análise em lote"""
+    field_name: Optional[str] = None
+    content: str
+
+class BatchAnalysisRequest(BaseModel):
+    """Request para análise de vários campos em uma única chamada"""
+    items: List[BatchAnalysisItem]
+
+class BatchAnalysisItemResponse(ContentAnalysisResponse):
+    """Veredito de um campo da análise em lote"""
+    field_name: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    """Response da análise em lote (mesma ordem dos itens enviados)"""
+    results: List[BatchAnalysisItemResponse]
+    is_inappropriate: bool
+    undecided: bool = False
+
 @router.post("/analyze", response_model=ContentAnalysisResponse)
-def analyze_content_endpoint(request: ContentAnalysisRequest):
+async def analyze_content_endpoint(request: ContentAnalysisRequest):
     """
     Analisa conteúdo usando o Agente Filtrador
     
@@ -35,7 +56,7 @@ def analyze_content_endpoint(request: ContentAnalysisRequest):
     **Uso:** Chamar ANTES de salvar no banco de dados
     """
     try:
-        result = analyze_content(
+        result = await analyze_content(
             request.content,
             request.field_name,
             request.context
@@ -49,12 +70,48 @@ def analyze_content_endpoint(request: ContentAnalysisRequest):
             detail=f"Erro ao analisar conteúdo: {str(e)}"
         )
 
+@router.post("/analyze-batch", response_model=BatchAnalysisResponse)
+async def analyze_batch_endpoint(request: BatchAnalysisRequest):
+    """
+    Analisa vários campos de uma vez usando o Agente Filtrador
+    
+    Todos os campos que não forem resolvidos pelo pré-filtro ou pelo cache
+    são analisados em UMA única chamada ao LLM, então a latência não cresce
+    com o número de campos.
+    
+    Retorna um veredito por campo, na mesma ordem dos itens enviados, e
+    `is_inappropriate` geral (true se qualquer campo for bloqueado).
+    """
+    try:
+        results = await analyze_contents_batch([item.dict() for item in request.items])
+        
+        return {
+            "results": results,
+            "is_inappropriate": any(result["is_inappropriate"] for result in results),
+            "undecided": any(result.get("undecided") for result in results)
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao analisar conteúdo: {str(e)}"
+        )
+
 @router.post("/check", response_model=ContentAnalysisResponse)
-def check_content_endpoint(request: ContentAnalysisRequest):
+async def check_content_endpoint(request: ContentAnalysisRequest):
     """
     Verifica se conteúdo é apropriado (endpoint simplificado)
     
     Retorna apenas se é inapropriado ou não
     """
-    return analyze_content_endpoint(request)
+    return await analyze_content_endpoint(request)
 
+@router.get("/cache/stats")
+async def verdict_cache_stats_endpoint():
+    """
+    Retorna os contadores do cache de vereditos do Agente Filtrador
+    
+    Útil para acompanhar quantas chamadas ao LLM o cache está economizando
+    (hits, misses, evictions e taxa de acerto).
+    """
+    return get_verdict_cache_stats()
@@ -0,0 +1,74 @@
+"""
+Escalonador de Moderação Concorrente
+Executa várias análises do Agente Filtrador em paralelo, com limite de
+concorrência, prazo por requisição e cancelamento antecipado: o primeiro
+veredito de bloqueio cancela as análises ainda em andamento.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+from app_config import FILTRADOR_MAX_CONCURRENCY, FILTRADOR_DEADLINE_SECONDS
+
+
+async def run_moderation_tasks(
+    tasks: List[Callable[[], Awaitable[Any]]],
+    is_blocking: Callable[[Any], bool],
+    stop_on_block: bool = True,
+    max_concurrency: int = FILTRADOR_MAX_CONCURRENCY,
+    deadline_seconds: float = FILTRADOR_DEADLINE_SECONDS
+) -> List[Optional[Any]]:
+    """
+    Executa as tarefas de moderação em paralelo
+
+    Args:
+        tasks: Funções sem argumentos, cada uma retornando uma corrotina de moderação
+        is_blocking: Diz se um resultado contém bloqueio
+        stop_on_block: Se True, o primeiro bloqueio cancela as tarefas restantes
+        max_concurrency: Máximo de tarefas desta requisição rodando ao mesmo tempo
+        deadline_seconds: Prazo total da requisição
+
+    Returns:
+        Lista alinhada com as tarefas. Tarefas canceladas, que falharam ou que
+        não terminaram dentro do prazo ficam como None.
+    """
+    results: List[Optional[Any]] = [None] * len(tasks)
+    if not tasks:
+        return results
+
+    deadline = time.monotonic() + deadline_seconds
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run(task: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await task()
+
+    running = {asyncio.create_task(_run(task)): index for index, task in enumerate(tasks)}
+
+    try:
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"[AVISO] Prazo da moderação esgotado com {len(running)} análise(s) pendente(s)")
+                break
+
+            done, _ = await asyncio.wait(running, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            blocked = False
+            for future in done:
+                index = running.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"[AVISO] Erro em análise concorrente do Agente Filtrador: {e}")
+                    continue
+                if is_blocking(results[index]):
+                    blocked = True
+
+            if blocked and stop_on_block:
+                break
+    finally:
+        # Cancela as análises restantes (inclusive as chamadas HTTP em voo)
+        for future in running:
+            future.cancel()
+
+    return results
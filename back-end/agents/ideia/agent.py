@@ -2,26 +2,23 @@
 Agente de Ideia (JuniBox)
 Sistema de assistência para ideação e estruturação de propostas
 """
+import hashlib
 import json
-from groq import Groq
-from app_config import GROQ_API_KEY, MODEL_NAME, TEMPERATURE
-from .prompts import get_ideia_prompt
-from typing import List, Dict, Any, Optional
+from app_config import TEMPERATURE, CHAT_MEMORY_SUMMARY_MAX_TOKENS
+from services.llm_client import llm_client
+from services.model_router import model_router, valid_json_object
+from .prompts import get_ideia_static_prompt, get_ideia_static_prompt_hash, get_ideia_knowledge_context
+from typing import List, Dict, Any, Optional, AsyncIterator
 from schemas import Message
 
-# Inicializa o cliente Groq
-client = None
-if GROQ_API_KEY:
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-    except Exception as e:
-        print(f"⚠️  Erro ao inicializar Groq para Agente de Ideia: {e}")
+# Cliente Groq compartilhado (prazos, retries, hedging e circuit breaker)
+client = llm_client
 
 # ============================================
 # FUNÇÕES DO AGENTE DE IDEIA
 # ============================================
 
-def get_response(user_message: str, history: List[Message]) -> str:
+async def get_response(user_message: str, history: List[Message]) -> str:
     """
     Função simplificada que monta o contexto e chama a Groq.
     Versão básica que não precisa de Firebase - ideal para testes rápidos.
@@ -39,22 +36,14 @@ def get_response(user_message: str, history: List[Message]) -> str:
     if not user_message or not user_message.strip():
         return "Por favor, envie uma mensagem válida."
     
-    # 1. Começa com o System Prompt (A personalidade do JuniBox)
-    system_prompt = get_ideia_prompt()
-    messages_payload = [{"role": "system", "content": system_prompt}]
-    
-    # 2. Adiciona o histórico antigo (convertendo do Pydantic para dict)
-    for msg in history:
-        messages_payload.append({"role": msg.role, "content": msg.content})
+    messages_payload = _build_simple_messages(user_message, history)
     
-    # 3. Adiciona a mensagem atual do usuário
-    messages_payload.append({"role": "user", "content": user_message})
-    
-    # 4. Chama a API do Groq
+    # Chama a API do Groq
     try:
-        chat_completion = client.chat.completions.create(
+        chat_completion = await model_router.complete(
+            client,
+            "chat",
             messages=messages_payload,
-            model=MODEL_NAME,
             temperature=TEMPERATURE,  # Baixa criatividade para seguir regras
             max_tokens=1024
         )
@@ -63,7 +52,7 @@ def get_response(user_message: str, history: List[Message]) -> str:
         print(f"❌ Erro ao processar na Groq: {e}")
         return f"Erro ao processar na Groq: {str(e)}"
 
-def generate_response(
+async def generate_response(
     message: str, 
     history: List[Dict[str, str]], 
     idea_context: Dict[str, Any],
@@ -84,26 +73,14 @@ def generate_response(
     if not client:
         return "⚠️ Serviço de IA não está configurado. Verifique a GROQ_API_KEY."
     
-    # Injeta o contexto da ideia no prompt do sistema
-    context_str = _build_context_string(idea_context, form_context)
-    
-    # Monta a lista de mensagens para a API
-    system_prompt = get_ideia_prompt()
-    messages = [
-        {"role": "system", "content": system_prompt + "\n\n" + context_str}
-    ]
-    
-    # Adiciona histórico de conversas anteriores
-    messages.extend(history)
-    
-    # Adiciona a mensagem atual do usuário
-    messages.append({"role": "user", "content": message})
+    messages = _build_generation_messages(message, history, idea_context, form_context)
     
     try:
         # Chama a API do Groq
-        completion = client.chat.completions.create(
+        completion = await model_router.complete(
+            client,
+            "chat",
             messages=messages,
-            model=MODEL_NAME,
             temperature=TEMPERATURE,
             max_tokens=1024,
             top_p=1,
@@ -116,6 +93,272 @@ def generate_response(
         print(f"❌ Erro ao gerar resposta da IA: {e}")
         return "Desculpe, tive um problema ao processar sua mensagem. Tente novamente em alguns instantes."
 
+# ============================================
+# MONTAGEM DO PROMPT (PREFIXO ESTÁVEL)
+# ============================================
+# Toda chamada ao LLM começa pela MESMA mensagem de sistema (o prefixo
+# estático), idêntica byte a byte para qualquer usuário. Assim o provedor
+# pode reaproveitar o cache de prefixo e pular o prefill dessa parte.
+# Tudo que muda por usuário/mensagem (dados da ideia, formulário, trechos
+# recuperados da base de conhecimento) vai em uma mensagem POSTERIOR.
+
+# Verificação de estabilidade do prefixo. A referência ("expected") é o hash
+# das entradas do prompt (prompt base e base de conhecimento), capturado na
+# primeira verificação e só trocado quando essas entradas mudam.
+_prefix_stats = {"checks": 0, "mismatches": 0, "expected": None, "last_seen": None}
+
+def _hash_prefix_message(message: Dict[str, str]) -> str:
+    """
+    Hash curto do conteúdo efetivamente enviado na primeira mensagem
+    """
+    return hashlib.sha256(message.get("content", "").encode("utf-8")).hexdigest()[:12]
+
+def _static_prefix() -> List[Dict[str, str]]:
+    """
+    Mensagens iniciais comuns a todas as chamadas do Agente de Ideia
+    """
+    return [{"role": "system", "content": get_ideia_static_prompt()}]
+
+def _volatile_context_message(*parts: str) -> List[Dict[str, str]]:
+    """
+    Mensagem de sistema com o contexto variável da vez (vazia se não houver)
+    """
+    content = "\n\n".join(part for part in parts if part)
+    return [{"role": "system", "content": content}] if content else []
+
+def _check_prefix(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Verifica se a chamada começa exatamente pelo prefixo estático
+    
+    Compara o hash da primeira mensagem realmente montada com o hash das
+    entradas do prompt (get_ideia_static_prompt_hash, calculado a partir do
+    prompt base e da base de conhecimento, não da montagem da vez). Qualquer
+    coisa variável que entre na mensagem de sistema inicial, ou uma montagem
+    que não comece por ela, conta como divergência em get_prefix_stats.
+    
+    Returns:
+        A própria lista de mensagens
+    """
+    _prefix_stats["checks"] += 1
+    
+    expected = get_ideia_static_prompt_hash()
+    if _prefix_stats["expected"] not in (None, expected):
+        # Mudança legítima: o prompt base ou a base de conhecimento mudaram
+        print(f"[INFO] Prefixo estático do Agente de Ideia mudou ({_prefix_stats['expected']} -> {expected})")
+    _prefix_stats["expected"] = expected
+    
+    first = messages[0] if messages else {}
+    seen = _hash_prefix_message(first) if first.get("role") == "system" else None
+    _prefix_stats["last_seen"] = seen
+    if seen != expected:
+        _prefix_stats["mismatches"] += 1
+        print(f"[AVISO] Prompt do Agente de Ideia não começa pelo prefixo estático ({seen} != {expected}); cache de prefixo perdido")
+    return messages
+
+def get_prefix_stats() -> Dict[str, Any]:
+    """
+    Retorna o hash do prefixo estático e o resultado das verificações
+    
+    Returns:
+        Dicionário com hash esperado, último hash montado, tamanho do
+        prefixo, verificações e divergências
+    """
+    static_prompt = get_ideia_static_prompt()
+    return {
+        "hash": get_ideia_static_prompt_hash(),
+        "last_seen_hash": _prefix_stats["last_seen"],
+        "chars": len(static_prompt),
+        "checks": _prefix_stats["checks"],
+        "mismatches": _prefix_stats["mismatches"]
+    }
+
+def _build_simple_messages(user_message: str, history: List[Message]) -> List[Dict[str, str]]:
+    """
+    Monta a lista de mensagens do chat simplificado (sem contexto de ideia)
+    
+    Args:
+        user_message: Mensagem atual do usuário
+        history: Lista de mensagens anteriores (Pydantic Message objects)
+        
+    Returns:
+        Lista de mensagens no formato da API do Groq
+    """
+    # 1. Começa com o prefixo estático (a personalidade do JuniBox)
+    messages_payload = _static_prefix()
+    
+    # 2. Adiciona o histórico antigo (convertendo do Pydantic para dict)
+    for msg in history:
+        messages_payload.append({"role": msg.role, "content": msg.content})
+    
+    # 3. Trechos da base de conhecimento relevantes e a mensagem atual do usuário
+    messages_payload.extend(_volatile_context_message(get_ideia_knowledge_context(user_message)))
+    messages_payload.append({"role": "user", "content": user_message})
+    return _check_prefix(messages_payload)
+
+def _build_generation_messages(
+    message: str,
+    history: List[Dict[str, str]],
+    idea_context: Dict[str, Any],
+    form_context: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, str]]:
+    """
+    Monta a lista de mensagens do chat completo (com contexto da ideia e do formulário)
+    
+    Ordem: prefixo estático, histórico, contexto da vez (ideia, formulário,
+    conhecimento recuperado) e a mensagem atual do usuário.
+    
+    Returns:
+        Lista de mensagens no formato da API do Groq
+    """
+    messages = _static_prefix()
+    
+    # Adiciona histórico de conversas anteriores
+    messages.extend(history)
+    
+    # Contexto da ideia e do formulário em mensagem separada (muda a cada vez)
+    step_name = (form_context or {}).get('step_name', '')
+    messages.extend(_volatile_context_message(
+        _build_context_string(idea_context, form_context),
+        get_ideia_knowledge_context(f"{message} {step_name}")
+    ))
+    
+    # Adiciona a mensagem atual do usuário
+    messages.append({"role": "user", "content": message})
+    return _check_prefix(messages)
+
+def _build_task_messages(prompt: str, knowledge_query: str) -> List[Dict[str, str]]:
+    """
+    Monta as mensagens de uma tarefa avulsa (sugestões), com o mesmo prefixo estático
+    """
+    messages = _static_prefix()
+    messages.extend(_volatile_context_message(get_ideia_knowledge_context(knowledge_query)))
+    messages.append({"role": "user", "content": prompt})
+    return _check_prefix(messages)
+
+# ============================================
+# RESUMO DA CONVERSA (MEMÓRIA)
+# ============================================
+
+async def summarize_conversation(
+    previous_summary: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int = CHAT_MEMORY_SUMMARY_MAX_TOKENS
+) -> Optional[str]:
+    """
+    Incorpora mensagens antigas ao resumo acumulado da conversa
+    
+    Args:
+        previous_summary: Resumo atual (vazio se ainda não existe)
+        messages: Mensagens a incorporar, em ordem cronológica
+        max_tokens: Tamanho máximo do novo resumo
+        
+    Returns:
+        Novo resumo, ou None se não foi possível gerar
+    """
+    if not client or not messages:
+        return None
+    
+    transcript = "\n".join(
+        f"{'Usuário' if msg['role'] == 'user' else 'JuniBox'}: {msg['content']}"
+        for msg in messages
+    )
+    prompt = f"""Você mantém a memória de uma conversa entre um usuário e o JuniBox, assistente de ideação.
+
+RESUMO ATUAL:
+{previous_summary or "(vazio)"}
+
+NOVAS MENSAGENS:
+{transcript}
+
+Reescreva o resumo incorporando as novas mensagens. Preserve decisões, dados da ideia, \
+preferências do usuário e pendências. Descarte saudações e repetições. \
+Responda apenas com o resumo, em português, em tópicos curtos."""
+    
+    try:
+        completion = await model_router.complete(
+            client,
+            "summary",
+            validate=lambda text: bool(text.strip()),
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=max_tokens
+        )
+        summary = (completion.choices[0].message.content or "").strip()
+        return summary or None
+    except Exception as e:
+        print(f"❌ Erro ao resumir conversa: {e}")
+        return None
+
+# ============================================
+# RESPOSTAS EM STREAMING
+# ============================================
+
+async def _stream_completion(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """
+    Chama o Groq com stream=True e repassa os trechos de texto conforme chegam
+    
+    Se quem consome o gerador parar (ex: cliente desconectou), o stream é
+    fechado no finally e o provedor para de gerar tokens.
+    
+    Raises:
+        Exception: Erros da API do Groq são propagados para quem consome o gerador
+    """
+    if not client:
+        yield "⚠️ Serviço de IA não está configurado. Verifique a GROQ_API_KEY."
+        return
+    
+    stream = await model_router.complete(
+        client,
+        "chat",
+        messages=messages,
+        temperature=TEMPERATURE,
+        max_tokens=1024,
+        top_p=1,
+        stream=True
+    )
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        await stream.close()
+
+def stream_response(user_message: str, history: List[Message]) -> AsyncIterator[str]:
+    """
+    Versão em streaming de get_response (chat simplificado, sem Firebase)
+    
+    Args:
+        user_message: Mensagem atual do usuário
+        history: Lista de mensagens anteriores (Pydantic Message objects)
+        
+    Returns:
+        Gerador assíncrono com os trechos de texto da resposta
+    """
+    return _stream_completion(_build_simple_messages(user_message, history))
+
+def stream_generate_response(
+    message: str,
+    history: List[Dict[str, str]],
+    idea_context: Dict[str, Any],
+    form_context: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Versão em streaming de generate_response
+    
+    Args:
+        message: Mensagem atual do usuário
+        history: Histórico de mensagens anteriores
+        idea_context: Dados atuais da ideia
+        form_context: Contexto do formulário
+        
+    Returns:
+        Gerador assíncrono com os trechos de texto da resposta
+    """
+    return _stream_completion(_build_generation_messages(message, history, idea_context, form_context))
+
 def _build_context_string(idea_context: Dict[str, Any], form_context: Optional[Dict[str, Any]] = None) -> str:
     """
     Constrói uma string formatada com o contexto da ideia e do formulário
@@ -177,7 +420,23 @@ def _build_context_string(idea_context: Dict[str, Any], form_context: Optional[D
 
     return "\n".join(context_parts)
 
-def generate_idea_suggestions(idea_context: Dict[str, Any]) -> List[str]:
+# Respostas de fallback das sugestões gerais (não devem ir para caches)
+_SUGGESTIONS_NOT_CONFIGURED = ["Configure a GROQ_API_KEY para receber sugestões."]
+_SUGGESTIONS_UNAVAILABLE = ["Não foi possível gerar sugestões no momento."]
+
+def is_fallback_suggestions(suggestions: List[str]) -> bool:
+    """
+    Diz se a lista é um fallback de erro/configuração, e não sugestões reais
+    """
+    return suggestions in (_SUGGESTIONS_NOT_CONFIGURED, _SUGGESTIONS_UNAVAILABLE)
+
+def _valid_suggestions(text: str) -> bool:
+    """
+    Aceita a resposta de sugestões só se trouxer as 3 linhas pedidas
+    """
+    return len([line for line in text.split('\n') if line.strip()]) >= 3
+
+async def generate_idea_suggestions(idea_context: Dict[str, Any]) -> List[str]:
     """
     Gera sugestões automáticas para melhorar a ideia
     Pode ser usado para o painel de sugestões da UI
@@ -189,7 +448,7 @@ def generate_idea_suggestions(idea_context: Dict[str, Any]) -> List[str]:
         Lista de sugestões
     """
     if not client:
-        return ["Configure a GROQ_API_KEY para receber sugestões."]
+        return list(_SUGGESTIONS_NOT_CONFIGURED)
     
     context_str = _build_context_string(idea_context)
     
@@ -202,13 +461,11 @@ Retorne apenas as sugestões, uma por linha, sem numeração.
 """
     
     try:
-        system_prompt = get_ideia_prompt()
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            model=MODEL_NAME,
+        completion = await model_router.complete(
+            client,
+            "suggestions",
+            validate=_valid_suggestions,
+            messages=_build_task_messages(prompt, context_str),
             temperature=0.5,
             max_tokens=300
         )
@@ -220,9 +477,9 @@ Retorne apenas as sugestões, uma por linha, sem numeração.
         
     except Exception as e:
         print(f"❌ Erro ao gerar sugestões: {e}")
-        return ["Não foi possível gerar sugestões no momento."]
+        return list(_SUGGESTIONS_UNAVAILABLE)
 
-def generate_field_suggestion(
+async def generate_field_suggestion(
     idea_context: Dict[str, Any], 
     form_context: Dict[str, Any], 
     field_name: str
@@ -240,6 +497,7 @@ def generate_field_suggestion(
     """
     if not client:
         return {
+            "field": field_name,
             "suggestion": "Serviço de IA não configurado.",
             "reasoning": "GROQ_API_KEY ausente.",
             "confidence": 0
@@ -268,13 +526,11 @@ A confiança deve ser um valor entre 0.0 e 1.0.
 """
     
     try:
-        system_prompt = get_ideia_prompt()
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            model=MODEL_NAME,
+        completion = await model_router.complete(
+            client,
+            "field_suggestion",
+            validate=valid_json_object(("suggestion",)),
+            messages=_build_task_messages(prompt, f"{field_name} {form_context.get('step_name', '')}"),
             temperature=0.7, # Um pouco mais criativo para sugestões
             max_tokens=500,
             response_format={"type": "json_object"} # Solicita JSON
@@ -284,6 +540,7 @@ A confiança deve ser um valor entre 0.0 e 1.0.
         response_data = json.loads(response_content)
         
         return {
+            "field": field_name,
             "suggestion": response_data.get("suggestion", ""),
             "reasoning": response_data.get("reasoning", ""),
             "confidence": response_data.get("confidence", 0.0)
@@ -293,6 +550,7 @@ A confiança deve ser um valor entre 0.0 e 1.0.
         print(f"❌ Erro de decodificação JSON na sugestão de campo: {e}")
         print(f"Conteúdo recebido: {response_content}")
         return {
+            "field": field_name,
             "suggestion": "Não foi possível gerar uma sugestão válida (erro de formato).",
             "reasoning": "A IA não retornou um JSON válido.",
             "confidence": 0
@@ -300,51 +558,114 @@ A confiança deve ser um valor entre 0.0 e 1.0.
     except Exception as e:
         print(f"❌ Erro ao gerar sugestão de campo: {e}")
         return {
+            "field": field_name,
             "suggestion": "Não foi possível gerar sugestão no momento.",
             "reasoning": f"Erro interno: {str(e)}",
             "confidence": 0
         }
 
-def validate_idea_completeness(idea_context: Dict[str, Any]) -> Dict[str, Any]:
+def _clamp_confidence(value: Any) -> float:
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _valid_field_suggestions(field_names: List[str]):
     """
-    Analisa se a ideia está completa e pronta para submissão
-    
+    Aceita a resposta multi-campo só se todos os campos vierem com "suggestion"
+    """
+    def _validate(text: str) -> bool:
+        data = json.loads(text)
+        return isinstance(data, dict) and all(
+            isinstance(data.get(field), dict) and data[field].get("suggestion")
+            for field in field_names
+        )
+    return _validate
+
+async def generate_field_suggestions(
+    idea_context: Dict[str, Any],
+    form_context: Optional[Dict[str, Any]],
+    field_names: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Gera sugestões para vários campos do formulário em uma única chamada ao LLM
+
+    O prompt do sistema e o contexto da ideia vão uma vez só, em vez de uma
+    chamada completa por campo (generate_field_suggestion).
+
     Args:
-        idea_context: Dados da ideia
-        
+        idea_context: Dados da ideia (salvos no banco).
+        form_context: Dados atuais do formulário (ou None para usar só o banco).
+        field_names: Campos para os quais gerar sugestão.
+
     Returns:
-        Dicionário com score de completude e lista de campos faltantes
+        Dicionário campo -> {"field", "suggestion", "reasoning", "confidence"}.
+        Campos sem sugestão válida voltam com confiança 0.
     """
-    required_fields = ['title', 'description', 'problema', 'objetivos']
-    missing_fields = []
-    filled_fields = 0
-    
-    # Verifica campos principais
-    for field in ['title', 'description', 'target_audience']:
-        value = idea_context.get(field, "")
-        if value and len(str(value).strip()) > 0:
-            filled_fields += 1
-        elif field in required_fields:
-            missing_fields.append(field)
+    def _fallback(suggestion: str, reasoning: str) -> Dict[str, Dict[str, Any]]:
+        return {
+            field: {"field": field, "suggestion": suggestion, "reasoning": reasoning, "confidence": 0}
+            for field in field_names
+        }
 
-    # Verifica campos dinâmicos
-    dynamic_content = idea_context.get('dynamic_content', {})
-    for field in ['problema', 'objetivos', 'metricas', 'resultadosEsperados', 'cronograma', 'recursos', 'desafios']:
-        value = dynamic_content.get(field, "")
-        if value and len(str(value).strip()) > 0:
-            filled_fields += 1
-        elif field in required_fields:
-            missing_fields.append(field)
-    
-    total_possible_fields = len(required_fields) + len(['target_audience', 'metricas', 'resultadosEsperados', 'cronograma', 'recursos', 'desafios'])
-    
-    completeness_score = (filled_fields / total_possible_fields) * 100
-    
-    return {
-        "score": completeness_score,
-        "is_complete": completeness_score == 100,
-        "missing_fields": missing_fields,
-        "filled_fields": filled_fields,
-        "total_fields": total_possible_fields
-    }
+    if not field_names:
+        return {}
+    if not client:
+        return _fallback("Serviço de IA não configurado.", "GROQ_API_KEY ausente.")
+
+    context_str = _build_context_string(idea_context, form_context)
+    step_name = (form_context or {}).get('step_name')
+    step_line = f"O usuário está na seção '{step_name}'.\n" if step_name else ""
+    fields_str = ", ".join(f"'{field}'" for field in field_names)
+    example = ",\n".join(
+        f'    "{field}": {{"suggestion": "Sugestão para {field}.", "reasoning": "Raciocínio.", "confidence": 0.85}}'
+        for field in field_names
+    )
+
+    prompt = f"""
+{context_str}
+
+{step_line}Gere uma sugestão concisa e relevante para cada um dos campos: {fields_str}.
+Para cada campo, forneça também um breve raciocínio (1-2 frases) explicando por que a sugestão é adequada.
+
+Formato da resposta (JSON), com uma chave por campo:
+```json
+{{
+{example}
+}}
+```
+A confiança deve ser um valor entre 0.0 e 1.0.
+"""
+
+    try:
+        completion = await model_router.complete(
+            client,
+            "field_suggestion",
+            validate=_valid_field_suggestions(field_names),
+            messages=_build_task_messages(prompt, f"{' '.join(field_names)} {step_name or ''}"),
+            temperature=0.7,
+            max_tokens=350 * len(field_names),
+            response_format={"type": "json_object"}
+        )
+        response_data = json.loads(completion.choices[0].message.content)
+    except Exception as e:
+        print(f"❌ Erro ao gerar sugestões de campos: {e}")
+        return _fallback("Não foi possível gerar sugestão no momento.", f"Erro interno: {str(e)}")
+
+    suggestions = {}
+    for field in field_names:
+        data = response_data.get(field) if isinstance(response_data, dict) else None
+        if isinstance(data, dict) and data.get("suggestion"):
+            suggestions[field] = {
+                "field": field,
+                "suggestion": str(data.get("suggestion", "")),
+                "reasoning": data.get("reasoning", ""),
+                "confidence": _clamp_confidence(data.get("confidence", 0.0))
+            }
+        else:
+            suggestions[field] = _fallback(
+                "Não foi possível gerar uma sugestão válida (erro de formato).",
+                "A IA não retornou este campo."
+            )[field]
+    return suggestions
 
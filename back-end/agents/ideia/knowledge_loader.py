@@ -4,23 +4,22 @@ Lê arquivos de texto da pasta knowledge/ e os inclui no prompt
 """
 import os
 from pathlib import Path
-from typing import List
+from typing import Collection, List, Optional, Tuple
 
 # Caminho para a pasta de conhecimento do Agente de Ideia
 KNOWLEDGE_DIR = Path(__file__).parent / "knowledge"
 
-def load_ideia_knowledge() -> str:
+def load_ideia_knowledge_files() -> List[Tuple[str, str]]:
     """
-    Carrega todos os arquivos de texto da pasta knowledge/ do Agente de Ideia
-    e retorna como uma string formatada
+    Lê os arquivos de texto da pasta knowledge/ do Agente de Ideia (exceto README.md)
     
     Returns:
-        String com todo o conteúdo dos arquivos de conhecimento do Agente de Ideia
+        Lista de (nome_do_arquivo, conteúdo) em ordem alfabética
     """
     if not KNOWLEDGE_DIR.exists():
-        return ""
+        return []
     
-    knowledge_parts = []
+    files = []
     
     # Lista todos os arquivos .txt e .md na pasta
     text_files = list(KNOWLEDGE_DIR.glob("*.txt")) + list(KNOWLEDGE_DIR.glob("*.md"))
@@ -44,14 +43,32 @@ def load_ideia_knowledge() -> str:
                     continue
             
             if content:
-                # Adiciona o nome do arquivo como cabeçalho
-                knowledge_parts.append(f"\n--- {file_path.name} ---\n{content}")
+                files.append((file_path.name, content))
             else:
                 print(f"[AVISO] Não foi possível ler o arquivo {file_path.name} com nenhum encoding conhecido")
         except Exception as e:
             print(f"[AVISO] Erro ao ler arquivo {file_path.name}: {e}")
             continue
     
+    return files
+
+def load_ideia_knowledge(names: Optional[Collection[str]] = None) -> str:
+    """
+    Carrega todos os arquivos de texto da pasta knowledge/ do Agente de Ideia
+    e retorna como uma string formatada
+    
+    Args:
+        names: Se informado, carrega só os arquivos com esses nomes
+    
+    Returns:
+        String com todo o conteúdo dos arquivos de conhecimento do Agente de Ideia
+    """
+    knowledge_parts = [
+        f"\n--- {name} ---\n{content}"
+        for name, content in load_ideia_knowledge_files()
+        if names is None or name in names
+    ]
+    
     if knowledge_parts:
         return "\n".join(knowledge_parts)
     
@@ -0,0 +1,215 @@
+"""
+Memória de Conversa do Agente de Ideia
+Mantém o histórico enviado ao LLM dentro de um orçamento de tokens:
+as mensagens recentes vão literais e as antigas são incorporadas a um
+resumo acumulado, salvo no documento da ideia (campo `chat_memory`).
+"""
+import asyncio
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Set, Tuple
+
+from app_config import (
+    CHAT_MEMORY_TOKEN_BUDGET,
+    CHAT_MEMORY_RECENT_MESSAGES,
+    CHAT_MEMORY_SUMMARY_EVERY,
+    CHAT_MEMORY_FOLD_MAX_MESSAGES
+)
+from services.db import (
+    get_recent_chat_messages,
+    get_chat_messages_after,
+    get_idea_context,
+    save_chat_memory
+)
+from .agent import summarize_conversation
+
+# Média conservadora de caracteres por token em português (tokenizador do Llama)
+_CHARS_PER_TOKEN = 3.5
+# Custo fixo por mensagem (papel, separadores)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+# ============================================
+# ESTIMATIVA DE TOKENS
+# ============================================
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima a quantidade de tokens de um texto (sem depender de tokenizador)
+    """
+    if not text:
+        return 0
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+def _message_tokens(message: Dict[str, Any]) -> int:
+    return estimate_tokens(message.get("content", "")) + _MESSAGE_OVERHEAD_TOKENS
+
+# ============================================
+# MONTAGEM DO HISTÓRICO
+# ============================================
+
+class ConversationMemory:
+    """
+    Histórico pronto para o prompt e o estado da memória usado para montá-lo
+    """
+
+    def __init__(self, history: List[Dict[str, str]], idea_context: Dict[str, Any], pending: int):
+        self.history = history
+        self.idea_context = idea_context
+        # Mensagens ainda não incorporadas ao resumo
+        self.pending = pending
+
+def _memory_state(idea_context: Dict[str, Any]) -> Dict[str, Any]:
+    return (idea_context or {}).get("chat_memory") or {}
+
+def _timestamp_key(value: Any) -> float:
+    if value is None:
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return 0.0
+
+def _unsummarized(messages: List[Dict[str, Any]], state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    until = state.get("summarized_until")
+    if until is None:
+        return messages
+    cutoff = _timestamp_key(until)
+    return [msg for msg in messages if _timestamp_key(msg.get("timestamp")) > cutoff]
+
+def fit_history(
+    messages: List[Dict[str, Any]],
+    summary: str = "",
+    budget: int = CHAT_MEMORY_TOKEN_BUDGET
+) -> List[Dict[str, str]]:
+    """
+    Seleciona o histórico que cabe no orçamento de tokens
+
+    O resumo (se houver) entra primeiro, como mensagem de sistema. Depois
+    entram as mensagens mais recentes, literais, até o orçamento acabar.
+    A última mensagem sempre entra (truncada se for maior que o orçamento).
+
+    Args:
+        messages: Mensagens não resumidas, em ordem cronológica
+        summary: Resumo acumulado da conversa
+        budget: Orçamento total de tokens
+
+    Returns:
+        Lista de mensagens no formato da API do Groq
+    """
+    prefix = []
+    remaining = budget
+    if summary:
+        summary_message = {
+            "role": "system",
+            "content": f"RESUMO DA CONVERSA ANTERIOR (mensagens antigas já resumidas):\n{summary}"
+        }
+        prefix.append(summary_message)
+        remaining -= _message_tokens(summary_message)
+
+    selected = []
+    for message in reversed(messages):
+        cost = _message_tokens(message)
+        if cost > remaining:
+            if not selected and remaining > _MESSAGE_OVERHEAD_TOKENS:
+                max_chars = int((remaining - _MESSAGE_OVERHEAD_TOKENS) * _CHARS_PER_TOKEN)
+                selected.append({"role": message["role"], "content": message["content"][-max_chars:]})
+            break
+        selected.append({"role": message["role"], "content": message["content"]})
+        remaining -= cost
+
+    selected.reverse()
+    return prefix + selected
+
+async def load_memory(user_id: str, idea_id: str) -> ConversationMemory:
+    """
+    Busca o contexto da ideia e monta o histórico dentro do orçamento
+
+    Substitui a dupla get_chat_history + get_idea_context nas rotas de chat.
+
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+
+    Returns:
+        ConversationMemory com o histórico, o contexto da ideia e o número
+        de mensagens ainda não resumidas
+    """
+    # Folga de um ciclo de resumo: cobre o intervalo até a atualização em segundo plano
+    fetch_limit = CHAT_MEMORY_RECENT_MESSAGES + 2 * CHAT_MEMORY_SUMMARY_EVERY
+    messages, idea_context = await asyncio.gather(
+        get_recent_chat_messages(user_id, idea_id, fetch_limit),
+        get_idea_context(user_id, idea_id)
+    )
+
+    state = _memory_state(idea_context)
+    unsummarized = _unsummarized(messages, state)
+    history = fit_history(unsummarized, state.get("summary", ""))
+    return ConversationMemory(history, idea_context, len(unsummarized))
+
+# ============================================
+# ATUALIZAÇÃO DO RESUMO
+# ============================================
+
+# Ideias com resumo sendo atualizado neste processo (evita trabalho duplicado)
+_updating: Set[Tuple[str, str]] = set()
+# Referências fortes para as tarefas em segundo plano
+_background_tasks: Set["asyncio.Task"] = set()
+
+def schedule_memory_update(user_id: str, idea_id: str, memory: ConversationMemory, new_messages: int = 2) -> None:
+    """
+    Agenda a atualização do resumo se já acumularam mensagens suficientes
+
+    Não bloqueia a resposta: o resumo é gerado em segundo plano e usado a
+    partir da próxima mensagem.
+
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        memory: Memória carregada para esta mensagem
+        new_messages: Mensagens salvas depois do carregamento (usuário + assistente)
+    """
+    pending = memory.pending + new_messages
+    if pending < CHAT_MEMORY_RECENT_MESSAGES + CHAT_MEMORY_SUMMARY_EVERY:
+        return
+
+    key = (user_id, idea_id)
+    if key in _updating:
+        return
+
+    _updating.add(key)
+    task = asyncio.create_task(_update_summary(user_id, idea_id, _memory_state(memory.idea_context)))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    task.add_done_callback(lambda _: _updating.discard(key))
+
+async def _update_summary(user_id: str, idea_id: str, state: Dict[str, Any]) -> None:
+    """
+    Incorpora ao resumo as mensagens mais antigas fora da janela recente
+    """
+    try:
+        messages = await get_chat_messages_after(
+            user_id,
+            idea_id,
+            state.get("summarized_until"),
+            CHAT_MEMORY_FOLD_MAX_MESSAGES + CHAT_MEMORY_RECENT_MESSAGES
+        )
+        to_fold = messages[:max(0, len(messages) - CHAT_MEMORY_RECENT_MESSAGES)]
+        to_fold = to_fold[:CHAT_MEMORY_FOLD_MAX_MESSAGES]
+        if len(to_fold) < CHAT_MEMORY_SUMMARY_EVERY:
+            return
+
+        summary = await summarize_conversation(state.get("summary", ""), to_fold)
+        if not summary:
+            return
+
+        saved = await save_chat_memory(user_id, idea_id, {
+            "summary": summary,
+            "summarized_until": to_fold[-1]["timestamp"],
+            "summarized_messages": state.get("summarized_messages", 0) + len(to_fold),
+            "updated_at": datetime.now()
+        })
+        if saved:
+            print(f"[INFO] Resumo da conversa atualizado ({len(to_fold)} mensagem(ns) incorporada(s))")
+    except Exception as e:
+        print(f"[AVISO] Erro ao atualizar resumo da conversa: {e}")
@@ -0,0 +1,177 @@
+"""
+Pré-geração de Sugestões dos Campos Opcionais
+Depois de um autosave que muda o conteúdo da ideia, gera em segundo plano
+(em uma única chamada ao LLM) as sugestões dos campos opcionais ainda
+vazios e guarda o resultado pela versão da ideia (services/db.idea_version).
+O /suggest-field responde na hora enquanto essa versão ainda confere e o
+formulário enviado não tem edições ainda não salvas.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app_config import (
+    OPTIONAL_SUGGESTION_FIELDS,
+    SUGGESTION_PREFETCH_ENABLED,
+    SUGGESTION_PREFETCH_DELAY_SECONDS,
+    SUGGESTION_PREFETCH_MAX_ENTRIES,
+    SUGGESTION_PREFETCH_TTL_SECONDS
+)
+from services.cache import TTLCache
+from services.db import get_idea_context, idea_version
+from .agent import generate_field_suggestions
+
+# Campos da ideia que mudam as sugestões (status, timestamps etc. não contam)
+_CONTENT_FIELDS = ("title", "description", "target_audience", "dynamic_content")
+# Campos do formulário gravados fora de dynamic_content (ver FormPage)
+_FORM_TO_IDEA_FIELDS = {"ideaTitle": "title", "ideaDescription": "description", "publicoAlvo": "target_audience"}
+
+# (user_id, idea_id) -> {"version": ..., "suggestions": {campo: sugestão}}
+_store = TTLCache(SUGGESTION_PREFETCH_MAX_ENTRIES, SUGGESTION_PREFETCH_TTL_SECONDS, name="field_prefetch")
+
+# Ideias com pré-geração em andamento e as que mudaram de novo durante ela
+_running: Set[Tuple[str, str]] = set()
+_rerun: Set[Tuple[str, str]] = set()
+# Referências fortes às tarefas em segundo plano (evita coleta pelo GC)
+_background_tasks: Set["asyncio.Task"] = set()
+
+# ============================================
+# CAMPOS
+# ============================================
+
+def is_material_update(update_data: Dict[str, Any]) -> bool:
+    """
+    Diz se um autosave mexeu no conteúdo da ideia (e não só no status)
+    """
+    return any(field in update_data for field in _CONTENT_FIELDS)
+
+def form_matches_idea(form_data: Optional[Dict[str, Any]], idea_context: Dict[str, Any]) -> bool:
+    """
+    Diz se o formulário enviado tem o mesmo conteúdo da ideia salva
+
+    As sugestões pré-geradas só leem a ideia salva; se o formulário tiver
+    edições ainda não salvas, a sugestão precisa ser gerada com elas.
+    """
+    dynamic = idea_context.get("dynamic_content") or {}
+    for key, value in (form_data or {}).items():
+        field = _FORM_TO_IDEA_FIELDS.get(key)
+        stored = idea_context.get(field) if field else dynamic.get(key)
+        if (value or "") != (stored or ""):
+            return False
+    return True
+
+def empty_optional_fields(idea_context: Dict[str, Any]) -> List[str]:
+    """
+    Retorna os campos opcionais ainda vazios na ideia salva
+    """
+    dynamic = idea_context.get("dynamic_content") or {}
+    empty = []
+    for field in OPTIONAL_SUGGESTION_FIELDS:
+        value = dynamic.get(field)
+        if field == "publicoAlvo":
+            value = value or idea_context.get("target_audience")
+        if not value or not str(value).strip():
+            empty.append(field)
+    return empty
+
+# ============================================
+# PRÉ-GERAÇÃO
+# ============================================
+
+def schedule_suggestion_prefetch(user_id: str, idea_id: str) -> None:
+    """
+    Agenda a pré-geração das sugestões da ideia (não bloqueia o autosave)
+
+    Se já houver uma pré-geração em andamento para a ideia, ela é refeita
+    ao terminar, com o conteúdo mais recente.
+
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+    """
+    if not SUGGESTION_PREFETCH_ENABLED:
+        return
+
+    key = (user_id, idea_id)
+    if key in _running:
+        _rerun.add(key)
+        return
+
+    _running.add(key)
+    task = asyncio.create_task(_prefetch(user_id, idea_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    task.add_done_callback(lambda _: _finish(key))
+
+def _finish(key: Tuple[str, str]) -> None:
+    _running.discard(key)
+    if key in _rerun:
+        _rerun.discard(key)
+        schedule_suggestion_prefetch(*key)
+
+async def _prefetch(user_id: str, idea_id: str) -> None:
+    """
+    Gera e guarda as sugestões dos campos opcionais vazios da versão atual
+    """
+    try:
+        # Autosaves seguidos (digitação) se acomodam antes de gastar uma chamada
+        await asyncio.sleep(SUGGESTION_PREFETCH_DELAY_SECONDS)
+        if (user_id, idea_id) in _rerun:
+            return
+
+        idea_context = await get_idea_context(user_id, idea_id)
+        if not idea_context:
+            return
+
+        key = (user_id, idea_id)
+        version = idea_version(idea_context)
+        cached = _store.get(key)
+        if cached and cached["version"] == version:
+            return
+
+        fields = empty_optional_fields(idea_context)
+        if not fields:
+            _store.invalidate(key)
+            return
+
+        suggestions = await generate_field_suggestions(idea_context, None, fields)
+        # Campos que falharam (confiança 0) ficam de fora e são gerados sob demanda
+        ready = {field: data for field, data in suggestions.items() if data.get("confidence")}
+        if ready:
+            _store.set(key, {"version": version, "suggestions": ready})
+    except Exception as e:
+        print(f"[AVISO] Falha ao pré-gerar sugestões da ideia {idea_id}: {e}")
+
+def get_prefetched_suggestion(
+    user_id: str,
+    idea_id: str,
+    field_name: str,
+    idea_context: Dict[str, Any],
+    form_data: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Busca a sugestão pré-gerada de um campo, se ainda for da versão atual da ideia
+
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        field_name: Campo opcional pedido
+        idea_context: Dados atuais da ideia (para conferir a versão)
+        form_data: Formulário enviado na requisição (se diferir da ideia salva,
+            a sugestão pré-gerada não vale)
+
+    Returns:
+        Sugestão {"field", "suggestion", "reasoning", "confidence"} ou None
+    """
+    entry = _store.get((user_id, idea_id))
+    if not entry or entry["version"] != idea_version(idea_context):
+        return None
+    if not form_matches_idea(form_data, idea_context):
+        return None
+    suggestion = entry["suggestions"].get(field_name)
+    return dict(suggestion) if suggestion else None
+
+def get_prefetch_stats() -> Dict[str, Any]:
+    """
+    Retorna uso do armazenamento de sugestões pré-geradas
+    """
+    return dict(_store.stats(), enabled=SUGGESTION_PREFETCH_ENABLED, running=len(_running))
@@ -2,18 +2,82 @@
 Prompts do Agente de Ideia (JuniBox)
 Sistema de assistência para ideação
 """
-from .knowledge_loader import load_ideia_knowledge
+from typing import Optional
+from app_config import KNOWLEDGE_RETRIEVAL_ENABLED, KNOWLEDGE_RETRIEVAL_TOP_K, KNOWLEDGE_STATIC_FILES
+from config.prompt_registry import prompt_registry
+from services.retrieval import build_index, format_chunks
+from .knowledge_loader import load_ideia_knowledge, load_ideia_knowledge_files, KNOWLEDGE_DIR
 
 def get_ideia_prompt() -> str:
     """
     Retorna o prompt do Agente de Ideia (JuniBox) com conhecimento carregado
+    
+    O prompt é compilado uma vez e só é recompilado quando algum arquivo
+    de knowledge/ muda (ver config/prompt_registry.py). Com a recuperação
+    ativa as chamadas usam get_ideia_static_prompt e
+    get_ideia_knowledge_context no lugar dele.
     """
-    # Carrega conhecimento específico do Agente de Ideia
-    knowledge = load_ideia_knowledge()
+    return prompt_registry.get("ideia")
+
+def get_ideia_static_prompt() -> str:
+    """
+    Retorna o prefixo estático do Agente de Ideia
     
-    # Prompt base do Agente de Ideia
-    # NOTA: Moderação é responsabilidade do Agente Filtrador, não precisa aqui
-    base_prompt = """Você é o avaliador oficial de ideias da CAIXA Econômica Federal no programa Sandbox.
+    É a primeira mensagem de TODA chamada ao LLM e precisa ser idêntica
+    byte a byte entre usuários e mensagens, para que o provedor possa
+    reaproveitar o cache de prefixo. Nada que varie por usuário, ideia ou
+    mensagem pode entrar aqui: isso vai em get_ideia_knowledge_context e no
+    contexto da ideia, em mensagens posteriores.
+    
+    Com a recuperação ativa o prefixo é o prompt base com os arquivos de
+    KNOWLEDGE_STATIC_FILES (regras, fluxo e critérios, que valem para toda
+    conversa); sem ela, é o prompt completo com toda a base de conhecimento.
+    """
+    if KNOWLEDGE_RETRIEVAL_ENABLED:
+        return prompt_registry.get("ideia_static")
+    return prompt_registry.get("ideia")
+
+def get_ideia_static_prompt_hash() -> str:
+    """
+    Retorna um hash curto e estável do prefixo estático
+    (muda apenas quando o prompt base ou a base de conhecimento mudam)
+    """
+    if KNOWLEDGE_RETRIEVAL_ENABLED:
+        return prompt_registry.version("ideia_static")
+    return prompt_registry.version("ideia")
+
+def get_ideia_knowledge_context(query: Optional[str]) -> str:
+    """
+    Retorna os trechos da base de conhecimento relevantes para a vez
+    
+    Só recupera dos arquivos que NÃO estão no prefixo estático. Vazio quando
+    a recuperação está desligada (a base inteira já está no prefixo) ou
+    quando nenhum trecho é relevante.
+    
+    Args:
+        query: Texto da vez (mensagem, seção do formulário)
+    """
+    if not KNOWLEDGE_RETRIEVAL_ENABLED or not query:
+        return ""
+    
+    chunks = prompt_registry.get("ideia_index").search(query, KNOWLEDGE_RETRIEVAL_TOP_K)
+    if not chunks:
+        return ""
+    
+    return f"""BASE DE CONHECIMENTO DO AGENTE DE IDEIA (trechos relevantes):
+{format_chunks(chunks)}
+
+Use essas informações como referência ao avaliar ideias, guiar usuários e responder perguntas."""
+
+def get_ideia_prompt_version() -> str:
+    """
+    Retorna um hash curto do prompt compilado do Agente de Ideia
+    """
+    return prompt_registry.version("ideia")
+
+# Prompt base do Agente de Ideia
+# NOTA: Moderação é responsabilidade do Agente Filtrador, não precisa aqui
+_IDEIA_BASE_PROMPT = """Você é o avaliador oficial de ideias da CAIXA Econômica Federal no programa Sandbox.
 Seu nome é JuniBox.
 
 Sua função é:
@@ -28,8 +92,11 @@ Sua função é:
 8. Focar apenas em ideias para a CAIXA.
 
 IMPORTANTE: O conteúdo já foi validado pelo Agente Filtrador antes de chegar aqui, então você pode focar apenas em ajudar na ideação e estruturação da proposta."""
-    
-    # Injeta conhecimento carregado no prompt
+
+def _with_knowledge(base_prompt: str, knowledge: str) -> str:
+    """
+    Injeta a base de conhecimento completa no prompt base
+    """
     if knowledge:
         base_prompt += f"""
 
@@ -43,3 +110,30 @@ Use essas informações como referência ao avaliar ideias, guiar usuários e re
     
     return base_prompt.strip()
 
+def _build_ideia_prompt() -> str:
+    """
+    Monta o prompt completo do Agente de Ideia (lê a base de conhecimento)
+    """
+    # Carrega conhecimento específico do Agente de Ideia
+    knowledge = load_ideia_knowledge()
+    return _with_knowledge(_IDEIA_BASE_PROMPT, knowledge)
+
+def _build_ideia_static_prompt() -> str:
+    """
+    Monta o prefixo estático: prompt base + arquivos de KNOWLEDGE_STATIC_FILES
+    """
+    return _with_knowledge(_IDEIA_BASE_PROMPT, load_ideia_knowledge(KNOWLEDGE_STATIC_FILES))
+
+def _load_retrievable_files():
+    """
+    Arquivos recuperados por mensagem (os que não estão no prefixo estático)
+    """
+    return [(name, content) for name, content in load_ideia_knowledge_files() if name not in KNOWLEDGE_STATIC_FILES]
+
+prompt_registry.register("ideia", KNOWLEDGE_DIR, _build_ideia_prompt)
+prompt_registry.register("ideia_static", KNOWLEDGE_DIR, _build_ideia_static_prompt)
+prompt_registry.register(
+    "ideia_index",
+    KNOWLEDGE_DIR,
+    lambda: build_index("ideia", KNOWLEDGE_DIR, _load_retrievable_files, exclude=KNOWLEDGE_STATIC_FILES)
+)
@@ -3,29 +3,39 @@ Rotas do Agente de Ideia (JuniBox)
 Endpoints para assistência na ideação
 """
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from schemas import (
     ChatRequest, 
     ChatRequestResponse, 
     ChatMessage, 
     ChatResponse, 
     FieldSuggestionRequest,
-    FieldSuggestionResponse
+    FieldSuggestionResponse,
+    FieldsSuggestionRequest,
+    FieldsSuggestionResponse
 )
 from services.db import (
     save_chat_message,
-    get_chat_history,
+    commit_chat_turn,
     get_idea_context,
     clear_chat_history
 )
 from .agent import (
     get_response,
     generate_response,
-    generate_idea_suggestions,
-    validate_idea_completeness,
-    generate_field_suggestion
+    generate_field_suggestion,
+    generate_field_suggestions,
+    stream_response,
+    stream_generate_response,
+    get_prefix_stats
 )
+from services.completeness import validate_idea_completeness
+from .memory import load_memory, schedule_memory_update
+from .prefetch import get_prefetched_suggestion, get_prefetch_stats
+from .suggestion_cache import get_cached_idea_suggestions, get_suggestion_cache_stats
+from app_config import OPTIONAL_SUGGESTION_FIELDS
+from services.sse import sse_chat_stream, SSE_HEADERS
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
 
 router = APIRouter(prefix="/ideia", tags=["Agente de Ideia"])
 
@@ -34,7 +44,7 @@ router = APIRouter(prefix="/ideia", tags=["Agente de Ideia"])
 # ============================================
 
 @router.post("/chat", response_model=ChatRequestResponse, summary="Chat simplificado com Agente de Ideia")
-def chat_simple(request: ChatRequest):
+async def chat_simple(request: ChatRequest):
     """
     **Endpoint Simplificado** - Chat básico sem necessidade de Firebase
     
@@ -52,49 +62,71 @@ def chat_simple(request: ChatRequest):
             detail="A mensagem não pode estar vazia."
         )
     
-    response_text = get_response(request.message, request.history)
+    response_text = await get_response(request.message, request.history)
     
     return {"response": response_text}
 
+@router.post("/chat/stream", summary="Chat simplificado com Agente de Ideia (streaming SSE)")
+async def chat_simple_stream(request: ChatRequest):
+    """
+    Versão em streaming do chat simplificado
+    
+    Retorna `text/event-stream` com eventos `token`, `done` ou `error`.
+    """
+    if not request.message or not request.message.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="A mensagem não pode estar vazia."
+        )
+    
+    return StreamingResponse(
+        sse_chat_stream(stream_response(request.message, request.history)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 # ============================================
 # ENDPOINTS AVANÇADOS (COM FIREBASE)
 # ============================================
 
 @router.post("/send", response_model=ChatResponse)
-def endpoint_chat(payload: ChatMessage):
+async def endpoint_chat(payload: ChatMessage):
     """
     Envia uma mensagem para o Agente de Ideia e recebe uma resposta
     
     **Fluxo:**
-    1. Salva a mensagem do usuário no Firestore
-    2. Busca o contexto da ideia e histórico de chat
-    3. Gera resposta usando Groq AI (Llama 3) com contexto do formulário
-    4. Salva a resposta da IA no Firestore
-    5. Retorna a resposta para o frontend
+    1. Busca o contexto da ideia e o histórico (resumo + mensagens recentes)
+    2. Gera resposta usando Groq AI (Llama 3) com contexto do formulário
+    3. Salva a mensagem do usuário e a resposta da IA numa única escrita em
+       lote (com o `last_updated` da ideia)
+    4. Retorna a resposta para o frontend
     """
     try:
-        # 1. Salva mensagem do usuário
-        save_chat_message(payload.user_id, payload.idea_id, "user", payload.message)
-        
-        # 2. Busca contexto em paralelo (otimização)
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            history_future = executor.submit(get_chat_history, payload.user_id, payload.idea_id)
-            idea_future = executor.submit(get_idea_context, payload.user_id, payload.idea_id)
-            history = history_future.result()
-            idea_data = idea_future.result()
-        
-        # 3. Gera resposta da IA com contexto do formulário
-        response = generate_response(
+        received_at = datetime.now()
+        
+        # 1. Busca contexto e histórico dentro do orçamento de tokens
+        # (antes de salvar, para não duplicar a mensagem atual)
+        memory = await load_memory(payload.user_id, payload.idea_id)
+        
+        # 2. Gera resposta da IA com contexto do formulário
+        response = await generate_response(
             payload.message, 
-            history, 
-            idea_data,
+            memory.history, 
+            memory.idea_context,
             form_context=payload.form_context
         )
         
-        # 4. Salva resposta da IA
-        save_chat_message(payload.user_id, payload.idea_id, "assistant", response)
+        # 3. Salva o turno inteiro e atualiza o resumo da conversa se necessário
+        await commit_chat_turn(
+            payload.user_id,
+            payload.idea_id,
+            payload.message,
+            response,
+            user_timestamp=received_at
+        )
+        schedule_memory_update(payload.user_id, payload.idea_id, memory)
         
-        # 5. Retorna resposta
+        # 4. Retorna resposta
         return {
             "response": response,
             "timestamp": datetime.now()
@@ -106,8 +138,49 @@ def endpoint_chat(payload: ChatMessage):
             detail=f"Erro ao processar mensagem: {str(e)}"
         )
 
+@router.post("/send/stream")
+async def endpoint_chat_stream(payload: ChatMessage):
+    """
+    Versão em streaming de `/send` (Server-Sent Events)
+    
+    Eventos `token` (trechos da resposta), `done` (resposta completa) ou
+    `error`. A resposta é salva no Firestore quando o stream termina ou
+    quando o cliente desconecta (com o texto gerado até ali).
+    """
+    try:
+        # 1. Busca contexto e histórico (antes de salvar, para não duplicar a mensagem atual)
+        memory = await load_memory(payload.user_id, payload.idea_id)
+        
+        # 2. Salva mensagem do usuário
+        await save_chat_message(payload.user_id, payload.idea_id, "user", payload.message)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao processar mensagem: {str(e)}"
+        )
+    
+    # 3. Salva a resposta da IA quando o stream terminar (ou for abortado)
+    async def _save_response(response: str, completed: bool) -> None:
+        # A mensagem do usuário já foi salva: o lote grava a resposta e o last_updated da ideia
+        await commit_chat_turn(payload.user_id, payload.idea_id, None, response)
+        schedule_memory_update(payload.user_id, payload.idea_id, memory)
+    
+    return StreamingResponse(
+        sse_chat_stream(
+            stream_generate_response(
+                payload.message,
+                memory.history,
+                memory.idea_context,
+                form_context=payload.form_context
+            ),
+            on_finish=_save_response
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @router.post("/suggest-field", response_model=FieldSuggestionResponse)
-def suggest_field_endpoint(payload: FieldSuggestionRequest):
+async def suggest_field_endpoint(payload: FieldSuggestionRequest):
     """
     Gera sugestão para um campo específico do formulário
     
@@ -116,15 +189,19 @@ def suggest_field_endpoint(payload: FieldSuggestionRequest):
     """
     try:
         # Validar que o campo é opcional
-        optional_fields = ["publicoAlvo", "metricas", "resultadosEsperados"]
-        if payload.field_name not in optional_fields:
+        if payload.field_name not in OPTIONAL_SUGGESTION_FIELDS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Campo '{payload.field_name}' não é opcional. Apenas campos opcionais podem receber sugestões da IA."
             )
         
         # Buscar contexto da ideia
-        idea_context = get_idea_context(payload.user_id, payload.idea_id)
+        idea_context = await get_idea_context(payload.user_id, payload.idea_id)
+        
+        # Sugestão pré-gerada após o último autosave (mesma versão da ideia)
+        prefetched = get_prefetched_suggestion(payload.user_id, payload.idea_id, payload.field_name, idea_context)
+        if prefetched:
+            return prefetched
         
         # Preparar contexto do formulário
         step_names = ["Sua Ideia", "Objetivos e Metas", "Cronograma"]
@@ -137,7 +214,7 @@ def suggest_field_endpoint(payload: FieldSuggestionRequest):
         }
         
         # Gerar sugestão
-        suggestion = generate_field_suggestion(
+        suggestion = await generate_field_suggestion(
             idea_context,
             form_context,
             payload.field_name
@@ -153,14 +230,70 @@ def suggest_field_endpoint(payload: FieldSuggestionRequest):
             detail=f"Erro ao gerar sugestão: {str(e)}"
         )
 
+@router.post("/suggest-fields", response_model=FieldsSuggestionResponse)
+async def suggest_fields_endpoint(payload: FieldsSuggestionRequest):
+    """
+    Gera sugestões para vários campos opcionais em uma única chamada ao LLM
+    
+    O prompt e o contexto da ideia são enviados uma vez só, em vez de uma
+    chamada por campo. Campos já pré-gerados após o último autosave (mesma
+    versão da ideia) não voltam ao LLM.
+    
+    **Parâmetros:**
+    - **field_names**: Campos opcionais (publicoAlvo, metricas, resultadosEsperados)
+    - **form_data**: Dados atuais do formulário
+    - **current_step**: Índice da seção atual
+    """
+    # Validar que todos os campos são opcionais (sem repetição, na ordem pedida)
+    field_names = list(dict.fromkeys(payload.field_names))
+    invalid_fields = [field for field in field_names if field not in OPTIONAL_SUGGESTION_FIELDS]
+    if invalid_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campo(s) {', '.join(repr(field) for field in invalid_fields)} não são opcionais. Apenas campos opcionais podem receber sugestões da IA."
+        )
+    
+    try:
+        idea_context = await get_idea_context(payload.user_id, payload.idea_id)
+        
+        suggestions = {}
+        for field in field_names:
+            prefetched = get_prefetched_suggestion(payload.user_id, payload.idea_id, field, idea_context)
+            if prefetched:
+                suggestions[field] = prefetched
+        
+        missing_fields = [field for field in field_names if field not in suggestions]
+        if missing_fields:
+            step_names = ["Sua Ideia", "Objetivos e Metas", "Cronograma"]
+            step_name = step_names[payload.current_step] if 0 <= payload.current_step < len(step_names) else "Desconhecida"
+            
+            form_context = {
+                "form_data": payload.form_data,
+                "current_step": payload.current_step,
+                "step_name": step_name
+            }
+            suggestions.update(await generate_field_suggestions(idea_context, form_context, missing_fields))
+        
+        return {
+            "idea_id": payload.idea_id,
+            "suggestions": [suggestions[field] for field in field_names]
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao gerar sugestões: {str(e)}"
+        )
+
 @router.get("/suggestions/{user_id}/{idea_id}")
-def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
+async def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
     """
     Gera sugestões automáticas para melhorar a ideia
     """
     try:
-        idea_context = get_idea_context(user_id, idea_id)
-        suggestions = generate_idea_suggestions(idea_context)
+        idea_context = await get_idea_context(user_id, idea_id)
+        # Mesma versão da ideia e do prompt: responde do cache
+        suggestions = await get_cached_idea_suggestions(user_id, idea_id, idea_context)
         
         return {
             "idea_id": idea_id,
@@ -173,12 +306,12 @@ def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
         )
 
 @router.get("/validate/{user_id}/{idea_id}")
-def validate_idea_endpoint(user_id: str, idea_id: str):
+async def validate_idea_endpoint(user_id: str, idea_id: str):
     """
     Valida a completude da ideia
     """
     try:
-        idea_context = get_idea_context(user_id, idea_id)
+        idea_context = await get_idea_context(user_id, idea_id)
         validation = validate_idea_completeness(idea_context)
         
         return {
@@ -191,3 +324,27 @@ def validate_idea_endpoint(user_id: str, idea_id: str):
             detail=f"Erro ao validar ideia: {str(e)}"
         )
 
+@router.get("/prompt/stats")
+async def prompt_prefix_stats_endpoint():
+    """
+    Retorna o hash do prefixo estático do prompt e as verificações de estabilidade
+    
+    O hash só deve mudar quando o prompt base ou a base de conhecimento
+    mudam. `mismatches` > 0 indica alguma montagem de prompt que não começa
+    pelo prefixo estático (e perde o cache de prefixo do provedor).
+    """
+    return get_prefix_stats()
+
+@router.get("/cache/stats")
+async def suggestion_cache_stats_endpoint():
+    """
+    Retorna o uso dos caches de sugestões do Agente de Ideia
+    
+    - **suggestions**: sugestões gerais por versão da ideia (`stale_hits` foram
+      respondidas com a versão anterior enquanto a nova era gerada)
+    - **field_prefetch**: sugestões de campos opcionais pré-geradas após o autosave
+    """
+    return {
+        "suggestions": get_suggestion_cache_stats(),
+        "field_prefetch": get_prefetch_stats()
+    }
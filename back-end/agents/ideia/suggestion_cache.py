@@ -0,0 +1,50 @@
+"""
+Cache das Sugestões Gerais da Ideia
+As sugestões de melhoria só mudam quando a ideia ou o prompt mudam: ficam em
+cache pela versão da ideia (services/db.idea_version) + versão do prompt, com
+stale-while-revalidate. Visualizações repetidas não chamam o LLM e, depois de
+uma edição, a versão anterior é servida enquanto a nova é gerada.
+"""
+from typing import Any, Dict, List
+
+from app_config import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_FRESH_SECONDS,
+    RESPONSE_CACHE_MAX_STALE_SECONDS
+)
+from services.cache import StaleWhileRevalidateCache
+from services.db import idea_version
+from .agent import generate_idea_suggestions, is_fallback_suggestions
+from .prompts import get_ideia_prompt_version
+
+_responses = StaleWhileRevalidateCache(
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_FRESH_SECONDS,
+    RESPONSE_CACHE_MAX_STALE_SECONDS,
+    name="idea_suggestions"
+)
+
+async def get_cached_idea_suggestions(user_id: str, idea_id: str, idea_context: Dict[str, Any]) -> List[str]:
+    """
+    Retorna as sugestões gerais da ideia, do cache quando possível
+
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        idea_context: Dados atuais da ideia (definem a versão)
+
+    Returns:
+        Lista de sugestões (pode ser da versão anterior enquanto a nova é gerada)
+    """
+    return await _responses.get_or_compute(
+        ("suggestions", user_id, idea_id),
+        (idea_version(idea_context), get_ideia_prompt_version()),
+        lambda: generate_idea_suggestions(idea_context),
+        cacheable=lambda suggestions: not is_fallback_suggestions(suggestions)
+    )
+
+def get_suggestion_cache_stats() -> Dict[str, Any]:
+    """
+    Retorna os contadores do cache de sugestões gerais
+    """
+    return _responses.stats()
@@ -52,10 +52,188 @@ MODEL_NAME = "llama-3.3-70b-versatile"
 TEMPERATURE = 0.2  # Baixa criatividade para seguir regras
 MAX_HISTORY_MESSAGES = 10
 
+# Roteamento de modelos por tarefa (ver services/model_router.py)
+# Tarefas curtas/estruturadas usam o modelo pequeno; o grande (MODEL_NAME) fica
+# com o chat e com as respostas do pequeno que vierem inválidas ou incertas
+MODEL_SMALL_NAME = os.getenv("MODEL_SMALL_NAME", "llama-3.1-8b-instant")
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+MODEL_TASK_TIERS = {
+    "moderation": "small",
+    "moderation_batch": "small",
+    "suggestions": "small",
+    "field_suggestion": "small",
+    "summary": "small",
+    "chat": "large"
+}
+# Respostas do modelo pequeno com "confidence" abaixo disso são refeitas no grande
+MODEL_ESCALATION_MIN_CONFIDENCE = 0.6
+# Chamadas simultâneas idênticas ao LLM compartilham uma única resposta (single-flight)
+LLM_COALESCING_ENABLED = os.getenv("LLM_COALESCING_ENABLED", "true").lower() == "true"
+
+# Cliente LLM resiliente (ver services/llm_client.py)
+# Prazo padrão de cada chamada, incluindo as novas tentativas
+LLM_DEADLINE_SECONDS = 30
+# Novas tentativas em 429/5xx (backoff exponencial com jitter, respeitando retry-after)
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE_SECONDS = 0.5
+LLM_RETRY_MAX_SECONDS = 8
+# Requisição duplicada ("hedge") quando a primeira passa do p95 de latência do modelo
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = 20
+# Circuit breaker por modelo: falhas seguidas para abrir e tempo até testar de novo
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_SECONDS = 30
+
+# Cota do provedor por modelo (ver services/rate_limiter.py)
+# Ligada por padrão com os limites do plano gratuito da Groq (o menor plano):
+# em contas com plano maior, ajuste LLM_RPM_LIMIT/LLM_TPM_LIMIT para não
+# enfileirar tráfego que a conta comportaria
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "30"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "6000"))
+# Fração do max_tokens reservada como resposta na estimativa de tokens da
+# chamada (o consumo real do `usage` corrige a diferença depois)
+LLM_COMPLETION_TOKEN_SHARE = 0.3
+# Prioridade de cada tarefa na fila da cota (0 = mais urgente)
+# 0: moderação que bloqueia um salvamento | 1: chat | 2: sugestões e resumos
+LLM_TASK_PRIORITIES = {
+    "moderation": 0,
+    "moderation_batch": 0,
+    "chat": 1,
+    "suggestions": 2,
+    "field_suggestion": 2,
+    "summary": 2
+}
+# Espera máxima na fila por prioridade; acima disso a chamada é descartada
+# (as de menor prioridade desistem antes e liberam a cota para as urgentes)
+LLM_PRIORITY_MAX_WAIT_SECONDS = {0: 10.0, 1: 8.0, 2: 2.0}
+
 # NOTA: Prompts agora estão em agents/filtrador/prompts.py e agents/ideia/prompts.py
 
+# Intervalo mínimo (segundos) entre verificações de mudança nas pastas knowledge/
+PROMPT_REGISTRY_CHECK_SECONDS = 2.0
+
+# ============================================
+# BASE DE CONHECIMENTO (RECUPERAÇÃO)
+# ============================================
+# Injeta no prompt apenas os trechos da base de conhecimento relevantes para a
+# mensagem atual (índice BM25) em vez de todos os arquivos de knowledge/
+KNOWLEDGE_RETRIEVAL_ENABLED = os.getenv("KNOWLEDGE_RETRIEVAL_ENABLED", "true").lower() == "true"
+# Arquivos que valem para toda conversa (regras, fluxo, critérios): vão
+# sempre no prefixo estático do prompt (cacheável pelo provedor). Só os
+# demais arquivos são indexados e recuperados por mensagem.
+KNOWLEDGE_STATIC_FILES = ("regras_interacao.txt", "fluxo_entrevista.txt", "criterios_avaliacao.txt")
+KNOWLEDGE_RETRIEVAL_TOP_K = 4
+KNOWLEDGE_CHUNK_MAX_CHARS = 900
+# Pasta onde os índices são salvos (reconstruídos só quando o conteúdo muda)
+KNOWLEDGE_INDEX_DIR = os.getenv("KNOWLEDGE_INDEX_DIR", os.path.join(_base_dir, ".cache", "retrieval"))
+
+# ============================================
+# CONFIGURAÇÕES DO AGENTE FILTRADOR
+# ============================================
+# Pré-filtro léxico local (roda antes da chamada ao LLM)
+FILTRADOR_LEXICAL_ENABLED = os.getenv("FILTRADOR_LEXICAL_ENABLED", "true").lower() == "true"
+# Se True, conteúdo sem nenhum termo da lista é aprovado localmente, sem chamar o LLM.
+# Desligado por padrão: só o LLM detecta críticas destrutivas e conteúdo sem sentido.
+FILTRADOR_LEXICAL_TRUST_CLEAN = os.getenv("FILTRADOR_LEXICAL_TRUST_CLEAN", "false").lower() == "true"
+# Cache de vereditos (evita re-moderar o mesmo conteúdo a cada autosave)
+FILTRADOR_CACHE_MAX_ENTRIES = 5000
+FILTRADOR_CACHE_TTL_SECONDS = 60 * 60
+# Orçamento de conteúdo (caracteres) por prompt de moderação em lote;
+# acima disso os campos são divididos em lotes analisados em paralelo
+FILTRADOR_BATCH_MAX_CHARS = 6000
+# Análises simultâneas por requisição e prazo total da moderação
+FILTRADOR_MAX_CONCURRENCY = 4
+FILTRADOR_DEADLINE_SECONDS = 10
+
+# ============================================
+# CONFIGURAÇÕES DO CHAT
+# ============================================
+# Gera a resposta do Agente de Ideia em paralelo com a moderação do Agente Filtrador
+CHAT_SPECULATIVE_GENERATION = os.getenv("CHAT_SPECULATIVE_GENERATION", "true").lower() == "true"
+
+# Memória de conversa do Agente de Ideia (ver agents/ideia/memory.py)
+# Orçamento de tokens do histórico enviado ao LLM (resumo + mensagens recentes)
+CHAT_MEMORY_TOKEN_BUDGET = 2000
+# Mensagens mais recentes que nunca entram no resumo (ficam sempre literais)
+CHAT_MEMORY_RECENT_MESSAGES = 6
+# O resumo é atualizado quando acumulam N mensagens fora da janela recente
+CHAT_MEMORY_SUMMARY_EVERY = 10
+# Máximo de mensagens incorporadas ao resumo em uma única atualização
+CHAT_MEMORY_FOLD_MAX_MESSAGES = 50
+# Tamanho máximo do resumo gerado pelo LLM
+CHAT_MEMORY_SUMMARY_MAX_TOKENS = 400
+
+# ============================================
+# CONFIGURAÇÕES DE SUGESTÕES
+# ============================================
+# Campos opcionais que podem receber sugestão da IA (os obrigatórios são do usuário)
+OPTIONAL_SUGGESTION_FIELDS = ["publicoAlvo", "metricas", "resultadosEsperados"]
+# Pré-geração das sugestões dos campos opcionais vazios após o autosave (ver agents/ideia/prefetch.py)
+SUGGESTION_PREFETCH_ENABLED = os.getenv("SUGGESTION_PREFETCH_ENABLED", "true").lower() == "true"
+# Espera após o autosave para autosaves seguidos se acomodarem antes de gerar
+SUGGESTION_PREFETCH_DELAY_SECONDS = 2.0
+SUGGESTION_PREFETCH_MAX_ENTRIES = 2000
+SUGGESTION_PREFETCH_TTL_SECONDS = 6 * 60 * 60
+# Cache das sugestões gerais por versão da ideia + versão do prompt (stale-while-revalidate)
+# Dentro de FRESH responde do cache; depois disso, ou se a ideia mudou, responde
+# a versão anterior na hora e recalcula em segundo plano (até MAX_STALE)
+RESPONSE_CACHE_MAX_ENTRIES = 2000
+RESPONSE_CACHE_FRESH_SECONDS = 60 * 60
+RESPONSE_CACHE_MAX_STALE_SECONDS = 24 * 60 * 60
+
+# ============================================
+# TRACING
+# ============================================
+# Spans por etapa de cada requisição (ver services/tracing.py); as etapas
+# também voltam no header Server-Timing
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Destino dos traces: "none", "jsonl" (arquivo local) ou "otlp" (coletor OpenTelemetry)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_JSONL_PATH = os.getenv("TRACING_JSONL_PATH", os.path.join(_base_dir, ".cache", "traces.jsonl"))
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+
 # ============================================
 # CONFIGURAÇÕES DE AUTOSAVE
 # ============================================
+# Janela do buffer de autosave (ver services/db.py): os autosaves de uma ideia
+# nesse intervalo viram uma única escrita no Firestore
 AUTOSAVE_DEBOUNCE_SECONDS = 3
+AUTOSAVE_WRITE_BEHIND_ENABLED = os.getenv("AUTOSAVE_WRITE_BEHIND_ENABLED", "true").lower() == "true"
+# Gravações com erro nunca descartam os campos: o buffer tenta de novo com
+# espera crescente (até AUTOSAVE_RETRY_MAX_SECONDS). Depois de
+# AUTOSAVE_MAX_FLUSH_FAILURES falhas seguidas, o próximo autosave da ideia
+# grava na hora e devolve o erro ao cliente
+AUTOSAVE_MAX_FLUSH_FAILURES = 3
+AUTOSAVE_RETRY_MAX_SECONDS = 60
+
+# ============================================
+# LISTAGEM DE IDEIAS
+# ============================================
+# GET /api/ideas/{user_id} devolve páginas de resumos (sem o conteúdo das
+# ideias), com cursor para a próxima página
+IDEA_LIST_DEFAULT_LIMIT = 50
+IDEA_LIST_MAX_LIMIT = 100
+
+# ============================================
+# CACHE DE LEITURA DO FIRESTORE
+# ============================================
+# Documentos das ideias e o fim do histórico de chat ficam em memória
+# (LRU + TTL, ver services/db.py). As escritas deste processo atualizam o
+# cache na hora; o TTL limita o atraso para escritas de outros processos.
+DB_CACHE_ENABLED = os.getenv("DB_CACHE_ENABLED", "true").lower() == "true"
+DB_CACHE_MAX_ENTRIES = 1000
+DB_CACHE_TTL_SECONDS = 5 * 60
+# Máximo de mensagens recentes guardadas por conversa
+DB_CACHE_CHAT_TAIL_MESSAGES = 50
+
+# ============================================
+# EXCLUSÃO EM LOTE
+# ============================================
+# O chat de uma ideia é apagado em páginas de IDs; cada página vira lotes
+# (WriteBatch, máx. 500 operações) enviados em paralelo
+BULK_DELETE_PAGE_SIZE = 1000
+BULK_DELETE_BATCH_SIZE = 250
+# Tempo que o progresso de uma tarefa concluída fica disponível para consulta
+BACKGROUND_JOB_RETENTION_SECONDS = 60 * 60
 
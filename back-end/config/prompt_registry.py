@@ -0,0 +1,152 @@
+"""
+Registro de Prompts Compilados
+Compila o prompt de sistema de cada agente uma única vez e só recompila
+quando algum arquivo da pasta knowledge/ correspondente muda (mtime/tamanho).
+No caminho quente, montar o prompt vira uma consulta a um dicionário.
+"""
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app_config import PROMPT_REGISTRY_CHECK_SECONDS
+
+
+class _Entry:
+    """Artefato compilado e a assinatura dos arquivos usada para compilá-lo"""
+
+    def __init__(self, knowledge_dir: Path, builder: Callable[[], Any]):
+        self.knowledge_dir = knowledge_dir
+        self.builder = builder
+        self.value: Any = None
+        self.version: Optional[str] = None
+        self.signature: Optional[tuple] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+def directory_signature(knowledge_dir: Path) -> tuple:
+    """
+    Assinatura barata da pasta: (nome, mtime, tamanho) de cada arquivo
+    """
+    if not knowledge_dir.exists():
+        return ()
+
+    signature = []
+    for file_path in sorted(knowledge_dir.iterdir()):
+        if not file_path.is_file():
+            continue
+        try:
+            stat = file_path.stat()
+            signature.append((file_path.name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            continue
+    return tuple(signature)
+
+
+def _hash_value(value: Any) -> str:
+    if isinstance(value, str):
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()[:12]
+    return hashlib.sha256(repr(value).encode("utf-8")).hexdigest()[:12]
+
+
+class PromptRegistry:
+    """
+    Guarda artefatos compilados a partir de uma pasta de conhecimento
+
+    Cada entrada é recompilada apenas quando a assinatura da pasta muda. A
+    assinatura é verificada no máximo uma vez a cada `check_seconds`.
+    """
+
+    def __init__(self, check_seconds: float = PROMPT_REGISTRY_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self.rebuilds = 0
+
+    def register(self, name: str, knowledge_dir: Path, builder: Callable[[], Any]) -> None:
+        """
+        Registra um artefato compilado
+
+        Args:
+            name: Nome único da entrada (ex: "ideia", "filtrador")
+            knowledge_dir: Pasta cujos arquivos invalidam a entrada
+            builder: Função que compila o artefato (prompt, autômato, índice...)
+        """
+        self._entries[name] = _Entry(knowledge_dir, builder)
+
+    def get(self, name: str) -> Any:
+        """
+        Retorna o artefato compilado, recompilando se a pasta mudou
+
+        Args:
+            name: Nome da entrada registrada
+
+        Returns:
+            Artefato compilado pelo builder
+        """
+        entry = self._refresh(name)
+        return entry.value
+
+    def version(self, name: str) -> str:
+        """
+        Retorna um hash curto do artefato atual (muda sempre que ele é recompilado)
+        """
+        entry = self._refresh(name)
+        return entry.version
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Força a recompilação de uma entrada (ou de todas) na próxima consulta
+        """
+        names = [name] if name else list(self._entries)
+        for entry_name in names:
+            entry = self._entries[entry_name]
+            with entry.lock:
+                entry.signature = None
+                entry.checked_at = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Retorna versão e quantidade de arquivos de cada entrada compilada
+        """
+        return {
+            "rebuilds": self.rebuilds,
+            "entries": {
+                name: {
+                    "version": entry.version,
+                    "files": len(entry.signature or ()),
+                    "knowledge_dir": str(entry.knowledge_dir)
+                }
+                for name, entry in self._entries.items()
+            }
+        }
+
+    def _refresh(self, name: str) -> _Entry:
+        entry = self._entries[name]
+        now = time.monotonic()
+
+        # Caminho rápido: artefato compilado e verificado há pouco tempo
+        if entry.signature is not None and now - entry.checked_at < self.check_seconds:
+            return entry
+
+        with entry.lock:
+            now = time.monotonic()
+            if entry.signature is not None and now - entry.checked_at < self.check_seconds:
+                return entry
+
+            signature = directory_signature(entry.knowledge_dir)
+            if signature != entry.signature:
+                if entry.signature is not None:
+                    print(f"[INFO] Base de conhecimento de '{name}' mudou. Recompilando.")
+                entry.value = entry.builder()
+                entry.version = _hash_value(entry.value)
+                entry.signature = signature
+                self.rebuilds += 1
+            entry.checked_at = now
+
+        return entry
+
+
+# Registro global usado pelos agentes
+prompt_registry = PromptRegistry()
@@ -2,7 +2,8 @@
 Prompts do Sistema
 Aqui ficam todos os prompts usados pela IA do JuniBox
 """
-from config.knowledge_loader import load_knowledge_base
+from config.knowledge_loader import load_knowledge_base, KNOWLEDGE_DIR
+from config.prompt_registry import prompt_registry
 
 # ============================================
 # PROMPT PRINCIPAL DO JUNIBOX
@@ -12,12 +13,26 @@ def get_system_prompt() -> str:
     """
     Retorna o prompt do sistema com a base de conhecimento incluída
     
+    O prompt é compilado uma vez e só é recompilado quando algum arquivo
+    de config/knowledge/ muda.
+    
     Returns:
         String com o prompt completo incluindo conhecimento adicional
     """
+    return prompt_registry.get("system")
+
+def _build_system_prompt() -> str:
+    """
+    Monta o prompt do sistema (lê a base de conhecimento e extrai as regras de moderação)
+    """
     # Carrega a base de conhecimento PRIMEIRO
     knowledge = load_knowledge_base()
-    
+    return _with_knowledge(_build_base_prompt(knowledge), knowledge)
+
+def _build_base_prompt(knowledge: str) -> str:
+    """
+    Monta a parte fixa do prompt do sistema, com as regras de moderação extraídas do conhecimento
+    """
     # Extrai regras de moderação do arquivo regras_caixa.txt
     moderation_rules = ""
     if "--- regras_caixa.txt ---" in knowledge:
@@ -97,7 +112,12 @@ Sua função é:
 7. Linguagem objetiva e acessível.
 8. Focar apenas em ideias para a CAIXA.
 """
-    
+    return base_prompt
+
+def _with_knowledge(base_prompt: str, knowledge: str) -> str:
+    """
+    Injeta a base de conhecimento no prompt base
+    """
     # Se houver conhecimento adicional, adiciona ao prompt
     if knowledge:
         base_prompt += f"""
@@ -115,6 +135,8 @@ LEMBRE-SE: As regras de moderação no início deste prompt têm PRIORIDADE ABSO
     
     return base_prompt.strip()
 
+prompt_registry.register("system", KNOWLEDGE_DIR, _build_system_prompt)
+
 # Para compatibilidade com código existente - carrega na inicialização
 SYSTEM_PROMPT = get_system_prompt()
 
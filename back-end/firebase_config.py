@@ -8,12 +8,13 @@ from app_config import FIREBASE_CREDENTIALS_PATH
 # Tenta importar Firebase (pode não estar instalado ou configurado)
 try:
     import firebase_admin
-    from firebase_admin import credentials, firestore
+    from firebase_admin import credentials, firestore, firestore_async
     FIREBASE_AVAILABLE = True
 except ImportError:
     FIREBASE_AVAILABLE = False
     firebase_admin = None
     firestore = None
+    firestore_async = None
 
 def check_database_exists(db_client):
     """
@@ -89,5 +90,30 @@ def initialize_firebase():
         print(f"[AVISO] Erro ao obter cliente Firestore: {e}")
         return None
 
+def initialize_async_firestore(db_client):
+    """
+    Cria o cliente assíncrono do Firestore (usado pelas rotas async)
+    Só é criado se a inicialização síncrona tiver funcionado
+    
+    Args:
+        db_client: Cliente síncrono retornado por initialize_firebase()
+        
+    Returns:
+        Cliente assíncrono do Firestore ou None
+    """
+    if not db_client:
+        return None
+    
+    try:
+        async_client = firestore_async.client()
+        print("[OK] Cliente assíncrono do Firestore criado com sucesso")
+        return async_client
+    except Exception as e:
+        print(f"[AVISO] Erro ao obter cliente assíncrono do Firestore: {e}")
+        return None
+
 # Cliente global do Firestore (None se Firebase não estiver disponível)
 db = initialize_firebase()
+
+# Cliente assíncrono global (usado por services/db.py)
+async_db = initialize_async_firestore(db)
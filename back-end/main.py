@@ -2,17 +2,33 @@
 JuniBox Backend - FastAPI + Firebase + Groq AI
 Entrada principal da aplicação
 """
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from routers import ideas, chat
 from agents.filtrador import router as filtrador_router
 from agents.ideia import router as ideia_router
+from services.model_router import model_router
+from services.llm_client import get_llm_health
+from services.metrics import MetricsMiddleware, PROMETHEUS_AVAILABLE, render_metrics
+from services.tracing import TracingMiddleware
+from services.db import flush_all_autosaves
+from services.jobs import get_job
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Grava os autosaves que ainda estão no buffer antes de encerrar
+    flushed = await flush_all_autosaves()
+    if flushed:
+        print(f"[OK] {flushed} autosave(s) pendente(s) gravado(s) no desligamento")
 
 # Configuração da Documentação do Swagger
 app = FastAPI(
     title="API JuniBox - CAIXA Sandbox",
     description="Backend responsável por avaliar ideias usando Llama 3 via Groq.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuração de CORS (Essencial para seu Front-end funcionar)
@@ -24,6 +40,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas de latência por rota para todos os routers (expostas em /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Spans por etapa (header Server-Timing e exportação opcional, ver services/tracing.py)
+app.add_middleware(TracingMiddleware)
+
 # Registra as rotas
 # Rotas legadas (mantidas para compatibilidade)
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat (Legado)"])
@@ -34,7 +56,7 @@ app.include_router(filtrador_router.router, prefix="/api/agents", tags=["Agente
 app.include_router(ideia_router.router, prefix="/api/agents", tags=["Agente de Ideia"])
 
 @app.get("/", summary="Status da API")
-def home():
+async def home():
     """Endpoint de status - verifica se a API está online"""
     return {
         "status": "online", 
@@ -44,9 +66,55 @@ def home():
     }
 
 @app.get("/health", summary="Health Check")
-def health_check():
-    """Endpoint de health check para monitoramento"""
-    return {"status": "healthy", "service": "JuniBox Backend"}
+async def health_check():
+    """
+    Endpoint de health check para monitoramento
+    
+    `status` vira "degraded" quando o circuit breaker de algum modelo está
+    aberto (o provedor de IA está falhando e as chamadas falham rápido).
+    """
+    llm_health = get_llm_health()
+    return {
+        "status": "degraded" if llm_health["degraded"] else "healthy",
+        "service": "JuniBox Backend",
+        "llm": llm_health
+    }
+
+@app.get("/models/stats", summary="Roteamento de modelos")
+async def model_routing_stats():
+    """
+    Decisões do roteador de modelos por tarefa (chamadas e escalonamentos)
+    e latência por nível de modelo (pequeno/grande)
+    """
+    return model_router.stats()
+
+@app.get("/jobs/{job_id}", summary="Progresso de tarefa em segundo plano")
+async def background_job_status(job_id: str):
+    """
+    Estado de uma tarefa iniciada com `background=true` (ex: exclusão de
+    ideia ou limpeza de histórico): `status` (running, done ou error) e
+    `progress` (documentos apagados até agora)
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return job
+
+@app.get("/metrics", summary="Métricas Prometheus", include_in_schema=False)
+async def metrics():
+    """
+    Métricas no formato de exposição do Prometheus: latência de endpoints,
+    LLM (incluindo tempo até o primeiro token) e Firestore, tokens consumidos,
+    acertos de cache, novas tentativas e conteúdo bloqueado
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return Response(
+            "prometheus_client não instalado (pip install prometheus-client)\n",
+            status_code=503,
+            media_type="text/plain"
+        )
+    content, content_type = render_metrics()
+    return Response(content, media_type=content_type)
 
 # Para rodar direto pelo arquivo (opcional)
 if __name__ == "__main__":
@@ -2,7 +2,8 @@
 Rotas de Chat
 Endpoints para conversação com o JuniBox
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from schemas import (
     ChatRequest, 
     ChatRequestResponse, 
@@ -14,7 +15,7 @@ from schemas import (
 )
 from services.db import (
     save_chat_message,
-    get_chat_history,
+    commit_chat_turn,
     get_full_chat_history,
     get_idea_context,
     clear_chat_history
@@ -22,13 +23,22 @@ from services.db import (
 from agents.ideia.agent import (
     get_response as get_ideia_response,  # Função simplificada
     generate_response as generate_ideia_response,  # Função com Firebase
-    generate_idea_suggestions, 
-    validate_idea_completeness,
-    generate_field_suggestion
+    generate_field_suggestion,
+    stream_response as stream_ideia_response,
+    stream_generate_response as stream_generate_ideia_response
 )
+from services.completeness import validate_idea_completeness
+from agents.ideia.memory import ConversationMemory, load_memory, schedule_memory_update
+from agents.ideia.prefetch import get_prefetched_suggestion
+from agents.ideia.suggestion_cache import get_cached_idea_suggestions
 from agents.filtrador.agent import analyze_content
+from services.jobs import start_job
+from services.sse import sse_chat_stream, SSE_HEADERS
+from services.tracing import span
+from app_config import CHAT_SPECULATIVE_GENERATION, OPTIONAL_SUGGESTION_FIELDS
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
 
 router = APIRouter()
 
@@ -37,7 +47,7 @@ router = APIRouter()
 # ============================================
 
 @router.post("/", response_model=ChatRequestResponse, summary="Chat simplificado com JuniBox")
-def chat_simple(request: ChatRequest):
+async def chat_simple(request: ChatRequest):
     """
     **Endpoint Simplificado** - Chat básico sem necessidade de Firebase
     
@@ -66,26 +76,50 @@ def chat_simple(request: ChatRequest):
             detail="A mensagem não pode estar vazia."
         )
     
-    response_text = get_ideia_response(request.message, request.history)
+    response_text = await get_ideia_response(request.message, request.history)
     
     return {"response": response_text}
 
+@router.post("/stream", summary="Chat simplificado com JuniBox (streaming SSE)")
+async def chat_simple_stream(request: ChatRequest):
+    """
+    Versão em streaming do chat simplificado
+    
+    Retorna `text/event-stream` com eventos `token` (trechos da resposta),
+    `done` (resposta completa) ou `error`.
+    """
+    if not request.message or not request.message.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="A mensagem não pode estar vazia."
+        )
+    
+    return StreamingResponse(
+        sse_chat_stream(stream_ideia_response(request.message, request.history)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 # ============================================
 # ENDPOINTS AVANÇADOS (COM FIREBASE)
 # ============================================
 
 @router.post("/send", response_model=ChatResponse)
-def endpoint_chat(payload: ChatMessage):
+async def endpoint_chat(payload: ChatMessage):
     """
     Envia uma mensagem para o JuniBox e recebe uma resposta
     
     **Fluxo:**
     1. Valida mensagem do usuário com Agente Filtrador (ANTES de salvar)
-    2. Se aprovada, salva mensagem do usuário no Firestore
-    3. Busca o contexto da ideia e histórico de chat
-    4. Gera resposta usando Agente de Ideia (Groq AI) com contexto do formulário
-    5. Salva a resposta da IA no Firestore
-    6. Retorna a resposta para o frontend
+    2. Busca o contexto da ideia e o histórico (resumo + mensagens recentes)
+    3. Gera resposta usando Agente de Ideia (Groq AI) com contexto do formulário
+    4. Se aprovada, salva a mensagem do usuário e a resposta da IA numa única
+       escrita em lote (com o `last_updated` da ideia): o turno nunca fica pela metade
+    5. Retorna a resposta para o frontend
+    
+    **Modo especulativo** (`CHAT_SPECULATIVE_GENERATION`): os passos 1, 2 e 3
+    rodam em paralelo e a geração é descartada se a mensagem for bloqueada.
+    Nada é salvo antes do veredito do Agente Filtrador.
     
     **Parâmetros:**
     - **user_id**: ID do usuário
@@ -94,49 +128,201 @@ def endpoint_chat(payload: ChatMessage):
     - **form_context**: Contexto do formulário (seção atual, dados do formulário, etc)
     """
     try:
-        # 1. VALIDAÇÃO DO AGENTE FILTRADOR ANTES DE SALVAR
-        filter_result = analyze_content(payload.message, field_name="chat_message")
-        if filter_result["is_inappropriate"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Por favor, mantenha a linguagem profissional e respeitosa. Sua mensagem contém conteúdo inapropriado. {filter_result.get('reason', '')}"
-            )
-        
-        # 2. Salva mensagem do usuário (após validação)
-        save_chat_message(payload.user_id, payload.idea_id, "user", payload.message)
-        
-        # 3. Busca contexto em paralelo (otimização)
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            history_future = executor.submit(get_chat_history, payload.user_id, payload.idea_id)
-            idea_future = executor.submit(get_idea_context, payload.user_id, payload.idea_id)
-            history = history_future.result()
-            idea_data = idea_future.result()
-        
-        # 4. Gera resposta da IA com contexto do formulário
-        response = generate_ideia_response(
-            payload.message, 
-            history, 
-            idea_data,
-            form_context=payload.form_context
-        )
+        if CHAT_SPECULATIVE_GENERATION:
+            response = await _chat_speculative(payload)
+        else:
+            response = await _chat_sequential(payload)
         
-        # 5. Salva resposta da IA
-        save_chat_message(payload.user_id, payload.idea_id, "assistant", response)
-        
-        # 6. Retorna resposta
+        # 5. Retorna resposta
         return {
             "response": response,
             "timestamp": datetime.now()
         }
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao processar mensagem: {str(e)}"
+        )
+
+def _raise_if_message_blocked(filter_result: dict) -> None:
+    """
+    Levanta HTTP 400 se o Agente Filtrador bloqueou a mensagem
+    (ou 503 se ela ficou sem veredito: não é salva sem moderação)
+    """
+    if filter_result["is_inappropriate"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Por favor, mantenha a linguagem profissional e respeitosa. Sua mensagem contém conteúdo inapropriado. {filter_result.get('reason', '')}"
+        )
+    if filter_result.get("undecided"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="A moderação da mensagem não terminou a tempo. Tente enviar novamente.",
+            headers={"Retry-After": "2"}
+        )
+
+# Cada etapa do /send abre um span (services/tracing.py); as de primeiro
+# nível saem no header Server-Timing
+
+async def _moderate_message(message: str) -> dict:
+    with span("moderation", **{"message.chars": len(message)}) as current:
+        filter_result = await analyze_content(message, field_name="chat_message")
+        current.set_attribute("moderation.blocked", filter_result["is_inappropriate"])
+        return filter_result
+
+async def _load_chat_memory(payload: ChatMessage) -> ConversationMemory:
+    with span("memory") as current:
+        memory = await load_memory(payload.user_id, payload.idea_id)
+        current.set_attribute("history.messages", len(memory.history))
+        current.set_attribute("history.unsummarized", memory.pending)
+        return memory
+
+async def _save_user_message(payload: ChatMessage) -> None:
+    with span("save_user_message", **{"message.chars": len(payload.message)}):
+        await save_chat_message(payload.user_id, payload.idea_id, "user", payload.message)
+
+async def _commit_turn(
+    payload: ChatMessage,
+    response: str,
+    received_at: Optional[datetime] = None,
+    user_message_saved: bool = False
+) -> None:
+    # Mensagem do usuário + resposta + last_updated da ideia numa única escrita
+    with span("commit_turn", **{"response.chars": len(response), "turn.user_message_saved": user_message_saved}):
+        await commit_chat_turn(
+            payload.user_id,
+            payload.idea_id,
+            None if user_message_saved else payload.message,
+            response,
+            user_timestamp=received_at
+        )
+
+async def _generate_response(payload: ChatMessage, memory: ConversationMemory) -> str:
+    with span(
+        "generation",
+        **{"history.messages": len(memory.history), "message.chars": len(payload.message)}
+    ) as current:
+        response = await generate_ideia_response(
+            payload.message,
+            memory.history,
+            memory.idea_context,
+            form_context=payload.form_context
+        )
+        current.set_attribute("response.chars", len(response))
+        return response
+
+async def _chat_sequential(payload: ChatMessage) -> str:
+    """
+    Fluxo em série: modera, busca contexto, gera e salva o turno
+    """
+    received_at = datetime.now()
+    
+    # 1. VALIDAÇÃO DO AGENTE FILTRADOR ANTES DE SALVAR
+    filter_result = await _moderate_message(payload.message)
+    _raise_if_message_blocked(filter_result)
+    
+    # 2. Busca contexto e histórico dentro do orçamento de tokens
+    # (antes de salvar, para não duplicar a mensagem atual)
+    memory = await _load_chat_memory(payload)
+    
+    # 3. Gera resposta da IA com contexto do formulário
+    response = await _generate_response(payload, memory)
+    
+    # 4-5. Salva mensagem do usuário e resposta da IA juntas (após validação)
+    # e atualiza o resumo da conversa se necessário
+    await _commit_turn(payload, response, received_at)
+    schedule_memory_update(payload.user_id, payload.idea_id, memory)
+    return response
+
+async def _chat_speculative(payload: ChatMessage) -> str:
+    """
+    Fluxo especulativo: a geração começa junto com a moderação
+    
+    A leitura do contexto e a geração da resposta rodam em paralelo com o
+    Agente Filtrador. Nada é salvo antes do veredito: se a mensagem for
+    bloqueada, a geração em andamento é cancelada (a chamada HTTP ao
+    provedor é interrompida) e nenhuma mensagem é persistida.
+    """
+    received_at = datetime.now()
+    
+    # 1. Moderação começa imediatamente, em paralelo com a leitura de contexto
+    filter_task = asyncio.create_task(_moderate_message(payload.message))
+    
+    # 2. Geração especulativa assim que o contexto chega
+    # (o histórico ainda não contém a mensagem atual, que é enviada à parte)
+    generation_task = None
+    try:
+        memory = await _load_chat_memory(payload)
+        if not filter_task.done() or not filter_task.result()["is_inappropriate"]:
+            generation_task = asyncio.create_task(_generate_response(payload, memory))
+        
+        # 3. Aguarda o veredito ANTES de persistir qualquer coisa
+        _raise_if_message_blocked(await filter_task)
+    except BaseException:
+        filter_task.cancel()
+        if generation_task is not None:
+            generation_task.cancel()
+        raise
+    
+    # 4. Mensagem aprovada: salva a mensagem do usuário e a resposta gerada juntas
+    response = await generation_task
+    await _commit_turn(payload, response, received_at)
+    schedule_memory_update(payload.user_id, payload.idea_id, memory)
+    return response
+
+@router.post("/send/stream")
+async def endpoint_chat_stream(payload: ChatMessage):
+    """
+    Versão em streaming de `/send` (Server-Sent Events)
+    
+    A moderação acontece ANTES do stream começar: mensagens bloqueadas
+    recebem HTTP 400 normalmente. Depois disso a resposta é enviada token a
+    token (eventos `token`, `done` ou `error`).
+    
+    A resposta do assistente é salva quando o stream termina ou quando o
+    cliente desconecta (com o texto gerado até ali). Ao desconectar, o
+    stream do provedor é fechado e para de consumir tokens.
+    """
+    # 1. VALIDAÇÃO DO AGENTE FILTRADOR ANTES DE SALVAR
+    _raise_if_message_blocked(await _moderate_message(payload.message))
+    
+    try:
+        # 2. Busca contexto e histórico (antes de salvar, para não duplicar a mensagem atual)
+        memory = await _load_chat_memory(payload)
+        
+        # 3. Salva mensagem do usuário (após validação), legível durante o stream
+        await _save_user_message(payload)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao processar mensagem: {str(e)}"
         )
+    
+    # 4. Salva a resposta da IA (e o last_updated da ideia) quando o stream
+    # terminar ou for abortado
+    async def _save_response(response: str, completed: bool) -> None:
+        await _commit_turn(payload, response, user_message_saved=True)
+        schedule_memory_update(payload.user_id, payload.idea_id, memory)
+    
+    return StreamingResponse(
+        sse_chat_stream(
+            stream_generate_ideia_response(
+                payload.message,
+                memory.history,
+                memory.idea_context,
+                form_context=payload.form_context
+            ),
+            on_finish=_save_response
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
 @router.get("/history/{user_id}/{idea_id}", response_model=ChatHistoryResponse)
-def get_chat_history_endpoint(user_id: str, idea_id: str):
+async def get_chat_history_endpoint(user_id: str, idea_id: str):
     """
     Busca o histórico completo de chat de uma ideia
     
@@ -144,7 +330,7 @@ def get_chat_history_endpoint(user_id: str, idea_id: str):
     - **idea_id**: ID da ideia
     """
     try:
-        messages = get_full_chat_history(user_id, idea_id)
+        messages = await get_full_chat_history(user_id, idea_id)
         
         return {
             "idea_id": idea_id,
@@ -157,19 +343,35 @@ def get_chat_history_endpoint(user_id: str, idea_id: str):
         )
 
 @router.delete("/history/{user_id}/{idea_id}")
-def clear_chat_history_endpoint(user_id: str, idea_id: str):
+async def clear_chat_history_endpoint(user_id: str, idea_id: str, response: Response, background: bool = False):
     """
     Limpa todo o histórico de chat de uma ideia
     
     - **user_id**: ID do usuário
     - **idea_id**: ID da ideia
+    - **background**: Se true, apaga em segundo plano e responde 202 com o
+      `job_id` (progresso em `GET /jobs/{job_id}`); indicado para conversas muito grandes
     """
     try:
-        clear_chat_history(user_id, idea_id)
+        if background:
+            job = start_job(
+                "clear_chat",
+                f"{user_id}/{idea_id}",
+                lambda on_progress: clear_chat_history(user_id, idea_id, on_progress)
+            )
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "status": "success",
+                "message": "Limpeza do histórico iniciada",
+                "job_id": job["job_id"]
+            }
+        
+        deleted = await clear_chat_history(user_id, idea_id)
         
         return {
             "status": "success",
-            "message": "Histórico de chat limpo com sucesso"
+            "message": "Histórico de chat limpo com sucesso",
+            "deleted_messages": deleted
         }
     except Exception as e:
         raise HTTPException(
@@ -178,7 +380,7 @@ def clear_chat_history_endpoint(user_id: str, idea_id: str):
         )
 
 @router.get("/suggestions/{user_id}/{idea_id}")
-def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
+async def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
     """
     Gera sugestões automáticas para melhorar a ideia
     
@@ -188,7 +390,7 @@ def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
     - **idea_id**: ID da ideia
     """
     try:
-        idea_data = get_idea_context(user_id, idea_id)
+        idea_data = await get_idea_context(user_id, idea_id)
         
         if not idea_data:
             raise HTTPException(
@@ -196,7 +398,8 @@ def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
                 detail="Ideia não encontrada"
             )
         
-        suggestions = generate_idea_suggestions(idea_data)
+        # Mesma versão da ideia e do prompt: responde do cache
+        suggestions = await get_cached_idea_suggestions(user_id, idea_id, idea_data)
         
         return {
             "idea_id": idea_id,
@@ -211,7 +414,7 @@ def get_idea_suggestions_endpoint(user_id: str, idea_id: str):
         )
 
 @router.post("/suggest-field", response_model=FieldSuggestionResponse)
-def suggest_field_endpoint(payload: FieldSuggestionRequest):
+async def suggest_field_endpoint(payload: FieldSuggestionRequest):
     """
     Gera sugestão para um campo específico do formulário
     
@@ -230,15 +433,22 @@ def suggest_field_endpoint(payload: FieldSuggestionRequest):
     """
     try:
         # Validar que o campo é opcional
-        optional_fields = ["publicoAlvo", "metricas", "resultadosEsperados"]
-        if payload.field_name not in optional_fields:
+        if payload.field_name not in OPTIONAL_SUGGESTION_FIELDS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Campo '{payload.field_name}' não é opcional. Apenas campos opcionais podem receber sugestões da IA."
             )
         
         # Buscar contexto da ideia
-        idea_context = get_idea_context(payload.user_id, payload.idea_id)
+        idea_context = await get_idea_context(payload.user_id, payload.idea_id)
+        
+        # Sugestão pré-gerada após o último autosave (mesma versão da ideia e
+        # formulário sem edições ainda não salvas)
+        prefetched = get_prefetched_suggestion(
+            payload.user_id, payload.idea_id, payload.field_name, idea_context, payload.form_data
+        )
+        if prefetched:
+            return prefetched
         
         # Preparar contexto do formulário
         step_names = ["Sua Ideia", "Objetivos e Metas", "Cronograma"]
@@ -251,7 +461,7 @@ def suggest_field_endpoint(payload: FieldSuggestionRequest):
         }
         
         # Gerar sugestão
-        suggestion = generate_field_suggestion(
+        suggestion = await generate_field_suggestion(
             idea_context,
             form_context,
             payload.field_name
@@ -268,7 +478,7 @@ def suggest_field_endpoint(payload: FieldSuggestionRequest):
         )
 
 @router.get("/validate/{user_id}/{idea_id}")
-def validate_idea_endpoint(user_id: str, idea_id: str):
+async def validate_idea_endpoint(user_id: str, idea_id: str):
     """
     Valida se a ideia está completa e pronta para submissão
     
@@ -278,7 +488,7 @@ def validate_idea_endpoint(user_id: str, idea_id: str):
     - **idea_id**: ID da ideia
     """
     try:
-        idea_data = get_idea_context(user_id, idea_id)
+        idea_data = await get_idea_context(user_id, idea_id)
         
         if not idea_data:
             raise HTTPException(
@@ -2,8 +2,8 @@
 Rotas de Ideias
 Endpoints para CRUD e Autosave de ideias
 """
-from fastapi import APIRouter, HTTPException, status
-from schemas import IdeaCreate, IdeaUpdate, IdeaResponse, SuccessResponse
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from schemas import IdeaCreate, IdeaUpdate, IdeaResponse, IdeaListResponse, SuccessResponse
 from services.db import (
     create_new_idea,
     autosave_idea,
@@ -11,13 +11,66 @@ from services.db import (
     list_user_ideas,
     delete_idea
 )
-from agents.filtrador.agent import analyze_content
-from typing import List
+from services.jobs import start_job
+from app_config import IDEA_LIST_DEFAULT_LIMIT
+from agents.filtrador.agent import analyze_contents_batch
+from agents.ideia.prefetch import is_material_update, schedule_suggestion_prefetch
+from typing import List, Dict, Any, Optional
 
 router = APIRouter()
 
+def _moderation_error_detail(filter_result: Dict[str, Any]) -> str:
+    """
+    Monta a mensagem de erro de moderação para um campo bloqueado
+    
+    Args:
+        filter_result: Veredito do Agente Filtrador (com field_name)
+        
+    Returns:
+        Mensagem amigável indicando qual campo foi bloqueado
+    """
+    field_name = filter_result.get("field_name")
+    if field_name == "title":
+        field_label = "O título da ideia contém"
+    elif field_name == "description":
+        field_label = "A descrição contém"
+    else:
+        field_label = f"O campo '{field_name}' contém"
+    
+    return (
+        f"Por favor, mantenha a linguagem profissional e respeitosa. "
+        f"{field_label} conteúdo inapropriado. {filter_result.get('reason', '')}"
+    )
+
+async def _raise_if_inappropriate(moderation_items: List[Dict[str, Any]]) -> None:
+    """
+    Modera os campos e levanta HTTP 400 no primeiro campo bloqueado
+    
+    O primeiro bloqueio encerra a moderação dos campos restantes. Campos que
+    ficaram sem veredito (prazo da moderação esgotado) não são salvos sem
+    moderação: a requisição falha com 503 e o cliente tenta de novo.
+    
+    Args:
+        moderation_items: Lista de {"field_name": str, "content": str}
+    """
+    filter_results = await analyze_contents_batch(moderation_items, stop_on_block=True)
+    for filter_result in filter_results:
+        if filter_result["is_inappropriate"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=_moderation_error_detail(filter_result)
+            )
+    
+    undecided = [result["field_name"] for result in filter_results if result.get("undecided")]
+    if undecided:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"A moderação não terminou a tempo ({', '.join(map(str, undecided))}). Tente salvar novamente.",
+            headers={"Retry-After": "2"}
+        )
+
 @router.post("/", response_model=IdeaResponse, status_code=status.HTTP_201_CREATED)
-def create_idea(payload: IdeaCreate):
+async def create_idea(payload: IdeaCreate):
     """
     Cria uma nova ideia para o usuário
     
@@ -26,15 +79,10 @@ def create_idea(payload: IdeaCreate):
     """
     # Validação de moderação no título usando Agente Filtrador
     if payload.title:
-        filter_result = analyze_content(payload.title, field_name="title")
-        if filter_result["is_inappropriate"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Por favor, mantenha a linguagem profissional e respeitosa. O título da ideia contém conteúdo inapropriado. {filter_result.get('reason', '')}"
-            )
+        await _raise_if_inappropriate([{"field_name": "title", "content": payload.title}])
     
     try:
-        idea_data = create_new_idea(payload.user_id, payload.title)
+        idea_data = await create_new_idea(payload.user_id, payload.title)
         return idea_data
     except Exception as e:
         error_msg = str(e)
@@ -53,7 +101,7 @@ def create_idea(payload: IdeaCreate):
         )
 
 @router.patch("/{user_id}/{idea_id}", response_model=SuccessResponse)
-def endpoint_autosave(user_id: str, idea_id: str, payload: IdeaUpdate):
+async def endpoint_autosave(user_id: str, idea_id: str, payload: IdeaUpdate, flush: bool = False):
     """
     **Autosave Endpoint** - Atualiza apenas os campos modificados
     
@@ -61,11 +109,15 @@ def endpoint_autosave(user_id: str, idea_id: str, payload: IdeaUpdate):
     - Recebe apenas os campos que foram alterados
     - Usa merge=True no Firestore para update parcial
     - Otimizado para chamadas frequentes (debounce no frontend)
+    - Autosaves seguidos são juntados no servidor e gravados numa única
+      escrita após `AUTOSAVE_DEBOUNCE_SECONDS`; as leituras já veem os
+      campos pendentes
     
     **Parâmetros:**
     - **user_id**: ID do usuário
     - **idea_id**: ID da ideia
     - **payload**: Campos a atualizar (todos opcionais)
+    - **flush**: Grava imediatamente (ex: ao submeter a ideia); mudanças de status sempre gravam na hora
     
     **Exemplo de uso:**
     ```json
@@ -78,34 +130,21 @@ def endpoint_autosave(user_id: str, idea_id: str, payload: IdeaUpdate):
     # Validação de moderação nos campos atualizados usando Agente Filtrador
     update_data = payload.dict(exclude_unset=True)
     
-    # Verifica título se estiver sendo atualizado
+    # Monta a lista de campos a moderar: título, descrição e campos dinâmicos
+    moderation_items = []
     if "title" in update_data and update_data["title"]:
-        filter_result = analyze_content(update_data["title"], field_name="title")
-        if filter_result["is_inappropriate"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Por favor, mantenha a linguagem profissional e respeitosa. O título da ideia contém conteúdo inapropriado. {filter_result.get('reason', '')}"
-            )
-    
-    # Verifica descrição se estiver sendo atualizada
+        moderation_items.append({"field_name": "title", "content": update_data["title"]})
     if "description" in update_data and update_data["description"]:
-        filter_result = analyze_content(update_data["description"], field_name="description")
-        if filter_result["is_inappropriate"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Por favor, mantenha a linguagem profissional e respeitosa. A descrição contém conteúdo inapropriado. {filter_result.get('reason', '')}"
-            )
-    
-    # Verifica campos dinâmicos se estiverem sendo atualizados
+        moderation_items.append({"field_name": "description", "content": update_data["description"]})
     if "dynamic_content" in update_data and update_data["dynamic_content"]:
         for field_name, field_value in update_data["dynamic_content"].items():
             if field_value and isinstance(field_value, str) and field_value.strip():
-                filter_result = analyze_content(field_value, field_name=field_name)
-                if filter_result["is_inappropriate"]:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Por favor, mantenha a linguagem profissional e respeitosa. O campo '{field_name}' contém conteúdo inapropriado. {filter_result.get('reason', '')}"
-                    )
+                moderation_items.append({"field_name": field_name, "content": field_value})
+    
+    # Uma única chamada ao Agente Filtrador para todos os campos
+    # (ou lotes em paralelo, se não couberem em um prompt)
+    if moderation_items:
+        await _raise_if_inappropriate(moderation_items)
     
     try:
         if not update_data:
@@ -115,7 +154,12 @@ def endpoint_autosave(user_id: str, idea_id: str, payload: IdeaUpdate):
                 "data": {}
             }
         
-        saved_data = autosave_idea(user_id, idea_id, update_data)
+        saved_data = await autosave_idea(user_id, idea_id, update_data, flush=flush)
+        
+        # Sugestões dos campos opcionais vazios ficam prontas antes do clique
+        # (só quando o conteúdo mudou de fato: saved_data traz os campos alterados)
+        if is_material_update(saved_data):
+            schedule_suggestion_prefetch(user_id, idea_id)
         
         return {
             "status": "success",
@@ -139,7 +183,7 @@ def endpoint_autosave(user_id: str, idea_id: str, payload: IdeaUpdate):
         )
 
 @router.get("/{user_id}/{idea_id}", response_model=IdeaResponse)
-def get_idea_by_id(user_id: str, idea_id: str):
+async def get_idea_by_id(user_id: str, idea_id: str):
     """
     Busca uma ideia específica
     
@@ -147,7 +191,7 @@ def get_idea_by_id(user_id: str, idea_id: str):
     - **idea_id**: ID da ideia
     """
     try:
-        idea = get_idea(user_id, idea_id)
+        idea = await get_idea(user_id, idea_id)
         
         if not idea:
             raise HTTPException(
@@ -174,48 +218,78 @@ def get_idea_by_id(user_id: str, idea_id: str):
             detail=f"Erro ao buscar ideia: {error_msg}"
         )
 
-@router.get("/{user_id}", response_model=List[IdeaResponse])
-def list_ideas(user_id: str, limit: int = 50):
+@router.get("/{user_id}", response_model=IdeaListResponse)
+async def list_ideas(
+    user_id: str,
+    limit: int = IDEA_LIST_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status")
+):
     """
-    Lista todas as ideias de um usuário
+    Lista as ideias de um usuário (resumos, da mais recente para a mais antiga)
     
     - **user_id**: ID do usuário
-    - **limit**: Número máximo de ideias a retornar (padrão: 50)
+    - **limit**: Número máximo de ideias por página (padrão: 50, máximo: 100)
+    - **cursor**: `next_cursor` da página anterior, para buscar a próxima
+    - **status**: Filtra pelo status (ex: draft, submitted)
     
-    Retorna lista vazia se o usuário não tiver ideias ou se Firebase não estiver configurado.
+    Cada item traz só id, título, status, completude e datas; o conteúdo
+    completo vem de `GET /api/ideas/{user_id}/{idea_id}`. Retorna página vazia
+    se o usuário não tiver ideias ou se Firebase não estiver configurado;
+    erros da consulta (ex: índice composto ausente) respondem 500.
     """
     try:
-        ideas = list_user_ideas(user_id, limit)
-        # Sempre retorna uma lista, mesmo que vazia
-        return ideas if ideas else []
+        return await list_user_ideas(user_id, limit, cursor=cursor, status=status_filter)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
-        # Em caso de erro inesperado, retorna lista vazia ao invés de erro 500
         print(f"[ERRO] Erro ao listar ideias para usuário {user_id}: {e}")
-        return []
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao listar ideias: {str(e)}"
+        )
 
 @router.delete("/{user_id}/{idea_id}", response_model=SuccessResponse)
-def delete_idea_by_id(user_id: str, idea_id: str):
+async def delete_idea_by_id(user_id: str, idea_id: str, response: Response, background: bool = False):
     """
     Deleta uma ideia e todo seu histórico de chat
     
     - **user_id**: ID do usuário
     - **idea_id**: ID da ideia
+    - **background**: Se true, apaga em segundo plano e responde 202 com o
+      `job_id` (progresso em `GET /jobs/{job_id}`); indicado para conversas muito grandes
     """
     try:
         # Verifica se a ideia existe
-        idea = get_idea(user_id, idea_id)
+        idea = await get_idea(user_id, idea_id)
         if not idea:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Ideia não encontrada"
             )
         
-        delete_idea(user_id, idea_id)
+        if background:
+            job = start_job(
+                "delete_idea",
+                f"{user_id}/{idea_id}",
+                lambda on_progress: delete_idea(user_id, idea_id, on_progress)
+            )
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "status": "success",
+                "message": "Exclusão da ideia iniciada",
+                "data": {"idea_id": idea_id, "job_id": job["job_id"]}
+            }
+        
+        deleted = await delete_idea(user_id, idea_id)
         
         return {
             "status": "success",
             "message": "Ideia deletada com sucesso",
-            "data": {"idea_id": idea_id}
+            "data": {"idea_id": idea_id, "deleted_documents": deleted}
         }
     except HTTPException:
         raise
@@ -236,7 +310,7 @@ def delete_idea_by_id(user_id: str, idea_id: str):
         )
 
 @router.put("/{user_id}/{idea_id}/status")
-def update_idea_status(user_id: str, idea_id: str, new_status: str):
+async def update_idea_status(user_id: str, idea_id: str, new_status: str):
     """
     Atualiza o status de uma ideia
     
@@ -253,7 +327,7 @@ def update_idea_status(user_id: str, idea_id: str, new_status: str):
         )
     
     try:
-        saved_data = autosave_idea(user_id, idea_id, {"status": new_status})
+        saved_data = await autosave_idea(user_id, idea_id, {"status": new_status})
         
         return {
             "status": "success",
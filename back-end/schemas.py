@@ -52,6 +52,8 @@ class IdeaResponse(BaseModel):
     target_audience: Optional[str] = None
     status: str = "draft"
     dynamic_content: Optional[Dict[str, Any]] = None
+    version: Optional[int] = Field(None, description="Contador de salvamentos (sobe a cada autosave)")
+    completeness: Optional[int] = Field(None, description="Percentual de preenchimento da ideia (0-100)")
     created_at: Optional[datetime] = None
     last_updated: Optional[datetime] = None
     
@@ -69,11 +71,43 @@ class IdeaResponse(BaseModel):
             }
         }
 
+class IdeaSummary(BaseModel):
+    """Resumo da ideia para listagens (sem os campos de conteúdo)"""
+    id: str
+    title: str = ""
+    status: str = "draft"
+    completeness: Optional[int] = Field(None, description="Percentual de preenchimento da ideia (0-100)")
+    created_at: Optional[datetime] = None
+    last_updated: Optional[datetime] = None
+
+class IdeaListResponse(BaseModel):
+    """Página da listagem de ideias de um usuário"""
+    ideas: List[IdeaSummary]
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (None na última)")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "ideas": [
+                    {
+                        "id": "idea123",
+                        "title": "App de Reciclagem",
+                        "status": "draft",
+                        "completeness": 40,
+                        "created_at": "2025-01-01T10:00:00",
+                        "last_updated": "2025-01-01T10:30:00"
+                    }
+                ],
+                "next_cursor": "eyJ0IjogIjIwMjUtMDEtMDFUMTA6MzA6MDAiLCAiaWQiOiAiaWRlYTEyMyJ9"
+            }
+        }
+
 # ============================================
 # SCHEMAS DE CHAT
 # ============================================
 
 # Schema simplificado para chat básico (sem Firebase)
+
 class Message(BaseModel):
     """Mensagem individual do histórico"""
     role: str = Field(..., description="Quem enviou: 'user', 'assistant' ou 'system'")
@@ -242,3 +276,30 @@ class FieldSuggestionResponse(BaseModel):
             }
         }
 
+
+class FieldsSuggestionRequest(BaseModel):
+    """Schema para solicitar sugestões de vários campos de uma vez"""
+    user_id: str = Field(..., description="ID do usuário")
+    idea_id: str = Field(..., description="ID da ideia")
+    field_names: List[str] = Field(..., min_length=1, description="Campos opcionais para sugerir")
+    form_data: Dict[str, Any] = Field(..., description="Dados atuais do formulário")
+    current_step: int = Field(..., description="Índice da seção atual")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "user_id": "user123",
+                "idea_id": "idea123",
+                "field_names": ["publicoAlvo", "metricas", "resultadosEsperados"],
+                "form_data": {
+                    "ideaTitle": "App de Reciclagem",
+                    "ideaDescription": "..."
+                },
+                "current_step": 1
+            }
+        }
+
+class FieldsSuggestionResponse(BaseModel):
+    """Schema de resposta com as sugestões de vários campos"""
+    idea_id: str = Field(..., description="ID da ideia")
+    suggestions: List[FieldSuggestionResponse] = Field(..., description="Uma sugestão por campo pedido, na mesma ordem")
@@ -7,9 +7,9 @@ from agents.ideia.agent import (
     get_response as get_junibox_response,
     generate_response as generate_junibox_response,
     generate_idea_suggestions,
-    validate_idea_completeness,
     generate_field_suggestion
 )
+from services.completeness import validate_idea_completeness
 
 # Exporta funções para compatibilidade
 __all__ = [
@@ -0,0 +1,236 @@
+"""
+Cache em Memória (LRU + TTL)
+Estrutura genérica usada pelos caches do processo (vereditos, respostas, etc)
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from services.metrics import record_cache_lookup
+
+
+class TTLCache:
+    """
+    Cache limitado em número de entradas (LRU) e com expiração por tempo (TTL)
+
+    Seguro para uso concorrente: todas as operações usam um lock interno.
+    Com `name`, hits e misses também vão para as métricas (/metrics).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, name: Optional[str] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Busca um valor no cache
+
+        Args:
+            key: Chave da entrada
+
+        Returns:
+            Valor armazenado ou None se não existir ou tiver expirado
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+
+        if self.name:
+            record_cache_lookup(self.name, "miss" if entry is None else "hit")
+        return None if entry is None else entry[0]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Busca um valor sem contar hit/miss nem mudar a ordem do LRU
+
+        Usado por quem atualiza uma entrada existente (ex: após uma escrita).
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Armazena um valor, removendo a entrada menos usada se o cache estiver cheio
+
+        Args:
+            key: Chave da entrada
+            value: Valor a armazenar
+        """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove uma entrada do cache (se existir)
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove todas as entradas do cache
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso do cache
+
+        Returns:
+            Dicionário com tamanho, limites, hits, misses e taxa de acerto
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+class StaleWhileRevalidateCache:
+    """
+    Cache de respostas versionadas com stale-while-revalidate
+
+    Cada chave guarda o valor calculado e a versão de onde ele veio (ex:
+    versão da ideia + versão do prompt):
+    - mesma versão e valor com menos de `fresh_seconds`: responde do cache
+    - versão diferente ou valor velho: responde o valor antigo na hora e
+      recalcula em segundo plano (um recálculo por chave de cada vez)
+    - sem valor (ou com mais de `max_stale_seconds`): calcula na hora
+    """
+
+    def __init__(self, max_entries: int, fresh_seconds: float, max_stale_seconds: float, name: Optional[str] = None):
+        self.name = name
+        self.fresh_seconds = fresh_seconds
+        self._entries = TTLCache(max_entries, max_stale_seconds)
+        self._refreshing: Set[Hashable] = set()
+        # Referências fortes às tarefas em segundo plano (evita coleta pelo GC)
+        self._background_tasks: Set["asyncio.Task"] = set()
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        version: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        Busca o valor da chave, calculando ou revalidando conforme a versão
+
+        Args:
+            key: Chave da resposta (ex: endpoint + ids)
+            version: Versão dos dados de entrada
+            compute: Função sem argumentos que retorna a corrotina do cálculo
+            cacheable: Diz se um valor calculado pode ir para o cache (ex: não guardar fallbacks de erro)
+
+        Returns:
+            Valor do cache (possivelmente de uma versão anterior) ou recém-calculado
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, entry_version, computed_at = entry
+            if entry_version == version and time.monotonic() - computed_at < self.fresh_seconds:
+                self.fresh_hits += 1
+                self._record("hit")
+                return value
+
+            self.stale_hits += 1
+            self._record("stale")
+            self._revalidate(key, version, compute, cacheable)
+            return value
+
+        self._record("miss")
+        return await self._compute(key, version, compute, cacheable)
+
+    def _record(self, result: str) -> None:
+        if self.name:
+            record_cache_lookup(self.name, result)
+
+    async def _compute(
+        self,
+        key: Hashable,
+        version: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]]
+    ) -> Any:
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            self._entries.set(key, (value, version, time.monotonic()))
+        return value
+
+    def _revalidate(
+        self,
+        key: Hashable,
+        version: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]]
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def _refresh() -> None:
+            try:
+                await self._compute(key, version, compute, cacheable)
+            except Exception as e:
+                print(f"[AVISO] Falha ao revalidar resposta em cache ({key}): {e}")
+
+        self.refreshes += 1
+        self._refreshing.add(key)
+        task = asyncio.create_task(_refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        task.add_done_callback(lambda _: self._refreshing.discard(key))
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Remove uma entrada do cache (se existir)
+        """
+        self._entries.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso do cache
+
+        Returns:
+            Dicionário com os contadores do armazenamento e os acertos frescos,
+            acertos velhos (respondidos enquanto revalidam) e revalidações
+        """
+        return dict(
+            self._entries.stats(),
+            fresh_seconds=self.fresh_seconds,
+            fresh_hits=self.fresh_hits,
+            stale_hits=self.stale_hits,
+            refreshes=self.refreshes,
+            refreshing=len(self._refreshing)
+        )
@@ -0,0 +1,66 @@
+"""
+Completude da Ideia
+Cálculo puro (sem IA nem banco) de quanto do formulário a ideia já preencheu.
+Usado pela validação do Agente de Ideia e gravado pelo services/db.py no
+campo `completeness`, que a listagem de ideias projeta.
+"""
+from typing import Any, Dict
+
+# Campos do documento que entram no cálculo
+COMPLETENESS_FIELDS = ("title", "description", "target_audience", "dynamic_content")
+
+def validate_idea_completeness(idea_context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analisa se a ideia está completa e pronta para submissão
+    
+    Args:
+        idea_context: Dados da ideia
+        
+    Returns:
+        Dicionário com score de completude e lista de campos faltantes
+    """
+    required_fields = ['title', 'description', 'problema', 'objetivos']
+    missing_fields = []
+    filled_fields = 0
+    
+    # Verifica campos principais
+    for field in ['title', 'description', 'target_audience']:
+        value = idea_context.get(field, "")
+        if value and len(str(value).strip()) > 0:
+            filled_fields += 1
+        elif field in required_fields:
+            missing_fields.append(field)
+
+    # Verifica campos dinâmicos
+    dynamic_content = idea_context.get('dynamic_content', {})
+    for field in ['problema', 'objetivos', 'metricas', 'resultadosEsperados', 'cronograma', 'recursos', 'desafios']:
+        value = dynamic_content.get(field, "")
+        if value and len(str(value).strip()) > 0:
+            filled_fields += 1
+        elif field in required_fields:
+            missing_fields.append(field)
+    
+    total_possible_fields = len(required_fields) + len(['target_audience', 'metricas', 'resultadosEsperados', 'cronograma', 'recursos', 'desafios'])
+    
+    completeness_score = (filled_fields / total_possible_fields) * 100
+    
+    return {
+        "score": completeness_score,
+        "is_complete": completeness_score == 100,
+        "missing_fields": missing_fields,
+        "filled_fields": filled_fields,
+        "total_fields": total_possible_fields
+    }
+
+def idea_completeness(idea_data: Dict[str, Any]) -> int:
+    """
+    Percentual de preenchimento da ideia (0-100)
+
+    Args:
+        idea_data: Documento completo da ideia
+
+    Returns:
+        Score de validate_idea_completeness, arredondado
+    """
+    content = {**idea_data, "dynamic_content": idea_data.get("dynamic_content") or {}}
+    return round(validate_idea_completeness(content)["score"])
@@ -1,22 +1,50 @@
 """
 Serviço de Banco de Dados (Firestore)
-Funções de leitura/escrita no Firebase
+Funções de leitura/escrita no Firebase (assíncronas, via cliente async do Firestore)
 """
-from firebase_config import db
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from firebase_config import async_db as db
+from services.cache import TTLCache
+from services.metrics import observe_firestore
+from app_config import (
+    AUTOSAVE_DEBOUNCE_SECONDS,
+    AUTOSAVE_WRITE_BEHIND_ENABLED,
+    AUTOSAVE_MAX_FLUSH_FAILURES,
+    AUTOSAVE_RETRY_MAX_SECONDS,
+    DB_CACHE_ENABLED,
+    DB_CACHE_MAX_ENTRIES,
+    DB_CACHE_TTL_SECONDS,
+    DB_CACHE_CHAT_TAIL_MESSAGES,
+    BULK_DELETE_PAGE_SIZE,
+    BULK_DELETE_BATCH_SIZE,
+    IDEA_LIST_MAX_LIMIT
+)
+from services.completeness import COMPLETENESS_FIELDS, idea_completeness
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+import asyncio
+import base64
+import binascii
+import copy
+import hashlib
+import json
+import time
 import uuid
 
 # Importa Query apenas se Firebase estiver disponível
 if db:
-    from google.cloud.firestore import Query
-    try:
-        from google.api_core import exceptions as google_exceptions
-    except ImportError:
-        # google.api_core pode não estar disponível em todas as versões
-        google_exceptions = None
+    from google.cloud.firestore import Query, FieldFilter, DELETE_FIELD, Increment
+    from google.cloud.firestore_v1.field_path import FieldPath
 else:
     Query = None
+    FieldFilter = None
+    DELETE_FIELD = None
+    Increment = None
+    FieldPath = None
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    # google.api_core pode não estar disponível em todas as versões
     google_exceptions = None
 
 # ============================================
@@ -40,6 +68,12 @@ def _is_database_not_found_error(error: Exception) -> bool:
         (google_exceptions and isinstance(error, google_exceptions.NotFound))
     )
 
+def _is_missing_document_error(error: Exception) -> bool:
+    """
+    Verifica se o erro é de documento inexistente (ex: update numa ideia apagada)
+    """
+    return google_exceptions is not None and isinstance(error, google_exceptions.NotFound)
+
 def _raise_database_not_found_error():
     """
     Levanta exceção com mensagem clara sobre banco não criado
@@ -49,11 +83,523 @@ def _raise_database_not_found_error():
         "Acesse: https://console.cloud.google.com/firestore/databases?project=sandboxcaixa-84951"
     )
 
+# Campos de conteúdo da ideia (o que a IA lê ao gerar respostas)
+_IDEA_CONTENT_FIELDS = ("title", "description", "target_audience", "status", "dynamic_content")
+
+def idea_version(idea_data: Dict[str, Any]) -> str:
+    """
+    Versão do conteúdo de uma ideia, para chaves de cache
+
+    Usa o contador `version` mantido pelo autosave_idea. Ideias antigas, sem
+    o campo, usam um hash dos campos de conteúdo.
+
+    Args:
+        idea_data: Documento da ideia
+
+    Returns:
+        "v<contador>" ou "h<hash>"
+    """
+    version = idea_data.get("version")
+    if version:
+        return f"v{version}"
+    content = {field: idea_data.get(field) for field in _IDEA_CONTENT_FIELDS}
+    payload = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return "h" + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+# ============================================
+# BUFFER DE AUTOSAVE (WRITE-BEHIND)
+# ============================================
+# Os autosaves de uma ideia são acumulados em memória, campo a campo, e
+# gravados numa única escrita quando a janela AUTOSAVE_DEBOUNCE_SECONDS
+# (contada a partir do primeiro autosave pendente) termina, numa mudança de
+# status, num flush explícito ou no desligamento do servidor. Se a gravação
+# falhar, os campos continuam no buffer e são tentados de novo.
+# As leituras de ideias aplicam o que está pendente, então sempre veem o
+# estado mais recente. O buffer é por processo: com vários workers, cada um
+# grava os autosaves que recebeu.
+
+class _PendingAutosave:
+    """Campos ainda não gravados de uma ideia e quantos autosaves eles juntam"""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.updates = 0
+        self.failures = 0
+        self.timer: Optional["asyncio.Task"] = None
+
+# (user_id, idea_id) -> autosaves aguardando a gravação
+_pending_autosaves: Dict[Tuple[str, str], _PendingAutosave] = {}
+# Autosaves sendo gravados agora (continuam visíveis para as leituras)
+_flushing_autosaves: Dict[Tuple[str, str], _PendingAutosave] = {}
+# Uma gravação por ideia de cada vez, para não inverter a ordem das escritas
+_flush_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+# Ideias apagadas por este processo: autosaves que chegarem depois (ex: aba
+# ainda aberta) não podem recriar o documento com merge=True
+_deleted_ideas = TTLCache(DB_CACHE_MAX_ENTRIES, 60 * 60)
+
+def _merge_idea_fields(target: Dict[str, Any], data: Dict[str, Any]) -> None:
+    """
+    Junta um autosave parcial aos campos pendentes (o mais recente vence)
+
+    `dynamic_content` é mesclado chave a chave, como o merge=True do Firestore.
+    """
+    for field, value in data.items():
+        current = target.get(field)
+        if field == "dynamic_content" and isinstance(value, dict) and isinstance(current, dict):
+            target[field] = {**current, **value}
+        else:
+            target[field] = value
+
+def _without_older_last_updated(stored: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tira `last_updated` dos campos do autosave se o valor gravado for mais novo
+
+    O autosave captura o horário quando entra no buffer; um turno de chat
+    gravado depois (commit_chat_turn) tem um `last_updated` mais recente,
+    que não pode voltar no tempo quando o buffer for gravado.
+    """
+    if "last_updated" not in data or _timestamp_sort_key(stored) <= _timestamp_sort_key(data["last_updated"]):
+        return data
+    return {field: value for field, value in data.items() if field != "last_updated"}
+
+def _apply_pending_autosaves(user_id: str, idea_id: str, idea_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aplica a uma ideia lida do Firestore os autosaves ainda não gravados
+
+    `version` avança um por autosave pendente, o mesmo valor que terá
+    quando a gravação terminar.
+    """
+    key = (user_id, idea_id)
+    for entry in (_flushing_autosaves.get(key), _pending_autosaves.get(key)):
+        if entry is None:
+            continue
+        _merge_idea_fields(idea_data, _without_older_last_updated(idea_data.get("last_updated"), entry.data))
+        if isinstance(idea_data.get("version"), int):
+            idea_data["version"] += entry.updates
+    return idea_data
+
+def _changed_idea_fields(current: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Campos de um autosave que diferem do estado atual da ideia
+
+    O formulário envia todos os campos a cada autosave; só o que mudou de
+    fato é gravado e avança `version`. `dynamic_content` é comparado chave a
+    chave (o merge mantém as chaves que não vierem).
+    """
+    changed = {}
+    for field, value in data.items():
+        stored = current.get(field)
+        if field == "dynamic_content" and isinstance(value, dict) and isinstance(stored, dict):
+            delta = {key: item for key, item in value.items() if key not in stored or stored[key] != item}
+            if delta:
+                changed[field] = delta
+        elif field not in current or stored != value:
+            changed[field] = value
+    return changed
+
+async def _current_idea_fields(user_id: str, idea_id: str) -> Dict[str, Any]:
+    """
+    Estado atual da ideia (gravado + autosaves pendentes), pelo cache de leitura
+
+    Se a leitura falhar, compara só com o que está no buffer.
+    """
+    try:
+        stored = await _load_idea_document(user_id, idea_id)
+    except Exception as e:
+        print(f"[AVISO] Falha ao ler a ideia {idea_id} para comparar o autosave: {e}")
+        stored = None
+    return _apply_pending_autosaves(user_id, idea_id, stored or {})
+
+def _buffer_autosave(user_id: str, idea_id: str, data: Dict[str, Any]) -> None:
+    key = (user_id, idea_id)
+    entry = _pending_autosaves.get(key)
+    if entry is None:
+        entry = _pending_autosaves[key] = _PendingAutosave()
+    _merge_idea_fields(entry.data, data)
+    entry.updates += 1
+    if entry.timer is None:
+        entry.timer = asyncio.create_task(_flush_after_debounce(user_id, idea_id))
+
+def _timestamp_sort_key(value: Any) -> float:
+    # O Firestore devolve datetimes com fuso (UTC) e grava os sem fuso como
+    # UTC; os pendentes ainda são sem fuso, então são lidos da mesma forma
+    if not isinstance(value, datetime):
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+async def _flush_after_debounce(user_id: str, idea_id: str, delay: float = AUTOSAVE_DEBOUNCE_SECONDS) -> None:
+    await asyncio.sleep(delay)
+    try:
+        await flush_autosave(user_id, idea_id)
+    except Exception as e:
+        print(f"[AVISO] Falha ao gravar autosave da ideia {idea_id}: {e}")
+
+def _requeue_autosave(user_id: str, idea_id: str, failed: _PendingAutosave) -> None:
+    """
+    Devolve ao buffer um autosave cuja gravação falhou
+
+    Os campos que chegaram depois continuam valendo sobre os devolvidos.
+    Nada é descartado: a próxima tentativa espera o dobro a cada falha
+    seguida (até AUTOSAVE_RETRY_MAX_SECONDS).
+    """
+    key = (user_id, idea_id)
+    newer = _pending_autosaves.get(key)
+    entry = _PendingAutosave()
+    entry.data = dict(failed.data)
+    entry.updates = failed.updates
+    entry.failures = failed.failures + 1
+    if newer is not None:
+        _merge_idea_fields(entry.data, newer.data)
+        entry.updates += newer.updates
+        if newer.timer is not None:
+            newer.timer.cancel()
+    _pending_autosaves[key] = entry
+
+    delay = min(AUTOSAVE_DEBOUNCE_SECONDS * 2 ** entry.failures, AUTOSAVE_RETRY_MAX_SECONDS)
+    print(f"[AVISO] Autosave da ideia {idea_id} falhou {entry.failures}x; nova tentativa em {delay}s")
+    entry.timer = asyncio.create_task(_flush_after_debounce(user_id, idea_id, delay))
+
+async def flush_autosave(user_id: str, idea_id: str) -> bool:
+    """
+    Grava agora os autosaves pendentes de uma ideia
+
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+
+    Returns:
+        True se havia algo pendente para gravar
+
+    Raises:
+        Exception: Erro da gravação (os campos voltam para o buffer)
+    """
+    key = (user_id, idea_id)
+    lock = _flush_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            entry = _pending_autosaves.pop(key, None)
+            if entry is None:
+                return False
+            if entry.timer is not None and entry.timer is not asyncio.current_task():
+                entry.timer.cancel()
+
+            _flushing_autosaves[key] = entry
+            try:
+                await _write_idea_fields(user_id, idea_id, entry.data, entry.updates)
+            except Exception:
+                _requeue_autosave(user_id, idea_id, entry)
+                raise
+            finally:
+                _flushing_autosaves.pop(key, None)
+            return True
+    finally:
+        if not lock.locked() and key not in _pending_autosaves:
+            _flush_locks.pop(key, None)
+
+async def flush_all_autosaves() -> int:
+    """
+    Grava todos os autosaves pendentes (usado no desligamento do servidor)
+
+    Returns:
+        Quantidade de ideias gravadas
+    """
+    flushed = 0
+    for user_id, idea_id in list(_pending_autosaves):
+        try:
+            if await flush_autosave(user_id, idea_id):
+                flushed += 1
+        except Exception as e:
+            print(f"❌ Erro ao gravar autosave da ideia {idea_id} no desligamento: {e}")
+    return flushed
+
+def _discard_autosave(user_id: str, idea_id: str) -> None:
+    entry = _pending_autosaves.pop((user_id, idea_id), None)
+    if entry is not None and entry.timer is not None:
+        entry.timer.cancel()
+
+@observe_firestore("write")
+async def _write_idea_fields(user_id: str, idea_id: str, data: Dict[str, Any], updates: int) -> None:
+    """
+    Grava campos de uma ideia com merge, avançando `version` em `updates`
+    
+    Não grava nada se a ideia foi apagada (o merge recriaria o documento).
+    """
+    if _deleted_ideas.peek((user_id, idea_id)) is not None:
+        print(f"[INFO] Ideia {idea_id} foi apagada: autosave descartado")
+        return
+    
+    doc_ref = db.collection('users').document(user_id)\
+                .collection('ideas').document(idea_id)
+    
+    data = _with_completeness(user_id, idea_id, data)
+    # O documento em cache já reflete os turnos de chat gravados por este processo
+    cached = _idea_cache.peek((user_id, idea_id))
+    if cached is not None:
+        data = _without_older_last_updated(cached.get("last_updated"), data)
+    
+    # merge=True é crucial: só atualiza os campos enviados
+    # `version` sobe um por autosave (incremento atômico no servidor) e
+    # invalida os caches de respostas da IA ligados à versão anterior
+    try:
+        await doc_ref.set({**data, "version": Increment(updates)}, merge=True)
+    except Exception as e:
+        if _is_database_not_found_error(e):
+            _raise_database_not_found_error()
+        raise
+    
+    _update_cached_idea(user_id, idea_id, data, version_increment=updates)
+
+def _with_completeness(user_id: str, idea_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Acrescenta `completeness` aos campos gravados quando o conteúdo muda
+
+    O percentual depende da ideia inteira: usa o documento em cache com os
+    campos novos por cima, sem ler o Firestore. Sem cache, só calcula se o
+    autosave trouxe todos os campos do cálculo (o formulário envia todos);
+    senão o valor gravado fica para a próxima escrita.
+    """
+    if not any(field in data for field in COMPLETENESS_FIELDS):
+        return data
+    cached = _idea_cache.peek((user_id, idea_id))
+    if cached is not None:
+        current = copy.deepcopy(cached)
+    elif all(field in data for field in COMPLETENESS_FIELDS):
+        current = {}
+    else:
+        return data
+    _merge_idea_fields(current, data)
+    return {**data, "completeness": idea_completeness(current)}
+
+# ============================================
+# CACHE DE LEITURA (IDEIAS E HISTÓRICO RECENTE)
+# ============================================
+# Read-through: o documento da ideia e as últimas mensagens do chat ficam em
+# memória (LRU + TTL). As escritas deste processo atualizam o cache em vez de
+# apagá-lo, então um turno de chat seguido de outro não volta ao Firestore.
+# Escritas de outros processos aparecem quando a entrada expira (TTL).
+
+# (user_id, idea_id) -> documento da ideia como está no Firestore (sem autosaves pendentes)
+_idea_cache = TTLCache(DB_CACHE_MAX_ENTRIES, DB_CACHE_TTL_SECONDS, name="idea_documents")
+# (user_id, idea_id) -> {"messages": [...] (cronológica), "complete": bool}
+# `complete` indica que a lista contém a conversa inteira
+_chat_tail_cache = TTLCache(DB_CACHE_MAX_ENTRIES, DB_CACHE_TTL_SECONDS, name="chat_tails")
+# Momento da última escrita deste processo em cada ideia: leituras que
+# começaram antes dela podem ter visto o estado antigo e não entram no cache
+_last_writes = TTLCache(DB_CACHE_MAX_ENTRIES * 2, DB_CACHE_TTL_SECONDS)
+
+def _as_stored_timestamp(value: Any) -> Any:
+    # O Firestore grava datetimes sem fuso como UTC e os devolve com fuso
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _mark_write(key: Tuple[str, str]) -> None:
+    _last_writes.set(key, time.monotonic())
+
+def _cacheable_since(key: Tuple[str, str], started: float) -> bool:
+    last_write = _last_writes.peek(key)
+    return last_write is None or last_write < started
+
+def _update_cached_idea(
+    user_id: str,
+    idea_id: str,
+    fields: Dict[str, Any],
+    version_increment: int = 0,
+    removed_fields: Iterable[str] = ()
+) -> None:
+    """
+    Aplica uma escrita bem-sucedida ao documento da ideia em cache (se houver)
+    """
+    key = (user_id, idea_id)
+    _mark_write(key)
+    cached = _idea_cache.peek(key)
+    if cached is None:
+        return
+    updated = copy.deepcopy(cached)
+    _merge_idea_fields(updated, {field: _as_stored_timestamp(value) for field, value in fields.items()})
+    if version_increment and isinstance(updated.get("version"), int):
+        updated["version"] += version_increment
+    for field in removed_fields:
+        updated.pop(field, None)
+    _idea_cache.set(key, updated)
+
+def _append_cached_chat(user_id: str, idea_id: str, messages: List[Dict[str, Any]]) -> None:
+    """
+    Acrescenta mensagens recém-gravadas ao fim do histórico em cache (se houver)
+    """
+    key = (user_id, idea_id)
+    _mark_write(key)
+    cached = _chat_tail_cache.peek(key)
+    if cached is None:
+        return
+    tail = cached["messages"] + [
+        {"role": message["role"], "content": message["content"], "timestamp": _as_stored_timestamp(message["timestamp"])}
+        for message in messages
+    ]
+    complete = cached["complete"] and len(tail) <= DB_CACHE_CHAT_TAIL_MESSAGES
+    _chat_tail_cache.set(key, {"messages": tail[-DB_CACHE_CHAT_TAIL_MESSAGES:], "complete": complete})
+
+def _forget_cached_idea(user_id: str, idea_id: str) -> None:
+    key = (user_id, idea_id)
+    _mark_write(key)
+    _idea_cache.invalidate(key)
+    _chat_tail_cache.invalidate(key)
+
+async def _load_idea_document(user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Documento da ideia pelo cache; em caso de miss, lê do Firestore e guarda
+    """
+    key = (user_id, idea_id)
+    if DB_CACHE_ENABLED:
+        cached = _idea_cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+    started = time.monotonic()
+    data = await _fetch_idea_document(user_id, idea_id)
+    if DB_CACHE_ENABLED and data is not None and _cacheable_since(key, started):
+        _idea_cache.set(key, copy.deepcopy(data))
+    return data
+
+@observe_firestore("read")
+async def _fetch_idea_document(user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
+    doc = await db.collection('users').document(user_id)\
+            .collection('ideas').document(idea_id).get()
+    return doc.to_dict() if doc.exists else None
+
+async def _load_chat_tail(user_id: str, idea_id: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Últimas `limit` mensagens (role, content, timestamp) pelo cache; em caso de
+    miss (ou se o cache tiver menos mensagens que o pedido), lê do Firestore
+    """
+    key = (user_id, idea_id)
+    if DB_CACHE_ENABLED:
+        cached = _chat_tail_cache.get(key)
+        if cached is not None and (cached["complete"] or len(cached["messages"]) >= limit):
+            return [dict(message) for message in cached["messages"][-limit:]] if limit > 0 else []
+
+    started = time.monotonic()
+    messages = await _fetch_chat_tail(user_id, idea_id, limit)
+    if DB_CACHE_ENABLED and limit <= DB_CACHE_CHAT_TAIL_MESSAGES and _cacheable_since(key, started):
+        _chat_tail_cache.set(key, {
+            "messages": [dict(message) for message in messages],
+            "complete": len(messages) < limit
+        })
+    return messages
+
+@observe_firestore("read")
+async def _fetch_chat_tail(user_id: str, idea_id: str, limit: int) -> List[Dict[str, Any]]:
+    # order_by DESC + limit e depois inverte, para manter a ordem cronológica
+    docs = await db.collection('users').document(user_id)\
+             .collection('ideas').document(idea_id)\
+             .collection('chat')\
+             .order_by('timestamp', direction=Query.DESCENDING)\
+             .limit(limit).get()
+    
+    messages = []
+    for doc in docs:
+        data = doc.to_dict()
+        messages.append({
+            "role": data['role'],
+            "content": data['content'],
+            "timestamp": data.get('timestamp')
+        })
+    
+    messages.reverse()
+    return messages
+
+# ============================================
+# EXCLUSÃO EM LOTE
+# ============================================
+# Subcoleções (o chat de uma ideia) são apagadas em páginas: cada página traz
+# só os IDs dos documentos e vira lotes (WriteBatch) enviados em paralelo,
+# enquanto a página seguinte já é lida. Uma conversa de 1.000 mensagens custa
+# poucas chamadas, e não uma por mensagem.
+
+# Recebe a quantidade de documentos apagados até agora
+DeleteProgress = Callable[[int], None]
+
+@observe_firestore("read")
+async def _list_document_page(query: Any) -> List[Any]:
+    return await query.get()
+
+@observe_firestore("delete")
+async def _commit_deletes(references: List[Any]) -> List[Any]:
+    batch = db.batch()
+    for reference in references:
+        batch.delete(reference)
+    await batch.commit()
+    return references
+
+async def _delete_references(references: List[Any]) -> int:
+    """
+    Apaga os documentos em lotes de BULK_DELETE_BATCH_SIZE, em paralelo
+    """
+    chunks = [
+        references[start:start + BULK_DELETE_BATCH_SIZE]
+        for start in range(0, len(references), BULK_DELETE_BATCH_SIZE)
+    ]
+    await asyncio.gather(*(_commit_deletes(chunk) for chunk in chunks))
+    return len(references)
+
+async def _no_page() -> List[Any]:
+    return []
+
+async def _delete_collection(collection_ref: Any, on_progress: Optional[DeleteProgress] = None) -> int:
+    """
+    Apaga todos os documentos de uma coleção, inclusive os das subcoleções deles
+    
+    Args:
+        collection_ref: Coleção a apagar
+        on_progress: Chamado após cada página com o total apagado até ali
+        
+    Returns:
+        Quantidade de documentos apagados
+    """
+    # recursive() inclui os descendentes; a projeção no ID não traz o conteúdo
+    query = collection_ref.recursive()\
+                .select([FieldPath.document_id()])\
+                .limit(BULK_DELETE_PAGE_SIZE)
+    
+    deleted = 0
+    page = await _list_document_page(query)
+    while page:
+        # O cursor é o último documento lido (não depende de ele ainda existir)
+        next_page = (
+            _list_document_page(query.start_after(page[-1]))
+            if len(page) == BULK_DELETE_PAGE_SIZE
+            else _no_page()
+        )
+        count, page = await asyncio.gather(
+            _delete_references([snapshot.reference for snapshot in page]),
+            next_page
+        )
+        deleted += count
+        if on_progress:
+            on_progress(deleted)
+    return deleted
+
+async def _delete_subcollections(doc_ref: Any, on_progress: Optional[DeleteProgress] = None) -> int:
+    """
+    Apaga todas as subcoleções de um documento (o documento em si continua)
+    """
+    deleted = 0
+    async for collection_ref in doc_ref.collections():
+        offset = deleted
+        deleted += await _delete_collection(
+            collection_ref,
+            (lambda count: on_progress(offset + count)) if on_progress else None
+        )
+    return deleted
+
 # ============================================
 # OPERAÇÕES COM IDEIAS
 # ============================================
 
-def create_new_idea(user_id: str, title: str = "Nova Ideia") -> Dict[str, Any]:
+@observe_firestore("write")
+async def create_new_idea(user_id: str, title: str = "Nova Ideia") -> Dict[str, Any]:
     """
     Cria uma nova ideia para o usuário
     
@@ -75,57 +621,84 @@ def create_new_idea(user_id: str, title: str = "Nova Ideia") -> Dict[str, Any]:
         "target_audience": "",
         "status": "draft",
         "dynamic_content": {},
+        "version": 1,
         "created_at": datetime.now(),
         "last_updated": datetime.now()
     }
+    idea_data["completeness"] = idea_completeness(idea_data)
     
     doc_ref = db.collection('users').document(user_id)\
                 .collection('ideas').document(idea_id)
     
     try:
-        doc_ref.set(idea_data)
+        await doc_ref.set(idea_data)
     except Exception as e:
         if _is_database_not_found_error(e):
             _raise_database_not_found_error()
         raise
     
+    _mark_write((user_id, idea_id))
+    if DB_CACHE_ENABLED:
+        _idea_cache.set((user_id, idea_id), {
+            **idea_data,
+            "created_at": _as_stored_timestamp(idea_data["created_at"]),
+            "last_updated": _as_stored_timestamp(idea_data["last_updated"])
+        })
+        _chat_tail_cache.set((user_id, idea_id), {"messages": [], "complete": True})
+    
     return {**idea_data, "id": idea_id}
 
-def autosave_idea(user_id: str, idea_id: str, data: dict) -> Dict[str, Any]:
+async def autosave_idea(user_id: str, idea_id: str, data: dict, flush: bool = False) -> Dict[str, Any]:
     """
     Atualiza apenas os campos que mudaram (Patch/Merge)
     Estratégia de Lazy Save para otimizar performance
     
+    Campos iguais aos já gravados (ou pendentes no buffer) são ignorados: um
+    autosave sem mudança real não grava nada nem avança `version`.
+    
+    Com AUTOSAVE_WRITE_BEHIND_ENABLED os campos vão para o buffer de autosave
+    e autosaves seguidos da mesma ideia viram uma única escrita. Mudanças de
+    status e `flush=True` gravam na hora, assim como qualquer autosave de uma
+    ideia cujas últimas AUTOSAVE_MAX_FLUSH_FAILURES gravações falharam: o erro
+    chega ao cliente (os campos continuam no buffer).
+    
     Args:
         user_id: ID do usuário
         idea_id: ID da ideia
         data: Dicionário com os campos a atualizar
+        flush: Se True, grava imediatamente (junto com o que estiver pendente)
         
     Returns:
-        Dados atualizados da ideia
+        Campos que mudaram (vazio se nada mudou)
+    
+    Raises:
+        Exception: Erro da gravação, quando ela acontece na hora
     """
     if not db:
         raise Exception("Firebase não está configurado")
     
-    doc_ref = db.collection('users').document(user_id)\
-                .collection('ideas').document(idea_id)
+    data = _changed_idea_fields(await _current_idea_fields(user_id, idea_id), data)
+    if not data:
+        if flush and AUTOSAVE_WRITE_BEHIND_ENABLED:
+            await flush_autosave(user_id, idea_id)
+        return data
     
     # Adiciona timestamp de modificação
     data['last_updated'] = datetime.now()
     
-    # merge=True é crucial: só atualiza os campos enviados
-    try:
-        doc_ref.set(data, merge=True)
-    except Exception as e:
-        if _is_database_not_found_error(e):
-            _raise_database_not_found_error()
-        raise
+    if not AUTOSAVE_WRITE_BEHIND_ENABLED:
+        await _write_idea_fields(user_id, idea_id, data, 1)
+        return data
+    
+    _buffer_autosave(user_id, idea_id, data)
+    if flush or "status" in data or _pending_autosaves[(user_id, idea_id)].failures >= AUTOSAVE_MAX_FLUSH_FAILURES:
+        await flush_autosave(user_id, idea_id)
     
     return data
 
-def get_idea(user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
+async def get_idea(user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
     """
-    Busca uma ideia específica
+    Busca uma ideia específica (pelo cache de leitura, com autosaves pendentes)
     
     Args:
         user_id: ID do usuário
@@ -138,23 +711,22 @@ def get_idea(user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
         raise Exception("Firebase não está configurado")
     
     try:
-        doc = db.collection('users').document(user_id)\
-                .collection('ideas').document(idea_id).get()
-        
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = idea_id
-            return data
-        return None
+        data = await _load_idea_document(user_id, idea_id)
     except Exception as e:
         if _is_database_not_found_error(e):
             _raise_database_not_found_error()
         raise
+    
+    if data is None:
+        return None
+    data = _apply_pending_autosaves(user_id, idea_id, data)
+    data['id'] = idea_id
+    return data
 
-def get_idea_context(user_id: str, idea_id: str) -> Dict[str, Any]:
+async def get_idea_context(user_id: str, idea_id: str) -> Dict[str, Any]:
     """
     Lê os dados da ideia para a IA entender o contexto
-    Usado antes de gerar respostas do JuniBox
+    Usado antes de gerar respostas do JuniBox (pelo cache de leitura)
     
     Args:
         user_id: ID do usuário
@@ -167,89 +739,170 @@ def get_idea_context(user_id: str, idea_id: str) -> Dict[str, Any]:
         return {}
     
     try:
-        doc = db.collection('users').document(user_id)\
-                .collection('ideas').document(idea_id).get()
-        
-        return doc.to_dict() if doc.exists else {}
+        data = await _load_idea_document(user_id, idea_id)
     except Exception as e:
         if _is_database_not_found_error(e):
             # Para get_idea_context, retorna vazio ao invés de erro
             return {}
         raise
+    
+    return _apply_pending_autosaves(user_id, idea_id, data) if data is not None else {}
+
+# Campos projetados na listagem (select): o tamanho do resumo não depende
+# do conteúdo da ideia
+_IDEA_SUMMARY_FIELDS = ("title", "status", "completeness", "created_at", "last_updated")
 
-def list_user_ideas(user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+def _encode_idea_cursor(last_updated: Any, idea_id: str) -> str:
+    payload = json.dumps({"t": last_updated.isoformat(), "id": idea_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def _decode_idea_cursor(cursor: str) -> Tuple[datetime, str]:
     """
-    Lista todas as ideias de um usuário
+    Lê o cursor opaco da listagem (last_updated + ID da última ideia da página)
+    
+    Raises:
+        ValueError: Cursor inválido
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (binascii.Error, UnicodeError, TypeError, KeyError, ValueError) as e:
+        raise ValueError("Cursor de paginação inválido") from e
+
+async def list_user_ideas(
+    user_id: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Lista as ideias de um usuário (resumos), da mais recente para a mais antiga
+    
+    Só os campos do resumo são lidos (projeção com select), então o custo da
+    página não cresce com o conteúdo das ideias. A paginação usa cursor em
+    (last_updated, ID): as páginas seguintes não releem as anteriores.
     
     Args:
         user_id: ID do usuário
-        limit: Número máximo de ideias a retornar
+        limit: Número máximo de ideias na página (até IDEA_LIST_MAX_LIMIT)
+        cursor: `next_cursor` da página anterior (None para a primeira)
+        status: Filtra pelo status (ex: "draft", "submitted")
         
     Returns:
-        Lista de dicionários com as ideias (vazia se não houver ideias ou Firebase não configurado)
+        {"ideas": [{"id", "title", "status", "completeness", "created_at",
+        "last_updated"}], "next_cursor": str ou None na última página}
+        (página vazia se não houver ideias ou Firebase não configurado)
+        
+    Raises:
+        ValueError: Cursor inválido
+        Exception: Erro da consulta (ex: índice composto do filtro por status
+            não criado, ver firestore.indexes.json)
     """
+    after = _decode_idea_cursor(cursor) if cursor else None
+    limit = max(1, min(limit, IDEA_LIST_MAX_LIMIT))
+    
     if not db:
         # Retorna lista vazia se Firebase não estiver configurado
         # Isso permite que o frontend funcione mesmo sem Firebase
         print("[AVISO] Firebase não configurado. Retornando lista vazia de ideias.")
-        return []
+        return {"ideas": [], "next_cursor": None}
     
     try:
-        docs = db.collection('users').document(user_id)\
-                 .collection('ideas')\
-                 .order_by('last_updated', direction=Query.DESCENDING)\
-                 .limit(limit).stream()
+        query = db.collection('users').document(user_id).collection('ideas')
+        if status:
+            # Filtro + ordenação usam o índice composto de firestore.indexes.json
+            query = query.where(filter=FieldFilter('status', '==', status))
+        query = query.order_by('last_updated', direction=Query.DESCENDING)\
+                     .order_by(FieldPath.document_id(), direction=Query.DESCENDING)\
+                     .select(list(_IDEA_SUMMARY_FIELDS))
+        if after:
+            query = query.start_after({"last_updated": after[0], FieldPath.document_id(): after[1]})
+        
+        # Uma ideia a mais só para saber se existe próxima página
+        docs = await _list_document_page(query.limit(limit + 1))
         
+        page = docs[:limit]
         ideas = []
-        for doc in docs:
-            idea_data = doc.to_dict()
-            idea_data['id'] = doc.id
-            ideas.append(idea_data)
+        for doc in page:
+            idea_data = _apply_pending_autosaves(user_id, doc.id, doc.to_dict())
+            summary = {field: idea_data.get(field) for field in _IDEA_SUMMARY_FIELDS}
+            summary['id'] = doc.id
+            ideas.append(summary)
+        
+        # O cursor vem do que está gravado (é o que a consulta ordena). A
+        # página mantém a ordem da consulta mesmo com autosaves pendentes:
+        # reordenar aqui faria ideias pularem ou repetirem entre páginas
+        next_cursor = None
+        if len(docs) > limit:
+            last = page[-1]
+            next_cursor = _encode_idea_cursor(last.to_dict()['last_updated'], last.id)
         
-        return ideas
+        return {"ideas": ideas, "next_cursor": next_cursor}
     except Exception as e:
         if _is_database_not_found_error(e):
             # Para list_user_ideas, retorna lista vazia ao invés de erro
             print(f"[AVISO] Banco de dados Firestore não foi criado. Retornando lista vazia.")
-            return []
-        # Se houver erro ao buscar (ex: coleção não existe), retorna lista vazia
-        print(f"[AVISO] Erro ao buscar ideias: {e}. Retornando lista vazia.")
-        return []
+            return {"ideas": [], "next_cursor": None}
+        # Demais erros (ex: índice composto ausente) sobem: uma lista vazia
+        # esconderia o problema
+        raise
 
-def delete_idea(user_id: str, idea_id: str) -> bool:
+async def delete_idea(user_id: str, idea_id: str, on_progress: Optional[DeleteProgress] = None) -> int:
     """
     Deleta uma ideia e todo seu histórico de chat
     
+    O Firestore não apaga sub-coleções junto com o documento: o chat é
+    apagado antes (em lotes, ver _delete_collection) e a ideia por último,
+    então uma falha no meio nunca deixa mensagens órfãs.
+    
     Args:
         user_id: ID do usuário
         idea_id: ID da ideia
+        on_progress: Chamado com a quantidade de documentos apagados até ali
         
     Returns:
-        True se deletado com sucesso
+        Quantidade de documentos apagados (mensagens + a ideia)
     """
     if not db:
         raise Exception("Firebase não está configurado")
     
-    # Deleta o documento da ideia
-    # O Firestore não deleta sub-coleções automaticamente
-    # Em produção, considere usar Cloud Functions para isso
     doc_ref = db.collection('users').document(user_id)\
                 .collection('ideas').document(idea_id)
     
+    # Autosaves pendentes recriariam o documento depois da exclusão: a
+    # marcação faz as gravações seguintes pularem a ideia e o lock de
+    # gravação espera a que estiver em andamento terminar antes de apagar
+    key = (user_id, idea_id)
+    _deleted_ideas.set(key, True)
+    _discard_autosave(user_id, idea_id)
+    lock = _flush_locks.setdefault(key, asyncio.Lock())
+    
     try:
-        doc_ref.delete()
+        async with lock:
+            _discard_autosave(user_id, idea_id)
+            deleted = await _delete_subcollections(doc_ref, on_progress)
+            await _commit_deletes([doc_ref])
+        deleted += 1
+        if on_progress:
+            on_progress(deleted)
+        return deleted
     except Exception as e:
+        # A ideia (ou parte dela) continua existindo: volta a aceitar autosaves
+        _deleted_ideas.invalidate(key)
         if _is_database_not_found_error(e):
             _raise_database_not_found_error()
         raise
-    
-    return True
+    finally:
+        _forget_cached_idea(user_id, idea_id)
+        if not lock.locked() and key not in _pending_autosaves:
+            _flush_locks.pop(key, None)
 
 # ============================================
 # OPERAÇÕES COM CHAT
 # ============================================
 
-def save_chat_message(user_id: str, idea_id: str, role: str, content: str) -> str:
+@observe_firestore("write")
+async def save_chat_message(user_id: str, idea_id: str, role: str, content: str) -> str:
     """
     Salva uma mensagem no histórico de chat
     
@@ -272,20 +925,103 @@ def save_chat_message(user_id: str, idea_id: str, role: str, content: str) -> st
     }
     
     try:
-        doc_ref = db.collection('users').document(user_id)\
+        doc_ref = await db.collection('users').document(user_id)\
                     .collection('ideas').document(idea_id)\
                     .collection('chat').add(message_data)
         
+        _append_cached_chat(user_id, idea_id, [message_data])
         return doc_ref[1].id
     except Exception as e:
         if _is_database_not_found_error(e):
             _raise_database_not_found_error()
         raise
 
-def get_chat_history(user_id: str, idea_id: str, limit: int = 10) -> List[Dict[str, str]]:
+@observe_firestore("write")
+async def commit_chat_turn(
+    user_id: str,
+    idea_id: str,
+    user_message: Optional[str],
+    assistant_message: str,
+    user_timestamp: Optional[datetime] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Salva um turno de chat numa única escrita em lote (WriteBatch)
+    
+    A mensagem do usuário, a resposta da IA e o `last_updated` da ideia são
+    gravados juntos: ou o turno inteiro é salvo ou nada é. Se a mensagem do
+    usuário já foi salva antes (ex: streaming, para ficar legível durante a
+    geração), passe user_message=None e o lote grava só a resposta e a ideia.
+    
+    Como antes do lote, conversar numa ideia que ainda não tem documento
+    (nunca salva) funciona: as mensagens são gravadas e o `last_updated` fica
+    de fora, sem criar um documento de ideia incompleto.
+    
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        user_message: Mensagem do usuário (None se já foi salva)
+        assistant_message: Resposta da IA
+        user_timestamp: Quando a mensagem do usuário chegou (padrão: agora)
+        
+    Returns:
+        {"user_message_id": str | None, "assistant_message_id": str}
+    """
+    if not db:
+        raise Exception("Firebase não está configurado")
+    
+    idea_ref = db.collection('users').document(user_id)\
+                 .collection('ideas').document(idea_id)
+    chat_ref = idea_ref.collection('chat')
+    writes = []
+    messages = []
+    
+    user_message_id = None
+    user_timestamp = user_timestamp or datetime.now()
+    if user_message is not None:
+        user_doc = chat_ref.document()
+        messages.append({"role": "user", "content": user_message, "timestamp": user_timestamp})
+        writes.append((user_doc, messages[-1]))
+        user_message_id = user_doc.id
+    
+    # A resposta vem sempre depois da pergunta na ordenação por timestamp
+    assistant_timestamp = max(datetime.now(), user_timestamp + timedelta(microseconds=1))
+    assistant_doc = chat_ref.document()
+    messages.append({"role": "assistant", "content": assistant_message, "timestamp": assistant_timestamp})
+    writes.append((assistant_doc, messages[-1]))
+    
+    async def _commit(touch_idea: bool) -> None:
+        batch = db.batch()
+        for doc_ref, message in writes:
+            batch.set(doc_ref, message)
+        if touch_idea:
+            batch.update(idea_ref, {"last_updated": assistant_timestamp})
+        await batch.commit()
+    
+    try:
+        # Pelo cache de leitura: numa conversa ativa não custa uma leitura
+        touch_idea = await _load_idea_document(user_id, idea_id) is not None
+        try:
+            await _commit(touch_idea)
+        except Exception as e:
+            # A ideia foi apagada entre a checagem e o lote: grava só as mensagens
+            if not (touch_idea and _is_missing_document_error(e)):
+                raise
+            touch_idea = False
+            await _commit(touch_idea)
+    except Exception as e:
+        if _is_database_not_found_error(e):
+            _raise_database_not_found_error()
+        raise
+    
+    _append_cached_chat(user_id, idea_id, messages)
+    if touch_idea:
+        _update_cached_idea(user_id, idea_id, {"last_updated": assistant_timestamp})
+    return {"user_message_id": user_message_id, "assistant_message_id": assistant_doc.id}
+
+async def get_chat_history(user_id: str, idea_id: str, limit: int = 10) -> List[Dict[str, str]]:
     """
     Busca o histórico de chat de uma ideia
-    Retorna as últimas N mensagens em ordem cronológica
+    Retorna as últimas N mensagens em ordem cronológica (pelo cache de leitura)
     
     Args:
         user_id: ID do usuário
@@ -295,37 +1031,106 @@ def get_chat_history(user_id: str, idea_id: str, limit: int = 10) -> List[Dict[s
     Returns:
         Lista de dicionários com role e content
     """
+    messages = await get_recent_chat_messages(user_id, idea_id, limit)
+    return [{"role": message["role"], "content": message["content"]} for message in messages]
+
+async def get_recent_chat_messages(user_id: str, idea_id: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Busca as últimas N mensagens com timestamp, em ordem cronológica
+    Usado pela memória de conversa para saber o que já foi resumido
+    
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        limit: Número máximo de mensagens a retornar
+        
+    Returns:
+        Lista de dicionários com role, content e timestamp
+    """
     if not db:
         return []
     
     try:
-        # Usar order_by DESC + limit + get() ao invés de limit_to_last().stream()
-        # Depois inverter a ordem para manter ordem cronológica
-        docs = db.collection('users').document(user_id)\
-                 .collection('ideas').document(idea_id)\
-                 .collection('chat')\
-                 .order_by('timestamp', direction=Query.DESCENDING)\
-                 .limit(limit).get()
-        
-        history = []
-        for doc in docs:
-            data = doc.to_dict()
-            history.append({
-                "role": data['role'],
-                "content": data['content']
-            })
+        return await _load_chat_tail(user_id, idea_id, limit)
+    except Exception as e:
+        if _is_database_not_found_error(e):
+            return []
+        raise
+
+@observe_firestore("read")
+async def get_chat_messages_after(user_id: str, idea_id: str, after: Optional[datetime], limit: int) -> List[Dict[str, Any]]:
+    """
+    Busca as mensagens posteriores a um timestamp, em ordem cronológica
+    
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        after: Timestamp de corte (None para buscar desde o início)
+        limit: Número máximo de mensagens a retornar
         
-        # Inverter para manter ordem cronológica (mais antiga primeiro)
-        history.reverse()
+    Returns:
+        Lista de dicionários com role, content e timestamp
+    """
+    if not db:
+        return []
+    
+    query = db.collection('users').document(user_id)\
+              .collection('ideas').document(idea_id)\
+              .collection('chat')
+    if after is not None:
+        query = query.where(filter=FieldFilter('timestamp', '>', after))
+    
+    try:
+        docs = await query.order_by('timestamp', direction=Query.ASCENDING).limit(limit).get()
         
-        return history
+        return [
+            {
+                "role": data['role'],
+                "content": data['content'],
+                "timestamp": data.get('timestamp')
+            }
+            for data in (doc.to_dict() for doc in docs)
+        ]
     except Exception as e:
         if _is_database_not_found_error(e):
-            # Para get_chat_history, retorna lista vazia ao invés de erro
             return []
         raise
 
-def get_full_chat_history(user_id: str, idea_id: str) -> List[Dict[str, Any]]:
+@observe_firestore("write")
+async def save_chat_memory(user_id: str, idea_id: str, memory: Dict[str, Any]) -> bool:
+    """
+    Salva o resumo acumulado da conversa no documento da ideia
+    
+    Não altera `last_updated` (o resumo não é uma edição do usuário) e não
+    cria o documento se a ideia não existir.
+    
+    Args:
+        user_id: ID do usuário
+        idea_id: ID da ideia
+        memory: Dados da memória (summary, summarized_until, summarized_messages)
+        
+    Returns:
+        True se salvo, False se a ideia não existe
+    """
+    if not db:
+        return False
+    
+    doc_ref = db.collection('users').document(user_id)\
+                .collection('ideas').document(idea_id)
+    
+    try:
+        await doc_ref.update({"chat_memory": memory})
+        _update_cached_idea(user_id, idea_id, {"chat_memory": memory})
+        return True
+    except Exception as e:
+        if google_exceptions and isinstance(e, google_exceptions.NotFound):
+            return False
+        if _is_database_not_found_error(e):
+            _raise_database_not_found_error()
+        raise
+
+@observe_firestore("read")
+async def get_full_chat_history(user_id: str, idea_id: str) -> List[Dict[str, Any]]:
     """
     Busca o histórico completo de chat com timestamps
     Usado para exibir no frontend
@@ -348,7 +1153,7 @@ def get_full_chat_history(user_id: str, idea_id: str) -> List[Dict[str, Any]]:
                  .stream()
         
         messages = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             # Converter timestamp do Firestore para datetime ISO string
             timestamp = data.get('timestamp')
@@ -388,33 +1193,52 @@ def get_full_chat_history(user_id: str, idea_id: str) -> List[Dict[str, Any]]:
             return []
         raise
 
-def clear_chat_history(user_id: str, idea_id: str) -> bool:
+@observe_firestore("write")
+async def _drop_chat_memory(user_id: str, idea_id: str) -> bool:
+    """
+    Descarta o resumo da conversa (chat_memory) da ideia, se ela existir
+    """
+    try:
+        await db.collection('users').document(user_id)\
+                .collection('ideas').document(idea_id)\
+                .update({"chat_memory": DELETE_FIELD})
+        return True
+    except Exception as e:
+        if google_exceptions and isinstance(e, google_exceptions.NotFound):
+            return False
+        raise
+
+async def clear_chat_history(user_id: str, idea_id: str, on_progress: Optional[DeleteProgress] = None) -> int:
     """
     Limpa todo o histórico de chat de uma ideia
     
     Args:
         user_id: ID do usuário
         idea_id: ID da ideia
+        on_progress: Chamado com a quantidade de mensagens apagadas até ali
         
     Returns:
-        True se limpo com sucesso
+        Quantidade de mensagens apagadas
     """
     if not db:
         raise Exception("Firebase não está configurado")
     
     try:
-        # Busca todas as mensagens
-        docs = db.collection('users').document(user_id)\
-                 .collection('ideas').document(idea_id)\
-                 .collection('chat').stream()
+        chat_ref = db.collection('users').document(user_id)\
+                     .collection('ideas').document(idea_id)\
+                     .collection('chat')
+        deleted = await _delete_collection(chat_ref, on_progress)
         
-        # Deleta cada mensagem
-        for doc in docs:
-            doc.reference.delete()
+        # Descarta o resumo da conversa apagada
+        await _drop_chat_memory(user_id, idea_id)
         
-        return True
+        _update_cached_idea(user_id, idea_id, {}, removed_fields=("chat_memory",))
+        if DB_CACHE_ENABLED:
+            _chat_tail_cache.set((user_id, idea_id), {"messages": [], "complete": True})
+        return deleted
     except Exception as e:
+        # Parte das mensagens pode ter sido apagada: o cache não vale mais
+        _forget_cached_idea(user_id, idea_id)
         if _is_database_not_found_error(e):
             _raise_database_not_found_error()
         raise
-
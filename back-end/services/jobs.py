@@ -0,0 +1,105 @@
+"""
+Tarefas em Segundo Plano com Progresso
+Operações longas (ex: apagar uma conversa muito grande) rodam fora da
+requisição: o endpoint devolve o ID da tarefa na hora e o cliente consulta o
+progresso depois. As tarefas ficam só na memória deste processo.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app_config import BACKGROUND_JOB_RETENTION_SECONDS
+
+# Recebe o progresso atual (ex: documentos já apagados)
+ProgressCallback = Callable[[int], None]
+
+# job_id -> estado da tarefa (ver _new_job)
+_jobs: Dict[str, Dict[str, Any]] = {}
+# (tipo, alvo) -> job_id da tarefa em andamento, para não repetir a mesma operação
+_active: Dict[Tuple[str, str], str] = {}
+# Referências fortes às tarefas em segundo plano (evita coleta pelo GC)
+_background_tasks: Set["asyncio.Task"] = set()
+
+def _new_job(kind: str, target: str) -> Dict[str, Any]:
+    return {
+        "job_id": uuid.uuid4().hex,
+        "kind": kind,
+        "target": target,
+        "status": "running",
+        "progress": 0,
+        "result": None,
+        "error": None,
+        "started_at": time.time(),
+        "finished_at": None
+    }
+
+def _prune_finished_jobs() -> None:
+    """
+    Esquece tarefas concluídas há mais de BACKGROUND_JOB_RETENTION_SECONDS
+    """
+    cutoff = time.time() - BACKGROUND_JOB_RETENTION_SECONDS
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job["finished_at"] is not None and job["finished_at"] < cutoff
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+def start_job(
+    kind: str,
+    target: str,
+    run: Callable[[ProgressCallback], Awaitable[Any]]
+) -> Dict[str, Any]:
+    """
+    Inicia uma tarefa em segundo plano (ou devolve a que já está em andamento)
+
+    Args:
+        kind: Tipo da operação (ex: "clear_chat", "delete_idea")
+        target: Alvo da operação (ex: "user_id/idea_id")
+        run: Função assíncrona que recebe o callback de progresso
+
+    Returns:
+        Cópia do estado da tarefa (com job_id)
+    """
+    _prune_finished_jobs()
+
+    key = (kind, target)
+    if key in _active:
+        return dict(_jobs[_active[key]])
+
+    job = _new_job(kind, target)
+    _jobs[job["job_id"]] = job
+    _active[key] = job["job_id"]
+
+    def _progress(value: int) -> None:
+        job["progress"] = value
+
+    async def _run() -> None:
+        try:
+            job["result"] = await run(_progress)
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "error"
+            job["error"] = str(e)
+            print(f"[AVISO] Tarefa {kind} ({target}) falhou: {e}")
+        finally:
+            job["finished_at"] = time.time()
+            _active.pop(key, None)
+
+    task = asyncio.create_task(_run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return dict(job)
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Retorna o estado de uma tarefa
+
+    Returns:
+        Cópia do estado {"job_id", "kind", "target", "status" (running, done
+        ou error), "progress", "result", "error", "started_at", "finished_at"}
+        ou None se a tarefa não existe (ou já foi esquecida)
+    """
+    job = _jobs.get(job_id)
+    return dict(job) if job else None
@@ -0,0 +1,425 @@
+"""
+Cliente LLM Resiliente (Groq)
+Cliente compartilhado pelos agentes, com a mesma interface do AsyncGroq
+(client.chat.completions.create) e, em cada chamada:
+- prazo total (deadline) que cobre todas as tentativas
+- novas tentativas em 429/5xx com backoff exponencial e jitter,
+  respeitando o cabeçalho retry-after do provedor
+- requisições "hedged" opcionais: se a resposta passar do p95 de latência
+  do modelo, uma segunda requisição idêntica é disparada e vence a primeira
+- circuit breaker por modelo: após falhas seguidas, falha rápido por um
+  tempo em vez de acumular requisições presas (estado exposto em /health)
+- cota RPM/TPM por modelo com fila por prioridade (services/rate_limiter.py)
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app_config import (
+    GROQ_API_KEY,
+    LLM_DEADLINE_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_HEDGING_ENABLED,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_SECONDS,
+    LLM_RATE_LIMIT_ENABLED
+)
+from services.metrics import record_llm_retry
+from services.rate_limiter import PRIORITY_CHAT, RateScheduler, estimate_call_tokens
+
+try:
+    import groq
+    from groq import AsyncGroq
+    _CONNECTION_ERRORS = (groq.APIConnectionError, groq.APITimeoutError)
+except ImportError:
+    AsyncGroq = None
+    _CONNECTION_ERRORS = ()
+
+# Status HTTP que valem nova tentativa
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# ============================================
+# CLASSIFICAÇÃO DE ERROS
+# ============================================
+
+class CircuitOpenError(Exception):
+    """O circuit breaker do modelo está aberto: a chamada nem foi feita"""
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, _CONNECTION_ERRORS) or _status_code(error) in _RETRYABLE_STATUS
+
+def _indicates_degradation(error: Exception) -> bool:
+    # 429 é limite de uso da conta, não provedor degradado: não abre o circuito
+    return _is_retryable(error) and _status_code(error) != 429
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Lê retry-after-ms / retry-after (segundos ou data HTTP) da resposta de erro
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff_seconds(attempt: int) -> float:
+    # Backoff exponencial com "full jitter"
+    cap = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, cap)
+
+# ============================================
+# CIRCUIT BREAKER
+# ============================================
+
+class CircuitBreaker:
+    """
+    Circuit breaker clássico (fechado -> aberto -> meio-aberto)
+
+    - fechado: chamadas passam; `failure_threshold` falhas seguidas abrem o circuito
+    - aberto: chamadas falham na hora até passar `reset_seconds`
+    - meio-aberto: uma única chamada de teste passa; sucesso fecha, falha reabre
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """
+        Diz se uma chamada pode ser feita agora
+        """
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            print(f"[OK] Circuito do modelo {self.name} fechado")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"[AVISO] Circuito do modelo {self.name} aberto após {self.consecutive_failures} falha(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Libera a chamada de teste sem veredito (ex: chamada cancelada ou erro do cliente)
+        """
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(retry_in, 1)
+        }
+
+# ============================================
+# LATÊNCIA (p95 para hedging)
+# ============================================
+
+class _LatencyWindow:
+    """Janela das últimas latências de um modelo"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+# ============================================
+# CLIENTE
+# ============================================
+
+class ResilientCompletions:
+    """
+    Implementa chat.completions.create com prazo, retry, hedging e circuit breaker
+    """
+
+    def __init__(
+        self,
+        raw_client: Any,
+        hedging: bool = LLM_HEDGING_ENABLED,
+        scheduler: Optional[RateScheduler] = None
+    ):
+        self._raw = raw_client
+        self.hedging = hedging
+        self.scheduler = scheduler
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, _LatencyWindow] = {}
+        self.counters = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker(model, LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS)
+        return self._breakers[model]
+
+    async def create(
+        self,
+        deadline_seconds: float = LLM_DEADLINE_SECONDS,
+        priority: int = PRIORITY_CHAT,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Mesmos parâmetros de AsyncGroq.chat.completions.create, mais:
+
+        Args:
+            deadline_seconds: Prazo total da chamada, incluindo novas tentativas. A espera
+                na fila da cota não conta (ela é limitada pela espera máxima da prioridade)
+            priority: Classe de prioridade na fila da cota (ver services/rate_limiter.py)
+
+        Raises:
+            CircuitOpenError: O circuito do modelo está aberto
+            RateLimitShedError: Cota esgotada e a chamada foi descartada pela prioridade
+            TimeoutError: O prazo acabou
+            Exception: Erro do provedor que não vale nova tentativa (ou tentativas esgotadas)
+        """
+        model = kwargs.get("model", "")
+        breaker = self.breaker(model)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + deadline_seconds
+        estimated_tokens = estimate_call_tokens(kwargs)
+        self.counters["calls"] += 1
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuito do modelo {model} aberto: provedor instável, tente novamente em instantes")
+
+            # Fila e descarte da cota são limitação local: ficam fora do prazo
+            # e nunca contam como falha do provedor no circuit breaker
+            try:
+                deadline += await self._acquire_quota(model, priority, estimated_tokens)
+            except BaseException:
+                breaker.release()
+                raise
+
+            remaining = deadline - loop.time()
+            try:
+                result = await asyncio.wait_for(
+                    self._attempt(model, priority, estimated_tokens, kwargs),
+                    timeout=max(remaining, 0.001)
+                )
+                breaker.record_success()
+                return result
+            except asyncio.TimeoutError:
+                self.counters["timeouts"] += 1
+                breaker.record_failure()
+                raise TimeoutError(f"Chamada ao modelo {model} excedeu o prazo de {deadline_seconds}s")
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                if _indicates_degradation(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                if _status_code(e) == 429 and self.scheduler is not None:
+                    # A cota real acabou antes da estimada: segura as próximas chamadas
+                    self.scheduler.penalize(model)
+
+                if not _is_retryable(e) or attempt >= LLM_MAX_RETRIES:
+                    raise
+
+                delay = _retry_after_seconds(e)
+                if delay is None:
+                    delay = _backoff_seconds(attempt)
+                if loop.time() + delay >= deadline:
+                    raise
+
+                attempt += 1
+                self.counters["retries"] += 1
+                record_llm_retry(model, str(_status_code(e) or type(e).__name__))
+                print(f"[AVISO] Erro do provedor em {model} ({_status_code(e) or type(e).__name__}). Nova tentativa {attempt} em {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _acquire_quota(self, model: str, priority: int, estimated_tokens: int) -> float:
+        """
+        Reserva a cota RPM/TPM da tentativa
+
+        Returns:
+            Segundos de espera na fila (descontados do prazo da chamada)
+        """
+        if self.scheduler is None:
+            return 0.0
+        started = time.perf_counter()
+        await self.scheduler.acquire(model, priority, estimated_tokens)
+        return time.perf_counter() - started
+
+    async def _attempt(self, model: str, priority: int, estimated_tokens: int, kwargs: Dict[str, Any]) -> Any:
+        window = self._latency.setdefault(model, _LatencyWindow())
+        started = time.perf_counter()
+
+        if self.hedging and not kwargs.get("stream"):
+            result = await self._hedged(window, model, priority, estimated_tokens, kwargs)
+        else:
+            result = await self._raw.chat.completions.create(**kwargs)
+
+        window.add(time.perf_counter() - started)
+        if self.scheduler is not None:
+            usage = getattr(result, "usage", None)
+            self.scheduler.settle(model, estimated_tokens, getattr(usage, "total_tokens", None))
+        return result
+
+    async def _hedged(
+        self,
+        window: _LatencyWindow,
+        model: str,
+        priority: int,
+        estimated_tokens: int,
+        kwargs: Dict[str, Any]
+    ) -> Any:
+        """
+        Dispara uma segunda requisição se a primeira passar do p95 do modelo
+        """
+        hedge_delay = window.p95(LLM_HEDGE_MIN_SAMPLES)
+        if hedge_delay is None:
+            return await self._raw.chat.completions.create(**kwargs)
+
+        primary = asyncio.create_task(self._raw.chat.completions.create(**kwargs))
+        backup: Optional[asyncio.Task] = None
+        try:
+            # Dentro do try: se quem chamou for cancelado (prazo, cliente
+            # desconectado), o finally cancela a requisição principal
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            # O hedge gasta cota: só sai se ela estiver livre agora, sem furar a fila
+            if self.scheduler is not None and not self.scheduler.try_acquire(model, priority, estimated_tokens):
+                return await primary
+
+            self.counters["hedges"] += 1
+            backup = asyncio.create_task(self._raw.chat.completions.create(**kwargs))
+            pending = {primary, backup}
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging,
+            **self.counters,
+            "circuits": {model: breaker.snapshot() for model, breaker in self._breakers.items()},
+            "rate_limits": self.scheduler.stats() if self.scheduler is not None else None
+        }
+
+class _Chat:
+    def __init__(self, completions: ResilientCompletions):
+        self.completions = completions
+
+class ResilientLLMClient:
+    """
+    Envolve um AsyncGroq mantendo a interface client.chat.completions.create
+    """
+
+    def __init__(
+        self,
+        raw_client: Any,
+        hedging: bool = LLM_HEDGING_ENABLED,
+        scheduler: Optional[RateScheduler] = None
+    ):
+        self.chat = _Chat(ResilientCompletions(raw_client, hedging, scheduler))
+
+# Cliente compartilhado pelos agentes (None se a GROQ_API_KEY não estiver configurada)
+llm_client: Optional[ResilientLLMClient] = None
+if GROQ_API_KEY and AsyncGroq is not None:
+    try:
+        # Sem retries internos do SDK: as novas tentativas são controladas aqui
+        llm_client = ResilientLLMClient(
+            AsyncGroq(api_key=GROQ_API_KEY, max_retries=0),
+            scheduler=RateScheduler() if LLM_RATE_LIMIT_ENABLED else None
+        )
+    except Exception as e:
+        print(f"⚠️  Erro ao inicializar cliente Groq: {e}")
+
+def get_llm_health() -> Dict[str, Any]:
+    """
+    Estado do cliente LLM para o /health
+
+    Returns:
+        Dicionário com configured, degraded (algum circuito aberto), contadores
+        de retries/timeouts/hedges, o estado do circuito e a cota de cada modelo
+    """
+    if llm_client is None:
+        return {"configured": False, "degraded": False, "circuits": {}}
+
+    health = llm_client.chat.completions.health()
+    degraded = any(circuit["state"] != CircuitBreaker.CLOSED for circuit in health["circuits"].values())
+    return {"configured": True, "degraded": degraded, **health}
@@ -0,0 +1,265 @@
+"""
+Métricas (Prometheus)
+Histogramas e contadores de latência dos endpoints, do LLM e do Firestore,
+tokens consumidos, caches, novas tentativas e moderação, expostos em
+/metrics. O middleware registra cada requisição e guarda a rota atual para
+que as métricas do LLM e do Firestore saiam com o rótulo `route`.
+
+Sem o pacote prometheus_client as métricas viram no-ops e /metrics responde 503.
+"""
+import functools
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    CONTENT_TYPE_LATEST = "text/plain; charset=utf-8"
+    PROMETHEUS_AVAILABLE = False
+
+from services.tracing import route_template, span
+
+# Tarefas do LLM que pertencem ao Agente Filtrador (as demais são do Agente de Ideia)
+_FILTRADOR_TASKS = {"moderation", "moderation_batch"}
+
+# Buckets (segundos): endpoints e LLM vão até dezenas de segundos; Firestore é bem mais rápido
+_REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+_FIRESTORE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+_OPS_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+class _NoopMetric:
+    """Substitui Counter/Histogram quando o prometheus_client não está instalado"""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+def _histogram(name: str, documentation: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]) -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+def _counter(name: str, documentation: str, labels: Tuple[str, ...]) -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labels)
+
+# ============================================
+# MÉTRICAS
+# ============================================
+
+HTTP_REQUEST_SECONDS = _histogram(
+    "junibox_http_request_duration_seconds",
+    "Latência dos endpoints (até o fim da resposta, incluindo streams)",
+    ("method", "route", "status"),
+    _REQUEST_BUCKETS
+)
+LLM_REQUEST_SECONDS = _histogram(
+    "junibox_llm_request_duration_seconds",
+    "Latência das chamadas ao LLM (resposta completa)",
+    ("agent", "model", "task", "route", "outcome"),
+    _REQUEST_BUCKETS
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = _histogram(
+    "junibox_llm_time_to_first_token_seconds",
+    "Tempo até o primeiro trecho das respostas em streaming",
+    ("agent", "model", "task", "route"),
+    _REQUEST_BUCKETS
+)
+LLM_TOKENS_TOTAL = _counter(
+    "junibox_llm_tokens_total",
+    "Tokens consumidos (usage informado pelo provedor)",
+    ("agent", "model", "task", "kind")
+)
+LLM_RETRIES_TOTAL = _counter(
+    "junibox_llm_retries_total",
+    "Novas tentativas de chamadas ao LLM",
+    ("model", "reason")
+)
+FIRESTORE_OP_SECONDS = _histogram(
+    "junibox_firestore_operation_duration_seconds",
+    "Latência das operações no Firestore",
+    ("operation", "kind"),
+    _FIRESTORE_BUCKETS
+)
+FIRESTORE_OPS_TOTAL = _counter(
+    "junibox_firestore_operations_total",
+    "Operações no Firestore por rota",
+    ("operation", "kind", "route")
+)
+FIRESTORE_OPS_PER_REQUEST = _histogram(
+    "junibox_firestore_operations_per_request",
+    "Operações no Firestore feitas durante cada requisição",
+    ("route",),
+    _OPS_PER_REQUEST_BUCKETS
+)
+CACHE_REQUESTS_TOTAL = _counter(
+    "junibox_cache_requests_total",
+    "Consultas aos caches em memória por resultado (hit, miss, stale)",
+    ("cache", "result")
+)
+MODERATION_VERDICTS_TOTAL = _counter(
+    "junibox_moderation_verdicts_total",
+    "Vereditos do Agente Filtrador por origem e resultado (blocked/allowed)",
+    ("source", "outcome")
+)
+
+# ============================================
+# CONTEXTO DA REQUISIÇÃO
+# ============================================
+
+# Estado da requisição atual (scope ASGI e contadores); tarefas criadas durante
+# a requisição herdam uma cópia do contexto e continuam rotuladas com a rota
+_request_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("junibox_request_state", default=None)
+
+def current_route() -> str:
+    """
+    Rota (template) da requisição em andamento, ou "background" fora de uma
+    """
+    state = _request_state.get()
+    return route_template(state["scope"]) if state else "background"
+
+def agent_for_task(task: str) -> str:
+    """
+    Agente dono de uma tarefa do LLM (rótulo `agent`)
+    """
+    return "filtrador" if task in _FILTRADOR_TASKS else "ideia"
+
+# ============================================
+# REGISTRO
+# ============================================
+
+def record_llm_call(task: str, model: str, seconds: float, outcome: str, usage: Any = None) -> None:
+    """
+    Registra a latência de uma chamada ao LLM e os tokens do `usage` (se houver)
+
+    Args:
+        task: Tarefa do roteador de modelos
+        model: Modelo chamado
+        seconds: Duração da chamada
+        outcome: "ok" ou "error"
+        usage: Objeto usage da resposta (prompt_tokens/completion_tokens)
+    """
+    agent = agent_for_task(task)
+    LLM_REQUEST_SECONDS.labels(agent, model, task, current_route(), outcome).observe(seconds)
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            LLM_TOKENS_TOTAL.labels(agent, model, task, kind).inc(tokens)
+
+def record_llm_first_token(task: str, model: str, seconds: float) -> None:
+    """
+    Registra o tempo até o primeiro trecho de uma resposta em streaming
+    """
+    LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(agent_for_task(task), model, task, current_route()).observe(seconds)
+
+def record_llm_retry(model: str, reason: str) -> None:
+    LLM_RETRIES_TOTAL.labels(model, reason).inc()
+
+def record_cache_lookup(cache: str, result: str) -> None:
+    CACHE_REQUESTS_TOTAL.labels(cache, result).inc()
+
+def record_moderation_verdict(source: str, blocked: bool) -> None:
+    """
+    Registra um veredito de moderação
+
+    Args:
+        source: Quem decidiu ("lexical", "cache" ou "llm")
+        blocked: Se o conteúdo foi bloqueado
+    """
+    MODERATION_VERDICTS_TOTAL.labels(source, "blocked" if blocked else "allowed").inc()
+
+def _document_count(result: Any) -> int:
+    # Listas: um documento por item; demais retornos: 1 se houve documento
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return 1 if result else 0
+
+def observe_firestore(kind: str) -> Callable:
+    """
+    Decorator para funções assíncronas de services/db.py
+
+    Registra latência e contagem da operação (rotulada com a rota atual),
+    soma a operação ao total da requisição e abre um span
+    "firestore.<função>" com a quantidade de documentos retornados.
+
+    Args:
+        kind: "read", "write" ou "delete"
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        operation = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            state = _request_state.get()
+            if state is not None:
+                state["firestore_ops"] += 1
+            FIRESTORE_OPS_TOTAL.labels(operation, kind, current_route()).inc()
+            started = time.perf_counter()
+            try:
+                with span(f"firestore.{operation}", **{"firestore.kind": kind}) as current:
+                    result = await func(*args, **kwargs)
+                    current.set_attribute("firestore.documents", _document_count(result))
+                    return result
+            finally:
+                FIRESTORE_OP_SECONDS.labels(operation, kind).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Gera o texto de exposição do Prometheus
+
+    Returns:
+        Tupla (conteúdo, content-type)
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP
+
+    Registra a latência por método/rota/status e quantas operações no
+    Firestore a requisição fez. Em respostas em streaming (SSE), a latência
+    vai até o fim do stream.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = {"scope": scope, "firestore_ops": 0}
+        token = _request_state.set(state)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def _send(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = route_template(scope)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - started)
+            FIRESTORE_OPS_PER_REQUEST.labels(route).observe(state["firestore_ops"])
+            _request_state.reset(token)
@@ -0,0 +1,338 @@
+"""
+Roteador de Modelos
+Escolhe o modelo de cada chamada ao LLM pela tarefa: classificações e
+saídas curtas/estruturadas vão para um modelo pequeno e rápido; o modelo
+grande fica com as conversas completas e com as respostas do modelo
+pequeno que vierem inválidas ou com baixa confiança (escalonamento).
+"""
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app_config import (
+    MODEL_NAME,
+    MODEL_SMALL_NAME,
+    MODEL_ROUTING_ENABLED,
+    MODEL_TASK_TIERS,
+    MODEL_ESCALATION_MIN_CONFIDENCE,
+    LLM_COALESCING_ENABLED,
+    LLM_TASK_PRIORITIES
+)
+from services.metrics import record_llm_call, record_llm_first_token
+from services.rate_limiter import PRIORITY_CHAT, RateLimitShedError
+from services.singleflight import SingleFlight
+from services.tracing import span
+
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+
+# ============================================
+# VALIDADORES DE SAÍDA (decidem o escalonamento)
+# ============================================
+
+def _confident(value: Any, min_confidence: float) -> bool:
+    # Confiança ausente não é motivo para escalonar; só valores baixos
+    if value is None:
+        return True
+    try:
+        return float(value) >= min_confidence
+    except (TypeError, ValueError):
+        return False
+
+def valid_json_object(
+    required_keys: tuple = (),
+    min_confidence: float = MODEL_ESCALATION_MIN_CONFIDENCE
+) -> Callable[[str], bool]:
+    """
+    Cria um validador para respostas em JSON
+
+    A resposta é aceita se for um objeto JSON com as chaves exigidas e,
+    quando trouxer "confidence", se ela for >= min_confidence.
+
+    Args:
+        required_keys: Chaves que precisam estar presentes
+        min_confidence: Confiança mínima para aceitar a resposta
+
+    Returns:
+        Função que recebe o texto da resposta e diz se ela é aceitável
+    """
+    def _validate(text: str) -> bool:
+        data = json.loads(text)
+        return (
+            isinstance(data, dict)
+            and all(key in data for key in required_keys)
+            and _confident(data.get("confidence"), min_confidence)
+        )
+    return _validate
+
+def _prompt_chars(messages: Any) -> int:
+    return sum(len(message.get("content") or "") for message in messages or [])
+
+def _remaining_deadline(kwargs: Dict[str, Any], started: float) -> Dict[str, Any]:
+    """
+    Parâmetros do escalonamento com o que sobrou de `deadline_seconds`
+
+    Raises:
+        TimeoutError: O prazo acabou no modelo pequeno
+    """
+    if kwargs.get("deadline_seconds") is None:
+        return kwargs
+    remaining = kwargs["deadline_seconds"] - (time.monotonic() - started)
+    if remaining <= 0:
+        raise TimeoutError(f"Prazo de {kwargs['deadline_seconds']:.1f}s esgotado antes do escalonamento")
+    return {**kwargs, "deadline_seconds": remaining}
+
+# ============================================
+# STREAMS
+# ============================================
+
+class _MeasuredStream:
+    """
+    Repassa um stream do provedor medindo o tempo até o primeiro trecho e
+    a duração total; os tokens vêm do usage enviado no último trecho
+    """
+
+    def __init__(self, stream: Any, task: str, model: str, started: float):
+        self._stream = stream
+        self._task = task
+        self._model = model
+        self._started = started
+        self._first_chunk = True
+        self._usage = None
+        self._recorded = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        outcome = "error"
+        try:
+            async for chunk in self._stream:
+                if self._first_chunk:
+                    self._first_chunk = False
+                    record_llm_first_token(self._task, self._model, time.perf_counter() - self._started)
+                # A Groq envia o usage no último trecho (x_groq.usage)
+                usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if usage is not None:
+                    self._usage = usage
+                yield chunk
+            outcome = "ok"
+        finally:
+            self._record(outcome)
+
+    def _record(self, outcome: str) -> None:
+        if not self._recorded:
+            self._recorded = True
+            record_llm_call(self._task, self._model, time.perf_counter() - self._started, outcome, self._usage)
+
+    async def close(self) -> None:
+        # Fechado antes do fim (ex: cliente desconectou)
+        self._record("cancelled")
+        await self._stream.close()
+
+# ============================================
+# ROTEADOR
+# ============================================
+
+class ModelRouter:
+    """
+    Mapeia tarefas para níveis de modelo e registra decisões e latência por nível
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, str],
+        task_tiers: Dict[str, str],
+        enabled: bool = True,
+        coalescing: bool = True,
+        task_priorities: Optional[Dict[str, int]] = None
+    ):
+        self.tiers = tiers
+        self.task_tiers = task_tiers
+        self.task_priorities = task_priorities or {}
+        self.enabled = enabled
+        self.coalescing = coalescing
+        self._single_flight = SingleFlight()
+        self._tier_stats = {
+            tier: {"calls": 0, "errors": 0, "total_latency_ms": 0.0, "max_latency_ms": 0.0}
+            for tier in tiers
+        }
+        self._task_stats: Dict[str, Dict[str, int]] = {}
+
+    def tier_for(self, task: str) -> str:
+        """
+        Retorna o nível de modelo de uma tarefa (grande se o roteamento estiver desligado)
+        """
+        if not self.enabled:
+            return TIER_LARGE
+        return self.task_tiers.get(task, TIER_LARGE)
+
+    def model_for(self, task: str) -> str:
+        """
+        Retorna o nome do modelo usado para uma tarefa
+        """
+        return self.tiers[self.tier_for(task)]
+
+    async def complete(
+        self,
+        client: Any,
+        task: str,
+        validate: Optional[Callable[[str], bool]] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        Chama o LLM com o modelo da tarefa, escalonando se necessário
+
+        Se a tarefa usa o modelo pequeno e a chamada falhar, ou se `validate`
+        rejeitar a resposta (JSON inválido, confiança baixa...), a mesma
+        chamada é refeita no modelo grande. Chamadas descartadas pela cota
+        (RateLimitShedError) não são escalonadas.
+
+        Chamadas simultâneas idênticas (mesma tarefa e mesmos parâmetros)
+        compartilham uma única chamada ao provedor (single-flight).
+
+        `deadline_seconds`, se informado, vale de ponta a ponta: o modelo
+        grande recebe só o tempo que sobrou do pequeno.
+
+        Args:
+            client: Cliente AsyncGroq
+            task: Nome da tarefa (ex: "moderation", "chat", "field_suggestion")
+            validate: Recebe o texto da resposta e retorna True se ela é aceitável
+            **kwargs: Parâmetros de chat.completions.create (exceto model)
+
+        Returns:
+            Resposta da API (ou stream, se stream=True)
+
+        Raises:
+            TimeoutError: O prazo acabou antes do escalonamento
+            Exception: Erro da chamada no modelo grande
+        """
+        if not self.coalescing or kwargs.get("stream"):
+            return await self._complete(client, task, validate, **kwargs)
+        
+        return await self._single_flight.do(
+            self._fingerprint(task, kwargs),
+            lambda: self._complete(client, task, validate, **kwargs)
+        )
+
+    async def _complete(
+        self,
+        client: Any,
+        task: str,
+        validate: Optional[Callable[[str], bool]] = None,
+        **kwargs: Any
+    ) -> Any:
+        tier = self.tier_for(task)
+        if tier == TIER_LARGE:
+            return await self._call(client, task, TIER_LARGE, **kwargs)
+
+        started = time.monotonic()
+        try:
+            completion = await self._call(client, task, tier, **kwargs)
+        except RateLimitShedError:
+            # Descartada para poupar a cota: não vai disputar a do modelo grande
+            raise
+        except Exception as e:
+            self._record_escalation(task, "error")
+            print(f"[AVISO] Modelo {self.tiers[tier]} falhou em '{task}' ({e}). Escalonando para {self.tiers[TIER_LARGE]}.")
+            return await self._call(client, task, TIER_LARGE, **_remaining_deadline(kwargs, started))
+
+        if validate is not None and not kwargs.get("stream"):
+            content = completion.choices[0].message.content or ""
+            try:
+                accepted = validate(content)
+            except Exception:
+                accepted = False
+            if not accepted:
+                self._record_escalation(task, "invalid")
+                return await self._call(client, task, TIER_LARGE, **_remaining_deadline(kwargs, started))
+
+        return completion
+
+    @staticmethod
+    def _fingerprint(task: str, kwargs: Dict[str, Any]) -> str:
+        # O prazo (que pode ser o que sobrou de uma requisição) não muda a resposta
+        params = {key: value for key, value in kwargs.items() if key != "deadline_seconds"}
+        payload = json.dumps({"task": task, "params": params}, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _call(self, client: Any, task: str, tier: str, **kwargs: Any) -> Any:
+        task_stats = self._task_stats.setdefault(task, {TIER_SMALL: 0, TIER_LARGE: 0, "escalations": 0})
+        task_stats[tier] = task_stats.get(tier, 0) + 1
+        tier_stats = self._tier_stats[tier]
+        tier_stats["calls"] += 1
+
+        model = self.tiers[tier]
+        started = time.perf_counter()
+        try:
+            with span(
+                f"llm.{task}",
+                **{
+                    "llm.model": model,
+                    "llm.tier": tier,
+                    "llm.prompt_chars": _prompt_chars(kwargs.get("messages")),
+                    "llm.stream": bool(kwargs.get("stream"))
+                }
+            ) as current:
+                completion = await client.chat.completions.create(
+                    model=model,
+                    priority=self.task_priorities.get(task, PRIORITY_CHAT),
+                    **kwargs
+                )
+                usage = getattr(completion, "usage", None)
+                current.set_attribute("llm.prompt_tokens", getattr(usage, "prompt_tokens", None))
+                current.set_attribute("llm.completion_tokens", getattr(usage, "completion_tokens", None))
+        except Exception:
+            tier_stats["errors"] += 1
+            record_llm_call(task, model, time.perf_counter() - started, "error")
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            tier_stats["total_latency_ms"] += elapsed_ms
+            tier_stats["max_latency_ms"] = max(tier_stats["max_latency_ms"], elapsed_ms)
+
+        if kwargs.get("stream"):
+            return _MeasuredStream(completion, task, model, started)
+        record_llm_call(task, model, time.perf_counter() - started, "ok", getattr(completion, "usage", None))
+        return completion
+
+    def _record_escalation(self, task: str, reason: str) -> None:
+        task_stats = self._task_stats.setdefault(task, {TIER_SMALL: 0, TIER_LARGE: 0, "escalations": 0})
+        task_stats["escalations"] += 1
+        task_stats[f"escalations_{reason}"] = task_stats.get(f"escalations_{reason}", 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna decisões de roteamento por tarefa e latência por nível
+
+        Returns:
+            Dicionário com o modelo, chamadas, erros e latência (média/máxima)
+            de cada nível, as chamadas/escalonamentos de cada tarefa e os
+            contadores de coalescência
+        """
+        tiers = {}
+        for tier, data in self._tier_stats.items():
+            calls = data["calls"]
+            tiers[tier] = {
+                "model": self.tiers[tier],
+                "calls": calls,
+                "errors": data["errors"],
+                "avg_latency_ms": round(data["total_latency_ms"] / calls, 1) if calls else 0.0,
+                "max_latency_ms": round(data["max_latency_ms"], 1)
+            }
+        return {
+            "enabled": self.enabled,
+            "tiers": tiers,
+            "tasks": {task: dict(data) for task, data in self._task_stats.items()},
+            "coalescing": dict(self._single_flight.stats(), enabled=self.coalescing)
+        }
+
+# Roteador global usado pelos agentes
+model_router = ModelRouter(
+    tiers={TIER_SMALL: MODEL_SMALL_NAME, TIER_LARGE: MODEL_NAME},
+    task_tiers=MODEL_TASK_TIERS,
+    enabled=MODEL_ROUTING_ENABLED,
+    coalescing=LLM_COALESCING_ENABLED,
+    task_priorities=LLM_TASK_PRIORITIES
+)
@@ -0,0 +1,286 @@
+"""
+Escalonador de Cota do Provedor (RPM/TPM)
+Baldes de tokens por modelo (requisições/minuto e tokens/minuto) e uma fila
+por prioridade na frente de todas as chamadas ao LLM. Quando a cota acaba,
+a moderação (que bloqueia um salvamento) passa na frente do chat, que passa
+na frente das sugestões; o trabalho de menor prioridade é descartado
+primeiro quando a espera estimada passa do limite da sua classe.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+from app_config import (
+    LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_PRIORITY_MAX_WAIT_SECONDS, LLM_COMPLETION_TOKEN_SHARE
+)
+
+# Classes de prioridade (menor = mais urgente)
+PRIORITY_MODERATION = 0
+PRIORITY_CHAT = 1
+PRIORITY_SUGGESTIONS = 2
+
+# Média conservadora de caracteres por token (mesma estimativa da memória de conversa)
+_CHARS_PER_TOKEN = 3.5
+_DEFAULT_MAX_TOKENS = 1024
+
+class RateLimitShedError(Exception):
+    """A chamada foi descartada para preservar a cota de trabalho mais prioritário"""
+
+def estimate_call_tokens(kwargs: Dict[str, Any]) -> int:
+    """
+    Estima os tokens de uma chamada: prompt (pelo tamanho) + resposta provável
+
+    A resposta raramente chega ao max_tokens, então só uma fração dele
+    (LLM_COMPLETION_TOKEN_SHARE) é reservada. RateScheduler.settle corrige
+    a diferença com o `usage` informado pelo provedor.
+
+    Args:
+        kwargs: Parâmetros de chat.completions.create
+
+    Returns:
+        Estimativa de tokens consumidos da cota TPM
+    """
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+    max_tokens = int(kwargs.get("max_tokens") or _DEFAULT_MAX_TOKENS)
+    return int(prompt_chars / _CHARS_PER_TOKEN) + int(max_tokens * LLM_COMPLETION_TOKEN_SHARE)
+
+# ============================================
+# BALDE DE TOKENS
+# ============================================
+
+class TokenBucket:
+    """
+    Balde que enche continuamente até `capacity` por minuto
+    """
+
+    def __init__(self, capacity: float):
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._rate = self.capacity / 60.0
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Segundos até haver `amount` disponível (0 se já houver)
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self._rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self) -> None:
+        """
+        Esvazia o balde (o provedor respondeu 429: a cota real acabou)
+        """
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+# ============================================
+# ESCALONADOR
+# ============================================
+
+class _Waiter:
+    def __init__(self, priority: int, tokens: int, deadline: float, future: "asyncio.Future"):
+        self.priority = priority
+        self.tokens = tokens
+        self.deadline = deadline
+        self.future = future
+
+class _ModelQueue:
+    """Baldes RPM/TPM e fila de espera de um modelo"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.heap: List[tuple] = []
+        self.wakeup = asyncio.Event()
+        self.dispatcher: Optional["asyncio.Task"] = None
+
+    def wait_time(self, tokens: int) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def consume(self, tokens: int) -> None:
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+
+class RateScheduler:
+    """
+    Fila por prioridade na frente dos baldes RPM/TPM de cada modelo
+    """
+
+    def __init__(
+        self,
+        rpm: int = LLM_RPM_LIMIT,
+        tpm: int = LLM_TPM_LIMIT,
+        max_wait_seconds: Optional[Dict[int, float]] = None
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait_seconds = max_wait_seconds or LLM_PRIORITY_MAX_WAIT_SECONDS
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+        self.granted: Dict[int, int] = {}
+        self.shed: Dict[int, int] = {}
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self._queues:
+            self._queues[model] = _ModelQueue(self.rpm, self.tpm)
+        return self._queues[model]
+
+    async def acquire(self, model: str, priority: int, tokens: int) -> None:
+        """
+        Aguarda cota para uma chamada, respeitando a prioridade
+
+        Args:
+            model: Modelo que será chamado (cada modelo tem sua própria cota)
+            priority: Classe de prioridade (PRIORITY_*)
+            tokens: Estimativa de tokens da chamada
+
+        Raises:
+            RateLimitShedError: A espera estimada passou do limite da classe
+        """
+        queue = self._queue(model)
+        max_wait = self.max_wait_seconds.get(priority, max(self.max_wait_seconds.values()))
+
+        # Caminho rápido: ninguém de prioridade igual ou maior esperando e cota disponível
+        ahead = [entry for entry in queue.heap if entry[0] <= priority and not entry[2].future.done()]
+        if not ahead and queue.wait_time(tokens) == 0:
+            queue.consume(tokens)
+            self._count(self.granted, priority)
+            return
+
+        # Espera estimada: a minha chamada mais as que estão na frente
+        tokens_ahead = tokens + sum(entry[2].tokens for entry in ahead)
+        estimated_wait = max(queue.requests.wait_time(len(ahead) + 1), queue.tokens.wait_time(tokens_ahead))
+        if estimated_wait > max_wait:
+            self._shed(priority, f"espera estimada de {estimated_wait:.1f}s")
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, tokens, time.monotonic() + max_wait, future)
+        heapq.heappush(queue.heap, (priority, next(self._sequence), waiter))
+        queue.wakeup.set()
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.create_task(self._dispatch(queue))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled() and future.exception() is None:
+                # A cota já tinha sido concedida: devolve
+                queue.requests.refund(1)
+                queue.tokens.refund(tokens)
+            raise
+
+    def try_acquire(self, model: str, priority: int, tokens: int) -> bool:
+        """
+        Consome a cota só se ela estiver livre agora, sem entrar na fila (ex: requisições hedge)
+        """
+        queue = self._queue(model)
+        if any(entry[0] <= priority and not entry[2].future.done() for entry in queue.heap):
+            return False
+        if queue.wait_time(tokens) > 0:
+            return False
+        queue.consume(tokens)
+        self._count(self.granted, priority)
+        return True
+
+    async def _dispatch(self, queue: _ModelQueue) -> None:
+        """
+        Libera as chamadas da fila em ordem de prioridade conforme a cota volta
+        """
+        while queue.heap:
+            now = time.monotonic()
+
+            # Descarta quem desistiu ou passou do tempo máximo de espera da classe
+            for _, _, waiter in list(queue.heap):
+                if not waiter.future.done() and now > waiter.deadline:
+                    self._count(self.shed, waiter.priority)
+                    waiter.future.set_exception(RateLimitShedError("Cota do provedor esgotada: chamada descartada por prioridade"))
+            queue.heap = [entry for entry in queue.heap if not entry[2].future.done()]
+            heapq.heapify(queue.heap)
+            if not queue.heap:
+                break
+
+            _, _, head = queue.heap[0]
+            wait = queue.wait_time(head.tokens)
+            if wait == 0:
+                heapq.heappop(queue.heap)
+                queue.consume(head.tokens)
+                self._count(self.granted, head.priority)
+                head.future.set_result(None)
+                continue
+
+            # Dorme até a cota voltar, o próximo prazo vencer ou chegar alguém mais urgente
+            next_deadline = min(waiter.deadline for _, _, waiter in queue.heap) - now
+            queue.wakeup.clear()
+            try:
+                await asyncio.wait_for(queue.wakeup.wait(), timeout=max(0.01, min(wait, next_deadline)))
+            except asyncio.TimeoutError:
+                pass
+
+    def settle(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """
+        Ajusta o balde TPM com o consumo real informado pelo provedor
+        """
+        if actual_tokens is None:
+            return
+        bucket = self._queue(model).tokens
+        difference = estimated_tokens - actual_tokens
+        if difference > 0:
+            bucket.refund(difference)
+        elif difference < 0:
+            bucket.consume(-difference)
+
+    def penalize(self, model: str) -> None:
+        """
+        Esvazia os baldes do modelo após um 429 do provedor
+        """
+        queue = self._queue(model)
+        queue.requests.drain()
+        queue.tokens.drain()
+
+    def _shed(self, priority: int, reason: str) -> None:
+        self._count(self.shed, priority)
+        raise RateLimitShedError(f"Cota do provedor esgotada: chamada de prioridade {priority} descartada ({reason})")
+
+    @staticmethod
+    def _count(counter: Dict[int, int], priority: int) -> None:
+        counter[priority] = counter.get(priority, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna a cota disponível e a fila de cada modelo, e as chamadas liberadas/descartadas por prioridade
+        """
+        models = {}
+        for model, queue in self._queues.items():
+            queue.requests.wait_time(0)
+            models[model] = {
+                "requests_available": round(queue.requests.tokens, 1),
+                "tokens_available": round(queue.tokens.tokens),
+                "queued": sum(1 for entry in queue.heap if not entry[2].future.done())
+            }
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "granted": dict(self.granted),
+            "shed": dict(self.shed),
+            "models": models
+        }
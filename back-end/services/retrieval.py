@@ -0,0 +1,289 @@
+"""
+Recuperação na Base de Conhecimento (BM25)
+Divide os arquivos de conhecimento em trechos, indexa com BM25 e devolve
+apenas os trechos relevantes para a mensagem atual. O índice (trechos e
+estatísticas BM25) é salvo em disco (KNOWLEDGE_INDEX_DIR) e só é
+reconstruído quando algum arquivo da pasta muda (mtime/tamanho).
+"""
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app_config import KNOWLEDGE_CHUNK_MAX_CHARS, KNOWLEDGE_INDEX_DIR
+from config.prompt_registry import directory_signature
+
+# Versão do formato do índice salvo (mude ao alterar chunking/tokenização)
+_INDEX_FORMAT_VERSION = 2
+
+# ============================================
+# TOKENIZAÇÃO
+# ============================================
+
+_STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "como", "da", "das", "de", "do", "dos",
+    "e", "ela", "ele", "em", "entre", "essa", "esse", "esta", "este", "eu",
+    "isso", "isto", "ja", "mais", "mas", "me", "na", "nas", "nao", "no",
+    "nos", "o", "os", "ou", "para", "pela", "pelo", "por", "qual", "que",
+    "se", "sem", "ser", "seu", "sua", "um", "uma", "voce"
+}
+_CAMEL_CASE_RE = re.compile(r"([a-z])([A-Z])")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Radical por truncamento: aproxima "avaliação"/"avaliar"/"avaliador"
+_STEM_LENGTH = 6
+
+def tokenize(text: str) -> List[str]:
+    """
+    Converte texto em termos de busca
+
+    Separa camelCase ("publicoAlvo"), remove acentos, caixa e stopwords e
+    reduz cada palavra a um radical simples por truncamento.
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Lista de termos
+    """
+    if not text:
+        return []
+
+    text = _CAMEL_CASE_RE.sub(r"\1 \2", text)
+    text = "".join(
+        ch for ch in unicodedata.normalize("NFKD", text.casefold())
+        if not unicodedata.combining(ch)
+    )
+    return [
+        word[:_STEM_LENGTH]
+        for word in _WORD_RE.findall(text)
+        if len(word) > 1 and word not in _STOPWORDS
+    ]
+
+# ============================================
+# DIVISÃO EM TRECHOS
+# ============================================
+
+def _is_heading(paragraph: str) -> bool:
+    first_line = paragraph.strip().split("\n", 1)[0]
+    letters = [ch for ch in first_line if ch.isalpha()]
+    return bool(letters) and len(first_line) <= 80 and sum(ch.isupper() for ch in letters) / len(letters) > 0.8
+
+def chunk_document(source: str, text: str, max_chars: int = KNOWLEDGE_CHUNK_MAX_CHARS) -> List[Dict[str, str]]:
+    """
+    Divide um arquivo em trechos de até max_chars caracteres
+
+    Os parágrafos (separados por linha em branco) são agrupados em ordem.
+    Um título em maiúsculas sempre começa um trecho novo, para que cada
+    trecho carregue o título da sua seção.
+
+    Args:
+        source: Nome do arquivo de origem
+        text: Conteúdo do arquivo
+        max_chars: Tamanho máximo de cada trecho
+
+    Returns:
+        Lista de trechos {"source": ..., "text": ...}
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks = []
+    current: List[str] = []
+    current_size = 0
+
+    for paragraph in paragraphs:
+        starts_section = _is_heading(paragraph)
+        if current and (starts_section or current_size + len(paragraph) > max_chars):
+            chunks.append("\n\n".join(current))
+            current, current_size = [], 0
+
+        # Parágrafo maior que o limite: quebra por linhas
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind("\n", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+
+        current.append(paragraph)
+        current_size += len(paragraph)
+
+    if current:
+        chunks.append("\n\n".join(current))
+
+    return [{"source": source, "text": chunk} for chunk in chunks if chunk]
+
+# ============================================
+# ÍNDICE BM25
+# ============================================
+
+class BM25Index:
+    """
+    Índice BM25 em memória sobre trechos de texto
+    """
+
+    def __init__(self, chunks: List[Dict[str, str]], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+        doc_freqs: Counter = Counter()
+        for freqs in self._term_freqs:
+            doc_freqs.update(freqs.keys())
+        total = len(chunks)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freqs.items()
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serializa os trechos e as estatísticas BM25 (para salvar em disco)
+        """
+        return {
+            "k1": self.k1,
+            "b": self.b,
+            "chunks": self.chunks,
+            "term_freqs": [dict(freqs) for freqs in self._term_freqs],
+            "lengths": self._lengths,
+            "avg_length": self._avg_length,
+            "idf": self._idf
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        """
+        Restaura um índice salvo por to_dict sem tokenizar os trechos de novo
+        """
+        index = cls.__new__(cls)
+        index.chunks = data["chunks"]
+        index.k1 = data["k1"]
+        index.b = data["b"]
+        index._term_freqs = [Counter(freqs) for freqs in data["term_freqs"]]
+        index._lengths = data["lengths"]
+        index._avg_length = data["avg_length"]
+        index._idf = data["idf"]
+        return index
+
+    def search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Retorna os trechos mais relevantes para a consulta
+
+        Args:
+            query: Texto da consulta (mensagem do usuário, seção do formulário...)
+            top_k: Número máximo de trechos
+
+        Returns:
+            Trechos com score > 0, do mais relevante para o menos relevante
+        """
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        if not terms or top_k <= 0:
+            return []
+
+        scored = []
+        for index, freqs in enumerate(self._term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / (self._avg_length or 1))
+            score = 0.0
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, index))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [dict(self.chunks[index], score=round(score, 4)) for score, index in scored[:top_k]]
+
+# ============================================
+# CONSTRUÇÃO E PERSISTÊNCIA
+# ============================================
+
+def _index_key(knowledge_dir: Path, max_chars: int, exclude: Iterable[str]) -> Dict[str, Any]:
+    """
+    Chave do índice salvo: formato, tamanho dos trechos, arquivos excluídos e
+    assinatura da pasta (a mesma de config/prompt_registry.py, sem ler o
+    conteúdo dos arquivos)
+    """
+    return {
+        "format": _INDEX_FORMAT_VERSION,
+        "max_chars": max_chars,
+        "exclude": sorted(exclude),
+        "signature": [list(item) for item in directory_signature(knowledge_dir)]
+    }
+
+def _load_index(path: str, key: Dict[str, Any]) -> Optional[BM25Index]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("key") != key:
+            return None
+        return BM25Index.from_dict(data["index"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _save_index(path: str, key: Dict[str, Any], index: BM25Index) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "index": index.to_dict()}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"[AVISO] Não foi possível salvar o índice de conhecimento em {path}: {e}")
+
+def build_index(
+    name: str,
+    knowledge_dir: Path,
+    load_files: Callable[[], List[Tuple[str, str]]],
+    max_chars: int = KNOWLEDGE_CHUNK_MAX_CHARS,
+    index_dir: str = KNOWLEDGE_INDEX_DIR,
+    exclude: Iterable[str] = ()
+) -> BM25Index:
+    """
+    Monta o índice de uma base de conhecimento, reaproveitando o salvo em disco
+
+    O índice salvo vale enquanto nenhum arquivo da pasta mudar (mtime/tamanho):
+    nesse caso os arquivos nem são lidos e os trechos não são tokenizados.
+
+    Args:
+        name: Nome da base (ex: "ideia"), usado no nome do arquivo
+        knowledge_dir: Pasta da base de conhecimento
+        load_files: Função que lê a pasta e devolve (nome_do_arquivo, conteúdo)
+        max_chars: Tamanho máximo de cada trecho
+        index_dir: Pasta onde os índices são salvos
+        exclude: Arquivos que load_files deixa de fora (entram na chave do
+            índice salvo, para que mudar a lista reconstrua o índice)
+
+    Returns:
+        Índice BM25 pronto para consulta
+    """
+    key = _index_key(knowledge_dir, max_chars, exclude)
+    path = os.path.join(index_dir, f"{name}.json")
+
+    index = _load_index(path, key)
+    if index is None:
+        chunks = []
+        for source, content in load_files():
+            chunks.extend(chunk_document(source, content, max_chars))
+        index = BM25Index(chunks)
+        _save_index(path, key, index)
+        print(f"[INFO] Índice de conhecimento '{name}' construído ({len(chunks)} trechos)")
+
+    return index
+
+def format_chunks(chunks: List[Dict[str, Any]]) -> str:
+    """
+    Formata os trechos recuperados para injeção no prompt
+
+    Args:
+        chunks: Trechos retornados por BM25Index.search
+
+    Returns:
+        Texto com cada trecho precedido do nome do arquivo de origem
+    """
+    return "\n".join(f"\n--- {chunk['source']} ---\n{chunk['text']}" for chunk in chunks)
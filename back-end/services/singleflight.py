@@ -0,0 +1,84 @@
+"""
+Single-flight (Coalescência de Requisições)
+Chamadas concorrentes com a mesma chave compartilham uma única execução:
+a primeira dispara o trabalho e as demais aguardam o mesmo resultado.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _Flight:
+    """Execução em andamento e quantos chamadores aguardam por ela"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Agrupa chamadas assíncronas idênticas em andamento
+
+    Só coalesce chamadas simultâneas: assim que a execução termina, a chave
+    é liberada e a próxima chamada dispara uma execução nova (não é cache).
+
+    Cancelar um chamador não cancela a execução compartilhada enquanto
+    outros ainda aguardam; quando o último chamador desiste, a execução é
+    cancelada (interrompendo, por exemplo, a chamada HTTP ao provedor).
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa factory() ou aguarda a execução em andamento com a mesma chave
+
+        Args:
+            key: Impressão digital da requisição
+            factory: Função sem argumentos que retorna a corrotina do trabalho
+
+        Returns:
+            Resultado da execução (o mesmo objeto para todos os chamadores)
+
+        Raises:
+            Exception: O erro da execução é repassado a todos os chamadores
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Ninguém mais aguarda: libera a chave já e cancela a execução
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Marca o erro como consumido mesmo se ninguém mais aguardava
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna quantas execuções foram disparadas e quantas chamadas foram coalescidas
+        """
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
@@ -0,0 +1,80 @@
+"""
+Server-Sent Events (SSE)
+Formata e transmite respostas dos agentes token a token para o frontend
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+
+# Cabeçalhos recomendados para SSE (sem cache e sem buffer em proxies como o nginx)
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formata um evento SSE
+
+    Args:
+        event: Nome do evento (token, done, error)
+        data: Dados do evento (serializados como JSON)
+
+    Returns:
+        String no formato "event: ...\\ndata: ...\\n\\n"
+    """
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def sse_chat_stream(
+    chunks: AsyncIterator[str],
+    on_finish: Optional[Callable[[str, bool], Any]] = None
+) -> AsyncIterator[str]:
+    """
+    Converte os trechos de texto de um agente em eventos SSE
+
+    Eventos emitidos:
+    - `token`: {"content": "..."} para cada trecho recebido
+    - `done`: {"response": "...", "timestamp": "..."} ao final
+    - `error`: {"detail": "..."} se a geração falhar no meio
+
+    Args:
+        chunks: Gerador assíncrono com os trechos de texto
+        on_finish: Chamado com (texto_acumulado, completo) quando o stream
+            termina, falha ou é abortado pelo cliente. Só é chamado se algum
+            texto tiver sido gerado. Pode ser função comum ou corrotina.
+
+    Returns:
+        Gerador assíncrono de eventos SSE (para StreamingResponse)
+    """
+    parts = []
+    completed = False
+    try:
+        async for delta in chunks:
+            parts.append(delta)
+            yield format_sse("token", {"content": delta})
+
+        completed = True
+        yield format_sse("done", {"response": "".join(parts), "timestamp": datetime.now().isoformat()})
+    except Exception as e:
+        print(f"❌ Erro durante o streaming da resposta: {e}")
+        yield format_sse("error", {"detail": "Desculpe, tive um problema ao processar sua mensagem. Tente novamente em alguns instantes."})
+    finally:
+        # Protegido contra cancelamento: se o cliente desconectou, ainda
+        # precisamos fechar o stream do provedor e salvar o que foi gerado
+        with anyio.CancelScope(shield=True):
+            await chunks.aclose()
+            if on_finish and parts:
+                try:
+                    if asyncio.iscoroutinefunction(on_finish):
+                        await on_finish("".join(parts), completed)
+                    else:
+                        await run_in_threadpool(on_finish, "".join(parts), completed)
+                except Exception as e:
+                    print(f"[AVISO] Erro ao finalizar stream: {e}")
@@ -0,0 +1,299 @@
+"""
+Tracing (Spans por Etapa)
+Cada requisição HTTP vira um trace com um span por etapa (moderação,
+leituras e escritas no Firestore, geração...). As etapas de primeiro nível
+voltam no header `Server-Timing` e o trace completo pode ser exportado para
+um arquivo JSON-lines ou para um coletor OpenTelemetry (OTLP).
+
+Sem o SDK do OpenTelemetry o exportador "otlp" é desligado com um aviso;
+os spans continuam alimentando o Server-Timing e o exportador "jsonl".
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app_config import (
+    TRACING_ENABLED,
+    TRACING_EXPORTER,
+    TRACING_JSONL_PATH,
+    TRACING_OTLP_ENDPOINT
+)
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    OTLP_AVAILABLE = True
+except ImportError:
+    OTLP_AVAILABLE = False
+
+_SERVICE_NAME = "junibox-backend"
+
+# ============================================
+# SPANS
+# ============================================
+
+class Span:
+    """Etapa medida de um trace, com atributos (tamanho do prompt, modelo...)"""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.duration_ms: Optional[float] = None
+        self._started = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def end(self) -> None:
+        if self.duration_ms is None:
+            self.duration_ms = self.elapsed_ms()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+class _NoopSpan:
+    """Span usado fora de um trace (tarefas em segundo plano, tracing desligado)"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """Spans de uma requisição, na ordem em que começaram"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self.finished = False
+
+    def start_span(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Span:
+        new_span = Span(self, name, parent.span_id if parent else None, attributes)
+        self.spans.append(new_span)
+        return new_span
+
+# Span aberto no contexto atual; tarefas criadas durante a requisição herdam
+# uma cópia do contexto, então spans em paralelo ficam com o pai correto
+_current_span: ContextVar[Optional[Span]] = ContextVar("junibox_current_span", default=None)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Abre um span filho do span atual
+
+    Fora de uma requisição com trace (ou depois que o trace foi exportado)
+    não registra nada.
+
+    Args:
+        name: Nome da etapa (ex: "moderation", "firestore.save_chat_message")
+        **attributes: Atributos iniciais (valores simples: str, int, float, bool)
+
+    Yields:
+        O span, para acrescentar atributos com set_attribute
+    """
+    parent = _current_span.get()
+    if parent is None or parent.trace.finished:
+        yield _NOOP_SPAN
+        return
+
+    current = parent.trace.start_span(name, parent, {k: v for k, v in attributes.items() if v is not None})
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set_attribute("error", type(e).__name__)
+        raise
+    finally:
+        current.end()
+        _current_span.reset(token)
+
+def set_span_attributes(**attributes: Any) -> None:
+    """
+    Acrescenta atributos ao span atual (no-op fora de um trace)
+    """
+    current = _current_span.get()
+    if current is None or current.trace.finished:
+        return
+    for key, value in attributes.items():
+        current.set_attribute(key, value)
+
+# ============================================
+# SERVER-TIMING
+# ============================================
+
+def server_timing(trace: Trace, root: Span) -> str:
+    """
+    Monta o header Server-Timing com as etapas de primeiro nível já concluídas
+
+    Ex: "moderation;dur=182.4, memory;dur=35.0, generation;dur=1450.2, total;dur=1702.9"
+    """
+    entries = [
+        f"{item.name};dur={item.duration_ms:.1f}"
+        for item in trace.spans
+        if item.parent_id == root.span_id and item.duration_ms is not None
+    ]
+    entries.append(f"total;dur={root.elapsed_ms():.1f}")
+    return ", ".join(entries)
+
+# ============================================
+# EXPORTADORES
+# ============================================
+
+_jsonl_lock = threading.Lock()
+_otel_tracer: Any = None
+
+def _write_jsonl(lines: List[str]) -> None:
+    try:
+        with _jsonl_lock:
+            os.makedirs(os.path.dirname(TRACING_JSONL_PATH) or ".", exist_ok=True)
+            with open(TRACING_JSONL_PATH, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+    except OSError as e:
+        print(f"[AVISO] Falha ao gravar traces em {TRACING_JSONL_PATH}: {e}")
+
+def _get_otel_tracer() -> Any:
+    """
+    Cria (uma vez) o tracer do OpenTelemetry com exportação OTLP/HTTP em lote
+    """
+    global _otel_tracer
+    if _otel_tracer is None:
+        provider = TracerProvider(resource=Resource.create({"service.name": _SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)))
+        _otel_tracer = provider.get_tracer(__name__)
+    return _otel_tracer
+
+def _export_otlp(trace: Trace) -> None:
+    """
+    Reproduz o trace no OpenTelemetry com os horários originais
+
+    O envio ao coletor é feito em segundo plano pelo BatchSpanProcessor.
+    """
+    tracer = _get_otel_tracer()
+    exported: Dict[str, Any] = {}
+    for item in trace.spans:
+        parent = exported.get(item.parent_id)
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        exported[item.span_id] = tracer.start_span(
+            item.name,
+            context=context,
+            start_time=item.start_ns,
+            attributes=dict(item.attributes, **{"junibox.trace_id": trace.trace_id})
+        )
+    for item in trace.spans:
+        exported[item.span_id].end(end_time=item.start_ns + int((item.duration_ms or 0.0) * 1_000_000))
+
+def _resolve_exporter() -> Optional[Callable[[Trace], None]]:
+    if TRACING_EXPORTER == "jsonl":
+        def _export_jsonl(trace: Trace) -> None:
+            lines = [json.dumps(item.to_dict(), ensure_ascii=False, default=str) for item in trace.spans]
+            asyncio.get_running_loop().run_in_executor(None, _write_jsonl, lines)
+        return _export_jsonl
+    if TRACING_EXPORTER == "otlp":
+        if not OTLP_AVAILABLE:
+            print("[AVISO] TRACING_EXPORTER=otlp requer opentelemetry-sdk e opentelemetry-exporter-otlp-proto-http. Exportação desligada.")
+            return None
+        return _export_otlp
+    if TRACING_EXPORTER not in ("", "none"):
+        print(f"[AVISO] TRACING_EXPORTER desconhecido: {TRACING_EXPORTER}. Use none, jsonl ou otlp.")
+    return None
+
+_exporter = _resolve_exporter() if TRACING_ENABLED else None
+
+def _export(trace: Trace) -> None:
+    if _exporter is None:
+        return
+    try:
+        _exporter(trace)
+    except Exception as e:
+        print(f"[AVISO] Falha ao exportar trace {trace.trace_id}: {e}")
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """
+    Template da rota resolvida pelo roteamento (ex: /api/chat/history/{user_id}/{idea_id})
+
+    Usa o template, e não o caminho, para não criar uma série por ID. O
+    roteamento grava a rota no próprio scope, então só existe depois dele.
+    """
+    # FastAPI com routers aninhados: a rota do scope tem o caminho relativo
+    # ao router; o contexto efetivo traz o caminho completo com o prefixo
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+class TracingMiddleware:
+    """
+    Middleware ASGI que abre o trace de cada requisição HTTP
+
+    As etapas concluídas até o início da resposta saem no header
+    Server-Timing (em streams, as etapas antes do primeiro byte). O trace é
+    exportado no fim da resposta, se a requisição abriu algum span.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        root = trace.start_span(scope["method"], None, {"http.method": scope["method"], "http.target": scope["path"]})
+        token = _current_span.set(root)
+
+        async def _send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if len(trace.spans) > 1:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(trace, root).encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        except BaseException as e:
+            root.status = "error"
+            root.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            root.end()
+            route = route_template(scope)
+            root.name = f"{scope['method']} {route}"
+            root.set_attribute("http.route", route)
+            trace.finished = True
+            _current_span.reset(token)
+            if len(trace.spans) > 1:
+                _export(trace)
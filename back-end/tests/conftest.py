@@ -0,0 +1,127 @@
+"""
+Fixtures compartilhadas dos testes
+Os testes rodam sem Firebase nem Groq: o Firestore é substituído por um
+fake em memória (FakeFirestore) que só implementa o que services/db.py usa.
+"""
+import asyncio
+import copy
+import uuid
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+
+class FakeIncrement:
+    def __init__(self, value: int):
+        self.value = value
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeDocument:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._store, self.path + (name,))
+
+    async def set(self, data, merge=False):
+        # Cede a vez como uma chamada de rede, para os testes de concorrência
+        await asyncio.sleep(0)
+        self._store.write(self.path, data, merge)
+
+    async def get(self):
+        return FakeSnapshot(self.id, copy.deepcopy(self._store.documents.get(self.path)))
+
+    async def delete(self):
+        self._store.documents.pop(self.path, None)
+
+
+class FakeCollection:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._store, self.path + (doc_id or uuid.uuid4().hex[:20],))
+
+
+class FakeBatch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref, data, True))
+
+    async def commit(self):
+        self._store.check_failure()
+        for op, ref, _, _ in self._ops:
+            if op == "update" and ref.path not in self._store.documents:
+                raise NotFound(f"No document to update: {'/'.join(ref.path)}")
+        for _, ref, data, merge in self._ops:
+            self._store.write(ref.path, data, merge, check=False)
+
+
+class FakeFirestore:
+    """
+    Firestore em memória: documentos por caminho e falhas programáveis
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.fail_writes = 0
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def check_failure(self):
+        if self.fail_writes > 0:
+            self.fail_writes -= 1
+            raise RuntimeError("503 Firestore indisponível")
+
+    def write(self, path, data, merge, check=True):
+        if check:
+            self.check_failure()
+        current = copy.deepcopy(self.documents.get(path, {})) if merge else {}
+        for field, value in data.items():
+            if isinstance(value, FakeIncrement):
+                current[field] = current.get(field, 0) + value.value
+            elif merge and isinstance(value, dict) and isinstance(current.get(field), dict):
+                current[field] = {**current[field], **value}
+            else:
+                current[field] = value
+        self.documents[path] = current
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """
+    Liga services.db a um FakeFirestore limpo (buffers e caches zerados)
+    """
+    import services.db as db_module
+
+    fake = FakeFirestore()
+    monkeypatch.setattr(db_module, "db", fake)
+    monkeypatch.setattr(db_module, "Increment", FakeIncrement)
+    for state in (db_module._pending_autosaves, db_module._flushing_autosaves, db_module._flush_locks):
+        state.clear()
+    for cache in (db_module._idea_cache, db_module._chat_tail_cache, db_module._last_writes, db_module._deleted_ideas):
+        cache.clear()
+    return fake
@@ -0,0 +1,121 @@
+"""
+Buffer de autosave (write-behind) de services/db.py
+"""
+import asyncio
+
+import pytest
+
+import services.db as db_module
+from app_config import AUTOSAVE_MAX_FLUSH_FAILURES
+
+IDEA_PATH = ("users", "u1", "ideas", "i1")
+
+
+def test_failed_flush_keeps_fields_buffered(fake_db):
+    async def scenario():
+        await db_module.autosave_idea("u1", "i1", {"title": "Ideia nova"})
+        fake_db.fail_writes = 1
+        with pytest.raises(RuntimeError):
+            await db_module.flush_autosave("u1", "i1")
+
+        # Nada gravado, mas os campos continuam no buffer e visíveis na leitura
+        assert IDEA_PATH not in fake_db.documents
+        entry = db_module._pending_autosaves[("u1", "i1")]
+        assert entry.data["title"] == "Ideia nova"
+        assert entry.failures == 1
+        assert entry.timer is not None
+
+        # A próxima tentativa grava o que ficou pendente
+        assert await db_module.flush_autosave("u1", "i1") is True
+        assert fake_db.documents[IDEA_PATH]["title"] == "Ideia nova"
+        assert fake_db.documents[IDEA_PATH]["version"] == 1
+        assert ("u1", "i1") not in db_module._pending_autosaves
+
+    asyncio.run(scenario())
+
+
+def test_repeated_failures_never_drop_fields(fake_db):
+    async def scenario():
+        await db_module.autosave_idea("u1", "i1", {"title": "Primeira"})
+        fake_db.fail_writes = AUTOSAVE_MAX_FLUSH_FAILURES + 2
+        for _ in range(AUTOSAVE_MAX_FLUSH_FAILURES):
+            with pytest.raises(RuntimeError):
+                await db_module.flush_autosave("u1", "i1")
+
+        # Depois de várias falhas o autosave grava na hora e o erro chega ao cliente
+        with pytest.raises(RuntimeError):
+            await db_module.autosave_idea("u1", "i1", {"description": "Segunda"})
+
+        entry = db_module._pending_autosaves[("u1", "i1")]
+        assert entry.data["title"] == "Primeira"
+        assert entry.data["description"] == "Segunda"
+        assert entry.updates == 2
+
+        fake_db.fail_writes = 0
+        assert await db_module.flush_autosave("u1", "i1") is True
+        stored = fake_db.documents[IDEA_PATH]
+        assert (stored["title"], stored["description"], stored["version"]) == ("Primeira", "Segunda", 2)
+
+    asyncio.run(scenario())
+
+
+def test_newer_fields_win_over_requeued_ones(fake_db):
+    async def scenario():
+        await db_module.autosave_idea("u1", "i1", {"title": "Antigo"})
+        fake_db.fail_writes = 1
+
+        async def edit_during_flush():
+            await asyncio.sleep(0)
+            await db_module.autosave_idea("u1", "i1", {"title": "Novo"})
+
+        flush = asyncio.create_task(db_module.flush_autosave("u1", "i1"))
+        await edit_during_flush()
+        with pytest.raises(RuntimeError):
+            await flush
+
+        assert await db_module.flush_autosave("u1", "i1") is True
+        assert fake_db.documents[IDEA_PATH]["title"] == "Novo"
+
+    asyncio.run(scenario())
+
+
+FORM = {
+    "title": "Fila virtual",
+    "description": "Senha pelo celular",
+    "target_audience": "clientes PF",
+    "dynamic_content": {"problema": "filas longas", "solucao": "app"}
+}
+
+
+def test_unchanged_form_does_not_write_or_bump_version(fake_db):
+    async def scenario():
+        fake_db.documents[IDEA_PATH] = {**FORM, "dynamic_content": dict(FORM["dynamic_content"]), "version": 3}
+
+        # O formulário reenvia todos os campos sem mudança
+        saved = await db_module.autosave_idea("u1", "i1", {**FORM, "dynamic_content": dict(FORM["dynamic_content"])})
+        assert saved == {}
+        assert ("u1", "i1") not in db_module._pending_autosaves
+        assert (await db_module.get_idea("u1", "i1"))["version"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_only_changed_fields_are_buffered(fake_db):
+    async def scenario():
+        fake_db.documents[IDEA_PATH] = {**FORM, "dynamic_content": dict(FORM["dynamic_content"]), "version": 3}
+
+        edited = {**FORM, "dynamic_content": {**FORM["dynamic_content"], "solucao": "app e totem"}}
+        saved = await db_module.autosave_idea("u1", "i1", edited)
+        assert set(saved) == {"dynamic_content", "last_updated"}
+        assert saved["dynamic_content"] == {"solucao": "app e totem"}
+
+        # Reenviar o mesmo estado compara com o que está no buffer
+        assert await db_module.autosave_idea("u1", "i1", dict(edited)) == {}
+        assert db_module._pending_autosaves[("u1", "i1")].updates == 1
+
+        await db_module.flush_autosave("u1", "i1")
+        stored = fake_db.documents[IDEA_PATH]
+        assert stored["version"] == 4
+        assert stored["dynamic_content"] == {"problema": "filas longas", "solucao": "app e totem"}
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+"""
+Gravação em lote de um turno de chat (commit_chat_turn)
+"""
+import asyncio
+
+import services.db as db_module
+
+IDEA_PATH = ("users", "u1", "ideas", "i1")
+
+
+def _chat_messages(fake_db):
+    return [
+        data for path, data in fake_db.documents.items()
+        if path[:4] == IDEA_PATH and path[4:5] == ("chat",)
+    ]
+
+
+def test_chat_turn_updates_existing_idea(fake_db):
+    fake_db.documents[IDEA_PATH] = {"title": "Ideia"}
+    asyncio.run(db_module.commit_chat_turn("u1", "i1", "Oi", "Olá!"))
+
+    assert sorted(message["role"] for message in _chat_messages(fake_db)) == ["assistant", "user"]
+    assert "last_updated" in fake_db.documents[IDEA_PATH]
+
+
+def test_chat_turn_on_idea_without_document(fake_db):
+    asyncio.run(db_module.commit_chat_turn("u1", "i1", "Oi", "Olá!"))
+
+    assert len(_chat_messages(fake_db)) == 2
+    assert IDEA_PATH not in fake_db.documents
+
+
+def test_chat_turn_when_idea_is_deleted_after_the_check(fake_db):
+    async def scenario():
+        fake_db.documents[IDEA_PATH] = {"title": "Ideia"}
+        # A ideia entra no cache de leitura e some do Firestore logo depois
+        assert await db_module.get_idea("u1", "i1") is not None
+        del fake_db.documents[IDEA_PATH]
+        return await db_module.commit_chat_turn("u1", "i1", "Oi", "Olá!")
+
+    ids = asyncio.run(scenario())
+    assert ids["assistant_message_id"]
+    assert len(_chat_messages(fake_db)) == 2
+    assert IDEA_PATH not in fake_db.documents
@@ -0,0 +1,74 @@
+"""
+Pré-filtro léxico do Agente Filtrador (agents/filtrador/lexical.py)
+Usa a lista de termos real, compilada de agents/filtrador/knowledge/.
+"""
+import pytest
+
+from agents.filtrador.lexical import is_ambiguous_term, normalize_text, prefilter_content
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Leetspeak
+    ("p0rr4", "pora"),
+    ("C@R@LH0", "caralho"),
+    ("M3RD4!!", "merda"),
+    # Caracteres confundíveis (cirílico) e largura total
+    ("рutа", "puta"),
+    ("ｐｕｔａ", "puta"),
+    # Letras repetidas e espaçadas
+    ("poooorra", "pora"),
+    ("p o r r a", "pora"),
+    ("b.o.s.t.a", "bosta"),
+    # Acentos e pontuação
+    ("Currículo, custos!", "curiculo custos"),
+    # Números sem letras continuam números
+    ("Meta 2025: 100% digital", "meta 2025 100 digital"),
+])
+def test_normalize_text(text, expected):
+    assert normalize_text(text) == expected
+
+
+def test_normalize_text_empty():
+    assert normalize_text("") == ""
+    assert normalize_text(None) == ""
+
+
+@pytest.mark.parametrize("text", [
+    "p0rr4",
+    "рutа",
+    "poooorra de ideia",
+    "que p o r r a",
+    "p o r r a de ideia",
+    "M3RD4!!",
+    "b.o.s.t.a",
+])
+def test_prefilter_blocks_evasions(text):
+    verdict = prefilter_content(text)
+    assert verdict is not None
+    assert verdict["is_inappropriate"] is True
+
+
+@pytest.mark.parametrize("text", [
+    "Reduzir custos do atendimento",
+    "Anexar o currículo do responsável",
+    "Cuidado com a fila nas agências",
+    "Meta 2025: 100% digital",
+])
+def test_prefilter_does_not_block_clean_words(text):
+    # Sem termo algum: decide o LLM (ou aprova, com FILTRADOR_LEXICAL_TRUST_CLEAN)
+    verdict = prefilter_content(text)
+    assert verdict is None or verdict["is_inappropriate"] is False
+
+
+@pytest.mark.parametrize("text", [
+    "Quero acessar o CU da agência",
+    "Plantio de pau-brasil nas agências",
+])
+def test_prefilter_defers_ambiguous_terms_to_the_llm(text):
+    assert prefilter_content(text) is None
+
+
+def test_short_terms_are_never_conclusive():
+    assert is_ambiguous_term("cu")
+    assert is_ambiguous_term("pau")
+    assert not is_ambiguous_term("caralho")
@@ -0,0 +1,105 @@
+"""
+Prazo de ponta a ponta da moderação (Agente Filtrador e roteador de modelos)
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import agents.filtrador.agent as filtrador
+from routers.ideas import _raise_if_inappropriate
+from services.model_router import ModelRouter, TIER_LARGE, TIER_SMALL
+
+# Textos sem termos do pré-filtro léxico: a decisão fica com o LLM
+ITEMS = [
+    {"field_name": "title", "content": "Aplicativo para agendar atendimento na agência"},
+    {"field_name": "description", "content": "Fila virtual com aviso por mensagem"}
+]
+
+
+class _SlowRouter:
+    """Roteador falso cujas chamadas demoram mais que o prazo recebido"""
+
+    def __init__(self):
+        self.deadlines = []
+
+    async def complete(self, client, task, validate=None, **kwargs):
+        self.deadlines.append(kwargs["deadline_seconds"])
+        await asyncio.sleep(kwargs["deadline_seconds"])
+        raise TimeoutError("prazo excedido")
+
+
+@pytest.fixture
+def slow_filtrador(monkeypatch):
+    router = _SlowRouter()
+    monkeypatch.setattr(filtrador, "model_router", router)
+    monkeypatch.setattr(filtrador, "client", object())
+    monkeypatch.setattr(filtrador, "FILTRADOR_DEADLINE_SECONDS", 0.05)
+    monkeypatch.setattr(filtrador, "prefilter_content", lambda content: None)
+    filtrador._verdict_cache.clear()
+    return router
+
+
+def test_timeout_is_undecided_not_appropriate(slow_filtrador):
+    results = asyncio.run(filtrador.analyze_contents_batch(ITEMS, stop_on_block=True))
+
+    assert [result["field_name"] for result in results] == ["title", "description"]
+    for result in results:
+        assert result["undecided"] is True
+        assert result["is_inappropriate"] is False
+    # Vereditos sem decisão não entram no cache
+    assert filtrador._verdict_cache.stats()["size"] == 0
+
+
+def test_save_path_rejects_undecided_content(slow_filtrador):
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(_raise_if_inappropriate(ITEMS))
+    assert raised.value.status_code == 503
+
+
+def test_single_field_shares_the_request_deadline(slow_filtrador):
+    started = time.monotonic()
+    result = asyncio.run(filtrador.analyze_contents_batch(ITEMS[:1]))
+
+    assert result[0]["undecided"] is True
+    assert slow_filtrador.deadlines[0] <= 0.05
+    assert time.monotonic() - started < 0.5
+
+
+def test_escalation_gets_only_the_remaining_deadline():
+    calls = []
+
+    async def create(model, priority, **kwargs):
+        calls.append((model, kwargs["deadline_seconds"]))
+        if model == "small":
+            await asyncio.sleep(0.05)
+            raise RuntimeError("modelo pequeno falhou")
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content="{}"))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    router = ModelRouter(
+        tiers={TIER_SMALL: "small", TIER_LARGE: "large"},
+        task_tiers={"moderation": TIER_SMALL},
+        coalescing=False
+    )
+    asyncio.run(router.complete(client, "moderation", messages=[], deadline_seconds=1.0))
+
+    assert [model for model, _ in calls] == ["small", "large"]
+    assert calls[1][1] <= 1.0 - 0.05
+
+
+def test_escalation_after_expired_deadline_times_out():
+    async def create(model, priority, **kwargs):
+        await asyncio.sleep(0.03)
+        raise RuntimeError("modelo pequeno falhou")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    router = ModelRouter(
+        tiers={TIER_SMALL: "small", TIER_LARGE: "large"},
+        task_tiers={"moderation": TIER_SMALL},
+        coalescing=False
+    )
+    with pytest.raises(TimeoutError):
+        asyncio.run(router.complete(client, "moderation", messages=[], deadline_seconds=0.01))
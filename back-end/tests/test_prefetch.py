@@ -0,0 +1,67 @@
+"""
+Sugestões pré-geradas dos campos opcionais e o /suggest-field
+"""
+import asyncio
+
+import pytest
+
+from agents.ideia import prefetch
+from routers import chat
+from schemas import FieldSuggestionRequest
+
+IDEA = {
+    "title": "Fila virtual",
+    "description": "Senha pelo celular",
+    "target_audience": "",
+    "dynamic_content": {"problema": "filas longas", "metricas": ""},
+    "version": 4
+}
+# Formulário como o FormPage envia (watchedValues)
+FORM = {"ideaTitle": "Fila virtual", "ideaDescription": "Senha pelo celular", "publicoAlvo": "", "problema": "filas longas", "metricas": ""}
+PREFETCHED = {"field": "metricas", "suggestion": "Tempo médio de espera", "reasoning": "pré-gerada", "confidence": 0.8}
+LIVE = {"field": "metricas", "suggestion": "Agendamentos por agência", "reasoning": "ao vivo", "confidence": 0.7}
+
+
+@pytest.fixture
+def suggest(monkeypatch):
+    prefetch._store.clear()
+    prefetch._store.set(("u1", "i1"), {"version": "v4", "suggestions": {"metricas": PREFETCHED}})
+    live_calls = []
+
+    async def fake_context(user_id, idea_id):
+        return {**IDEA, "dynamic_content": dict(IDEA["dynamic_content"])}
+
+    async def fake_generate(idea_context, form_context, field_name):
+        live_calls.append(form_context["form_data"])
+        return LIVE
+
+    monkeypatch.setattr(chat, "get_idea_context", fake_context)
+    monkeypatch.setattr(chat, "generate_field_suggestion", fake_generate)
+
+    def call(form_data):
+        request = FieldSuggestionRequest(user_id="u1", idea_id="i1", field_name="metricas", form_data=form_data, current_step=1)
+        return asyncio.run(chat.suggest_field_endpoint(request)), live_calls
+
+    yield call
+    prefetch._store.clear()
+
+
+def test_form_matches_idea():
+    assert prefetch.form_matches_idea(FORM, IDEA)
+    assert prefetch.form_matches_idea({**FORM, "desafios": None}, IDEA)
+    assert not prefetch.form_matches_idea({**FORM, "ideaTitle": "Fila virtual 2.0"}, IDEA)
+    assert not prefetch.form_matches_idea({**FORM, "problema": "filas longas nas agências"}, IDEA)
+    assert not prefetch.form_matches_idea({**FORM, "publicoAlvo": "aposentados"}, IDEA)
+
+
+def test_prefetched_suggestion_served_when_form_matches(suggest):
+    result, live_calls = suggest(dict(FORM))
+    assert result == PREFETCHED
+    assert live_calls == []
+
+
+def test_unsaved_form_edits_fall_through_to_live_call(suggest):
+    edited = {**FORM, "problema": "filas longas nas agências do interior"}
+    result, live_calls = suggest(edited)
+    assert result == LIVE
+    assert live_calls == [edited]
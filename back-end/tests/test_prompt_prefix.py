@@ -0,0 +1,55 @@
+"""
+Prefixo estático do prompt do Agente de Ideia (cache de prefixo do provedor)
+"""
+from agents.ideia import agent
+from agents.ideia.knowledge_loader import load_ideia_knowledge_files
+from agents.ideia.prompts import get_ideia_static_prompt
+from app_config import KNOWLEDGE_RETRIEVAL_ENABLED, KNOWLEDGE_STATIC_FILES
+
+
+def _two_requests():
+    first = agent._build_generation_messages(
+        "Como defino o público-alvo?",
+        [{"role": "user", "content": "Oi"}, {"role": "assistant", "content": "Olá! Sou o JuniBox."}],
+        {"title": "Fila virtual", "description": "Senha pelo celular", "status": "draft"},
+        {"step_name": "publicoAlvo", "form_data": {"publicoAlvo": "clientes PF"}}
+    )
+    second = agent._build_generation_messages(
+        "Quais métricas de sucesso usar?",
+        [],
+        {"title": "Crédito rural simplificado", "dynamic_content": {"problema": "burocracia"}},
+        {"step_name": "metricas"}
+    )
+    return first, second
+
+
+def test_first_message_is_byte_identical_across_requests():
+    first, second = _two_requests()
+    task = agent._build_task_messages("Sugira melhorias", "objetivos métricas")
+
+    assert first[0]["role"] == "system"
+    assert first[0]["content"].encode("utf-8") == second[0]["content"].encode("utf-8")
+    assert task[0]["content"] == first[0]["content"] == get_ideia_static_prompt()
+    # Nada da ideia ou do formulário entra no prefixo
+    for text in ("Fila virtual", "Crédito rural", "clientes PF", "burocracia"):
+        assert text not in first[0]["content"]
+
+
+def test_static_knowledge_is_in_the_prefix_not_in_the_volatile_context():
+    first, second = _two_requests()
+    static_files = [name for name, _ in load_ideia_knowledge_files() if name in KNOWLEDGE_STATIC_FILES]
+
+    for name in static_files:
+        assert f"--- {name} ---" in first[0]["content"]
+    if KNOWLEDGE_RETRIEVAL_ENABLED:
+        volatile = "\n".join(message["content"] for message in first[1:] + second[1:])
+        for name in static_files:
+            assert f"--- {name} ---" not in volatile
+
+
+def test_prefix_check_reports_no_mismatch():
+    before = agent.get_prefix_stats()["mismatches"]
+    _two_requests()
+    stats = agent.get_prefix_stats()
+    assert stats["mismatches"] == before
+    assert stats["last_seen_hash"] == stats["hash"]
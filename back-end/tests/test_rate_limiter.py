@@ -0,0 +1,116 @@
+"""
+Baldes RPM/TPM e fila por prioridade da cota do provedor
+"""
+import asyncio
+
+import pytest
+
+from services import rate_limiter
+from services.rate_limiter import (
+    PRIORITY_CHAT, PRIORITY_MODERATION, PRIORITY_SUGGESTIONS,
+    RateLimitShedError, RateScheduler, TokenBucket
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake)
+    return fake
+
+
+def test_token_bucket_refills_per_minute(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+
+    clock.now += 30
+    assert bucket.wait_time(30) == 0
+    assert bucket.wait_time(31) == pytest.approx(1.0)
+
+    # Nunca enche além da capacidade
+    clock.now += 600
+    bucket.wait_time(0)
+    assert bucket.tokens == 60
+
+
+def test_token_bucket_drain_and_refund(clock):
+    bucket = TokenBucket(6000)
+    bucket.drain()
+    assert bucket.tokens == 0
+    bucket.refund(100)
+    assert bucket.tokens == 100
+    # Pedidos maiores que a capacidade esperam no máximo um balde cheio
+    assert bucket.wait_time(10_000) == pytest.approx((6000 - 100) / 100)
+
+
+def test_queued_calls_are_released_in_priority_order():
+    async def scenario():
+        # 600 RPM: uma requisição a cada 0,1s depois de esvaziar o balde
+        scheduler = RateScheduler(rpm=600, tpm=1_000_000)
+        scheduler.penalize("model")
+        order = []
+
+        async def call(priority):
+            await scheduler.acquire("model", priority, 10)
+            order.append(priority)
+
+        tasks = []
+        for priority in (PRIORITY_SUGGESTIONS, PRIORITY_CHAT, PRIORITY_MODERATION):
+            tasks.append(asyncio.create_task(call(priority)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+        assert order == [PRIORITY_MODERATION, PRIORITY_CHAT, PRIORITY_SUGGESTIONS]
+        assert scheduler.stats()["shed"] == {}
+
+    asyncio.run(scenario())
+
+
+def test_low_priority_is_shed_past_its_max_wait():
+    async def scenario():
+        # 60 RPM: a próxima requisição só em 1s, acima dos 0,5s das sugestões
+        scheduler = RateScheduler(
+            rpm=60, tpm=1_000_000,
+            max_wait_seconds={PRIORITY_MODERATION: 10.0, PRIORITY_CHAT: 8.0, PRIORITY_SUGGESTIONS: 0.5}
+        )
+        scheduler.penalize("model")
+
+        with pytest.raises(RateLimitShedError):
+            await scheduler.acquire("model", PRIORITY_SUGGESTIONS, 10)
+        assert scheduler.stats()["shed"] == {PRIORITY_SUGGESTIONS: 1}
+
+        # A moderação espera a cota voltar em vez de ser descartada
+        await asyncio.wait_for(scheduler.acquire("model", PRIORITY_MODERATION, 10), timeout=3)
+        assert scheduler.stats()["granted"] == {PRIORITY_MODERATION: 1}
+
+    asyncio.run(scenario())
+
+
+def test_queued_call_is_shed_when_its_deadline_passes():
+    async def scenario():
+        scheduler = RateScheduler(
+            rpm=60, tpm=1_000_000,
+            max_wait_seconds={PRIORITY_MODERATION: 10.0, PRIORITY_CHAT: 8.0, PRIORITY_SUGGESTIONS: 1.5}
+        )
+        scheduler.penalize("model")
+
+        # Entra na fila (espera estimada de 1s), mas a moderação passa na frente
+        suggestion = asyncio.create_task(scheduler.acquire("model", PRIORITY_SUGGESTIONS, 10))
+        await asyncio.sleep(0)
+        moderation = asyncio.create_task(scheduler.acquire("model", PRIORITY_MODERATION, 10))
+
+        await asyncio.wait_for(moderation, timeout=3)
+        with pytest.raises(RateLimitShedError):
+            await asyncio.wait_for(suggestion, timeout=3)
+        assert scheduler.stats()["shed"] == {PRIORITY_SUGGESTIONS: 1}
+
+    asyncio.run(scenario())
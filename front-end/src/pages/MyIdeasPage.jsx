@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useNavigate } from 'react-router-dom';
 import { useFirebaseAuth } from '../hooks/useFirebaseAuth';
-import { listIdeas, createIdea, deleteIdea } from '../services/api';
+import { listIdeas, getIdea, createIdea, deleteIdea } from '../services/api';
 import toast from 'react-hot-toast';
 import {
   Lightbulb,
@@ -30,6 +30,8 @@ const MyIdeasPage = () => {
   const [myIdeas, setMyIdeas] = useState([]);
   const [expandedIdeas, setExpandedIdeas] = useState(new Set());
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [creatingIdea, setCreatingIdea] = useState(false);
   const [deletingIdeaId, setDeletingIdeaId] = useState(null);
   const [deleteConfirm, setDeleteConfirm] = useState(null); // { ideaId, ideaTitle }
@@ -42,38 +44,43 @@ const MyIdeasPage = () => {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [isAuthenticated, user?.uid]);
 
-  const loadIdeas = async () => {
+  // Transformar dados do backend para o formato esperado pela UI
+  // A listagem traz só o resumo; descrição e campos dinâmicos chegam ao expandir
+  const formatIdea = (idea) => ({
+    id: idea.id,
+    title: idea.title || 'Sem título',
+    description: idea.description || '',
+    submittedAt: idea.created_at 
+      ? (idea.created_at.seconds 
+          ? new Date(idea.created_at.seconds * 1000).toISOString().split('T')[0]
+          : new Date(idea.created_at).toISOString().split('T')[0])
+      : new Date().toISOString().split('T')[0],
+    status: idea.status || 'draft',
+    completeness: idea.completeness ?? null,
+    phase: idea.dynamic_content?.phase || null,
+    phaseDescription: idea.dynamic_content?.phaseDescription || null,
+    managerFeedback: idea.dynamic_content?.managerFeedback || null,
+    nextSteps: idea.dynamic_content?.nextSteps || null,
+    estimatedTime: idea.dynamic_content?.estimatedTime || null,
+    category: idea.dynamic_content?.category || 'Geral',
+    priority: idea.dynamic_content?.priority || 'Média',
+    detailsLoaded: idea.dynamic_content !== undefined
+  });
+
+  const loadIdeas = async (cursor = null) => {
     try {
-      setLoading(true);
-      const ideas = await listIdeas(user.uid);
-      
-      // Se não houver ideias, apenas define array vazio (não é erro)
-      if (!ideas || ideas.length === 0) {
-        setMyIdeas([]);
-        return;
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
       }
+      const page = await listIdeas(user.uid, { cursor });
+      const ideas = page?.ideas || [];
       
-      // Transformar dados do backend para o formato esperado pela UI
-      const formattedIdeas = ideas.map(idea => ({
-        id: idea.id,
-        title: idea.title || 'Sem título',
-        description: idea.description || '',
-        submittedAt: idea.created_at 
-          ? (idea.created_at.seconds 
-              ? new Date(idea.created_at.seconds * 1000).toISOString().split('T')[0]
-              : new Date(idea.created_at).toISOString().split('T')[0])
-          : new Date().toISOString().split('T')[0],
-        status: idea.status || 'draft',
-        phase: idea.dynamic_content?.phase || null,
-        phaseDescription: idea.dynamic_content?.phaseDescription || null,
-        managerFeedback: idea.dynamic_content?.managerFeedback || null,
-        nextSteps: idea.dynamic_content?.nextSteps || null,
-        estimatedTime: idea.dynamic_content?.estimatedTime || null,
-        category: idea.dynamic_content?.category || 'Geral',
-        priority: idea.dynamic_content?.priority || 'Média'
-      }));
-      
-      setMyIdeas(formattedIdeas);
+      setNextCursor(page?.next_cursor || null);
+      // Sem ideias, a página vem vazia (não é erro)
+      const formattedIdeas = ideas.map(formatIdea);
+      setMyIdeas(prev => (cursor ? [...prev, ...formattedIdeas] : formattedIdeas));
     } catch (error) {
       console.error('Erro ao carregar ideias:', error);
       // Só mostra erro se realmente houver um problema de conexão
@@ -84,9 +91,22 @@ const MyIdeasPage = () => {
           duration: 5000
         });
       }
-      setMyIdeas([]);
+      if (!cursor) {
+        setMyIdeas([]);
+      }
     } finally {
       setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  // Busca o conteúdo completo da ideia (a listagem só traz o resumo)
+  const loadIdeaDetails = async (ideaId) => {
+    try {
+      const idea = await getIdea(user.uid, ideaId);
+      setMyIdeas(prev => prev.map(item => (item.id === ideaId ? formatIdea(idea) : item)));
+    } catch (error) {
+      console.error('Erro ao carregar detalhes da ideia:', error);
     }
   };
 
@@ -209,6 +229,10 @@ const MyIdeasPage = () => {
   };
 
   const toggleIdea = (ideaId) => {
+    const idea = myIdeas.find(item => item.id === ideaId);
+    if (idea && !idea.detailsLoaded && !expandedIdeas.has(ideaId)) {
+      loadIdeaDetails(ideaId);
+    }
     setExpandedIdeas(prev => {
       const newSet = new Set(prev);
       if (newSet.has(ideaId)) {
@@ -662,6 +686,27 @@ const MyIdeasPage = () => {
               );
             })
           )}
+
+          {/* Próxima página da listagem */}
+          {nextCursor && !loading && (
+            <div className="flex justify-center pt-2">
+              <button
+                type="button"
+                onClick={() => loadIdeas(nextCursor)}
+                disabled={loadingMore}
+                className="px-6 py-3 bg-white text-caixa-blue font-medium rounded-xl border border-gray-200 shadow-md hover:shadow-lg transition-all flex items-center space-x-2 disabled:opacity-50 disabled:cursor-not-allowed"
+              >
+                {loadingMore ? (
+                  <>
+                    <Loader2 className="w-5 h-5 animate-spin" />
+                    <span>Carregando...</span>
+                  </>
+                ) : (
+                  <span>Carregar mais ideias</span>
+                )}
+              </button>
+            </div>
+          )}
         </div>
       </main>
 
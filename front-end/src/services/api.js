@@ -80,10 +80,14 @@ export const getIdea = async (userId, ideaId) => {
 };
 
 /**
- * Lista todas as ideias de um usuário
+ * Lista as ideias de um usuário (resumos: id, título, status, completude e datas)
+ * Retorna { ideas, next_cursor }; passe o next_cursor para buscar a próxima página
  */
-export const listIdeas = async (userId, limit = 50) => {
-  return fetchAPI(`/api/ideas/${userId}?limit=${limit}`);
+export const listIdeas = async (userId, { limit = 50, cursor = null, status = null } = {}) => {
+  const params = new URLSearchParams({ limit: String(limit) });
+  if (cursor) params.set('cursor', cursor);
+  if (status) params.set('status', status);
+  return fetchAPI(`/api/ideas/${userId}?${params.toString()}`);
 };
 
 /**